@@ -1,12 +1,21 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import json
-import heapq
+import os
+import uuid
 from pathlib import Path
 
+# Solo lo que hace falta para el primer render: Red, la optimización, el
+# largo plazo y el informe de ajuste (que traen pandas y scipy.stats) se
+# importan en la rama que los usa
+from simulador import (MOTORES, MUESTREOS, PERFILES, CacheEscenarios, cargar_bundle,
+                       crear_perfil, estimar_analitico)
+from simulador.arribos import cargar_perfil
+from simulador.red import ARCHIVO_RED
+from simulador.servicio import ColaLlena, ServicioSimulacion
+from simulador.superficie import SuperficieRespuesta
+
 # ============================================
 # CONFIGURACIÓN
 # ============================================
@@ -18,9 +27,10 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# FORZAR TEMA CLARO
+# CSS personalizado - VERSIÓN FINAL, en un solo bloque
 st.markdown("""
     <style>
+    /* Forzar tema claro */
     [data-testid="stAppViewContainer"] {
         background-color: #ffffff !important;
     }
@@ -37,12 +47,7 @@ st.markdown("""
         background-color: #ffffff !important;
         color: #1a1a1a !important;
     }
-    </style>
-    """, unsafe_allow_html=True)
 
-# CSS personalizado - VERSIÓN FINAL
-st.markdown("""
-    <style>
     /* Fuente global */    
     html, body, [class*="css"], * {
         font-family: 'Segoe UI', -apple-system, BlinkMacSystemFont, 'Roboto', sans-serif !important;
@@ -260,127 +265,7 @@ st.markdown("""
         color: #1a1a1a !important;
     }
 
-    </style>
-    """, unsafe_allow_html=True)
-
-# ============================================
-# HEADER CON LOGO
-# ============================================
-
-col_logo, col_titulo = st.columns([0.5, 5])
-
-with col_titulo:
-    st.markdown("# 🚴 Sistema «Mi bici, tu bici» - Rosario")
-    st.markdown("**Distrito Centro** | Simulación de eventos discretos (DES) + Montecarlo")
-
-st.markdown("---")
-
-# ============================================
-# CARGAR DATOS
-# ============================================
-
-@st.cache_data
-def cargar_datos():
-    data_dir = Path("data")
-    with open(data_dir / "parametros_simulacion.json", 'r') as f:
-        parametros = json.load(f)
-    interarribos = np.load(data_dir / "interarribos_empiricos.npy")
-    duraciones = np.load(data_dir / "duraciones_empiricas.npy")
-    df_resultados = pd.read_csv(data_dir / "resultados_busqueda_binaria.csv")
-    df_resumen = pd.read_csv(data_dir / "resumen_ejecutivo.csv")
-    with open(data_dir / "metadata_analisis.json", 'r') as f:
-        metadata = json.load(f)
-    return parametros, interarribos, duraciones, df_resultados, df_resumen, metadata
-
-parametros, interarribos_emp, duraciones_emp, df_resultados, df_resumen, metadata = cargar_datos()
-
-# ============================================
-# FUNCIÓN DES
-# ============================================
-
-def simular_escenario(s0, factor_demanda, leak_pct, horizonte_dias, n_reps, 
-                      interarribos, duraciones):
-    tiempo_sim = horizonte_dias * 24 * 60
-    leak_prob = leak_pct / 100.0
-    rechazos_lista = []
-    stock_prom_lista = []
-    
-    for rep in range(n_reps):
-        np.random.seed(42 + rep)
-        stock = s0
-        t = 0.0
-        rechazos = 0
-        llegadas = 0
-        historico_stock = []
-        eventos = []
-        inter = np.random.choice(interarribos) / factor_demanda
-        heapq.heappush(eventos, (inter, 'arribo'))
-        
-        while eventos:
-            t, tipo = heapq.heappop(eventos)
-            if t > tiempo_sim:
-                break
-            
-            if tipo == 'arribo':
-                llegadas += 1
-                if stock > 0:
-                    stock -= 1
-                    if np.random.rand() > leak_prob:
-                        dur = float(np.random.choice(duraciones))
-                        heapq.heappush(eventos, (t + dur, 'retorno'))
-                else:
-                    rechazos += 1
-                inter = np.random.choice(interarribos) / factor_demanda
-                prox = t + inter
-                if prox < tiempo_sim:
-                    heapq.heappush(eventos, (prox, 'arribo'))
-            elif tipo == 'retorno':
-                stock += 1
-            historico_stock.append(stock)
-        
-        pct_rech = (rechazos / llegadas * 100) if llegadas > 0 else 0
-        rechazos_lista.append(pct_rech)
-        stock_prom_lista.append(np.mean(historico_stock) if historico_stock else s0)
-    
-    return {
-        'pct_rechazos_media': float(np.mean(rechazos_lista)),
-        'pct_rechazos_ic95': (float(np.percentile(rechazos_lista, 2.5)),
-                              float(np.percentile(rechazos_lista, 97.5))),
-        'stock_promedio': float(np.mean(stock_prom_lista)),
-        'distribucion_rechazos': rechazos_lista
-    }
-
-# ============================================
-# TABS
-# ============================================
-
-tab1, tab2, tab3 = st.tabs(["📊 Dashboard", "🎮 Simulador interactivo", "📈 Resultados empíricos"])
-
-# ─────────────────────────────────────────────────────────
-# TAB 1: DASHBOARD
-# ─────────────────────────────────────────────────────────
-
-with tab1:
-    st.header("Resumen del sistema")
-    
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric("🚴 λ (arribos/h)", f"{parametros['lambda_global']:.2f}")
-    with col2:
-        st.metric("⏱️ Duración media de los viajes", f"{parametros['duracion_media_min']:.0f} min")
-    with col3:
-        st.metric("🔴 Leak empírico", f"{parametros['leak_mediana']*100:.1f}%")
-    with col4:
-        st.metric("✅ S₀ óptimo", f"{parametros['s0_recomendado']} bicis")
-    
-    st.markdown("---")
-    st.subheader("Comparación de escenarios analizados")
-    
-    # Convertir a HTML personalizado
-    html_table = df_resumen.to_html(index=False, escape=False, classes='custom-table')
-    
-    st.markdown("""
-    <style>
+    /* Tabla del dashboard */
     .custom-table {
         width: 100%;
         border-collapse: collapse;
@@ -426,64 +311,381 @@ with tab1:
     }
     </style>
     """, unsafe_allow_html=True)
-    
-    st.markdown(html_table, unsafe_allow_html=True)
-    
-    st.info("ℹ️ El sistema está **naturalmente balanceado**: las devoluciones compensan los retiros en el largo plazo. La búsqueda binaria encontró el stock óptimo en solo 15 evaluaciones.")
 
-# ─────────────────────────────────────────────────────────
-# TAB 3: ANÁLISIS EMPÍRICO
-# ─────────────────────────────────────────────────────────
+# ============================================
+# HEADER CON LOGO
+# ============================================
+
+col_logo, col_titulo = st.columns([0.5, 5])
+
+with col_titulo:
+    st.markdown("# 🚴 Sistema «Mi bici, tu bici» - Rosario")
+    st.markdown("**Distrito Centro** | Simulación de eventos discretos (DES) + Montecarlo")
+
+st.markdown("---")
+
+# ============================================
+# CARGAR DATOS
+# ============================================
+
+# Paquete precompilado de data/ (python -m simulador.bundle), compartido por
+# todas las sesiones: los arrays quedan mapeados en memoria y las tablas ya
+# vienen en HTML, sin pasar por pandas
+@st.cache_resource
+def obtener_datos():
+    return cargar_bundle()
+
+datos = obtener_datos()
+parametros, interarribos_emp, duraciones_emp, metadata = \
+    datos.parametros, datos.interarribos, datos.duraciones, datos.metadata
+
+# Caché en disco compartida por todas las sesiones y reruns
+@st.cache_resource
+def obtener_cache():
+    return CacheEscenarios(Path(".cache") / "escenarios")
+
+# Servicio de simulación compartido por todas las sesiones: cola por sesión
+# con turno rotativo, pedidos idénticos en curso se comparten
+@st.cache_resource
+def obtener_servicio():
+    return ServicioSimulacion(n_hilos=min(2, os.cpu_count() or 1))
+
+# Red de estaciones: la de data/red_estaciones.json si existe; si no, una
+# sintética calibrada con la tasa de Distrito Centro
+@st.cache_resource
+def obtener_red(n_estaciones, s0_medio, semilla):
+    ruta = Path("data") / ARCHIVO_RED
+    from simulador import Red
+    if ruta.exists():
+        return Red.cargar(ruta)
+    return Red.sintetica(n_estaciones, tasa_media_h=parametros['lambda_global'],
+                         s0_medio=s0_medio, semilla=semilla)
+
+# Superficie precalculada con `python -m simulador.superficie`
+@st.cache_resource
+def obtener_superficie():
+    return SuperficieRespuesta.cargar()
+
+# Bondad de ajuste de los muestreadores: una sola vez por proceso
+@st.cache_resource
+def obtener_informe_ajuste():
+    from simulador import informe_ajuste
+    return informe_ajuste(interarribos_emp, duraciones_emp,
+                          cv_interarribo=parametros['cv_interarribo'],
+                          cv_duracion=parametros['cv_duracion'])
+
+@st.fragment(run_every=1.0)
+def mostrar_avance(simulacion):
+    # Se re-ejecuta sola cada segundo mientras la simulación corre en su
+    # hilo; al terminar, recarga la página completa con los resultados
+    if simulacion.terminada:
+        st.rerun()
+    estado = simulacion.estado()
+    servicio = obtener_servicio().estado()
+    st.caption(f"🖥️ Servicio: {servicio['en_curso']} en curso · {servicio['en_cola']} en cola · "
+               f"espera media {servicio['espera_media_s']:.0f} s")
+    if estado['en_cola']:
+        st.info(f"🕒 En cola: posición {estado['posicion']} ({estado['espera_s']:.0f} s esperando)")
+        if st.button("⛔ Cancelar simulación", disabled=simulacion.cancelada):
+            simulacion.cancelar()
+        return
+    if estado['compartido']:
+        st.caption("🤝 Otra sesión pidió el mismo escenario: se comparte la corrida")
+    if simulacion.tarea != 'escenario':
+        # Búsqueda de S₀ o largo plazo: avanzan de a una evaluación o
+        # trayectoria y no tienen resultados parciales
+        if simulacion.tarea == 'optimizar':
+            st.info(f"⏳ Buscando S₀: {estado['n_hechas']} evaluaciones "
+                    f"({estado['transcurrido_s']:.0f} s)")
+        else:
+            eta = f" · faltan ~{estado['eta_s']:.0f} s" if estado['eta_s'] is not None else ""
+            st.progress(estado['fraccion'],
+                        text=f"⏳ {estado['n_hechas']} de {estado['n_total']} trayectorias "
+                             f"({estado['transcurrido_s']:.0f} s){eta}")
+        if st.button("⛔ Cancelar", disabled=simulacion.cancelada):
+            simulacion.cancelar()
+        if simulacion.cancelada:
+            st.caption("Cancelando: se detiene al terminar la evaluación o trayectoria en curso")
+        return
+    eta = f" · faltan ~{estado['eta_s']:.0f} s" if estado['eta_s'] is not None else ""
+    st.progress(estado['fraccion'],
+                text=f"⏳ {estado['n_hechas']} de {estado['n_total']} réplicas "
+                     f"({estado['transcurrido_s']:.0f} s){eta}")
+    if st.button("⛔ Cancelar simulación", disabled=simulacion.cancelada):
+        simulacion.cancelar()
+    if simulacion.cancelada:
+        st.caption("Cancelando: se detiene antes de la réplica siguiente "
+                   "(el motor vectorizado termina el lote en curso)")
+
+    if estado['media'] is not None:
+        col_p1, col_p2 = st.columns(2)
+        with col_p1:
+            st.metric("% Rechazos promedio (parcial)", f"{estado['media']:.2f}%")
+        with col_p2:
+            if estado['media_ic95'] is not None:
+                lo, hi = estado['media_ic95']
+                st.metric("IC95 de la media (parcial)", f"[{lo:.2f}%, {hi:.2f}%]")
+        fig = go.Figure()
+        fig.add_histogram(
+            x=estado['distribucion_rechazos'],
+            nbinsx=40,
+            marker_color='rgba(0, 119, 182, 0.6)',
+            marker_line_color='white',
+            marker_line_width=1
+        )
+        fig.add_vline(x=5, line_dash="dash", line_color="red", line_width=3)
+        fig.update_layout(
+            xaxis_title="% Rechazos por Réplica",
+            yaxis_title="Frecuencia",
+            height=350,
+            template='plotly_white'
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
-with tab3:
-    st.header("Resultados del análisis empírico")
-    st.subheader("Curva de sensibilidad: S₀ vs % rechazos")
-    
-    fig = go.Figure()
-    fig.add_scatter(
-        x=df_resultados['S0'],
-        y=df_resultados['pct_medio'],
-        mode='lines+markers',
-        name='% Rechazos',
-        line=dict(color='#0077b6', width=3),
-        marker=dict(size=8)
+def mostrar_red(simulacion):
+    resultados = simulacion.resultado
+    umbral = parametros['umbral_servicio_pct']
+    n_usadas = resultados['n_replicas_usadas']
+    if resultados.get('motivo_parada') == 'cancelada':
+        st.warning(f"⛔ Simulación cancelada: resultados parciales con {n_usadas} de {simulacion.n_total} réplicas")
+    else:
+        st.success("✅ Simulación de la red completada")
+    ranking = resultados['ranking']
+    en_riesgo = int((ranking['ic95_sup'] >= umbral).sum())
+    lo, hi = resultados['pct_rechazos_media_ic95']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("❌ % Rechazos de la red", f"{resultados['pct_rechazos_media']:.2f}%",
+                  help=f"IC95 de la media: [{lo:.2f}%, {hi:.2f}%]")
+    with col2:
+        st.metric("⚠️ Estaciones en riesgo", f"{en_riesgo} / {resultados['n_estaciones']}",
+                  help=f"IC95 superior de la estación ≥ {umbral:g}%")
+    with col3:
+        st.metric("🚫 P(alguna estación vacía)", f"{resultados['prob_stockout']*100:.0f}%")
+    with col4:
+        st.metric("⚡ Eventos simulados", f"{resultados['eventos_simulados']:,}")
+    
+    st.subheader("Estaciones de mayor riesgo")
+    top = ranking.head(30)
+    fig = go.Figure(go.Bar(
+        x=top['estacion'],
+        y=top['pct_rechazos'],
+        error_y=dict(type='data', symmetric=False,
+                     array=(top['ic95_sup'] - top['pct_rechazos']).clip(lower=0),
+                     arrayminus=(top['pct_rechazos'] - top['ic95_inf']).clip(lower=0)),
+        marker_color=np.where(top['ic95_sup'] >= umbral, '#c62828', '#2e7d32')
+    ))
+    fig.add_hline(y=umbral, line_dash="dash", line_color="red",
+                  annotation_text=f"Umbral {umbral:g}%", annotation_position="right")
+    fig.update_layout(
+        xaxis_title="Estación",
+        yaxis_title="% Rechazos",
+        height=400,
+        template='plotly_white',
+        paper_bgcolor='#ffffff',
+        plot_bgcolor='#ffffff',
+        font=dict(color='#424242')
     )
-    fig.add_hline(y=5, line_dash="dash", line_color="red",
-                 annotation_text="Umbral 5%", annotation_position="right")
-    fig.add_vline(x=parametros['s0_recomendado'], line_dash="dot",
-                 line_color="green", annotation_text=f"S₀ óptimo = {parametros['s0_recomendado']}")
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(ranking.round(2), use_container_width=True, height=400)
+    st.caption("Ordenadas por % de rechazos (a igualdad, por P(stockout) y horas vacías). "
+               "flujo_neto_h < 0: la estación entrega más bicis de las que recibe.")
+
+def mostrar_busqueda(simulacion):
+    busqueda = simulacion.resultado
+    umbral = simulacion.parametros['umbral_pct']
+    st.success("✅ Búsqueda completada")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        s0_txt = f"{busqueda['s0_optimo']} bicis" if busqueda['s0_optimo'] else "> 150"
+        st.metric("✅ S₀ mínimo", s0_txt)
+    with col2:
+        st.metric("🔁 Réplicas simuladas",
+                  f"{busqueda['replicas_usadas']:,} / {busqueda['replicas_sin_parada']:,}",
+                  help="Con parada temprana / evaluando siempre todas las réplicas")
+    with col3:
+        st.metric("⚡ Eventos simulados", f"{busqueda['eventos_totales']:,}")
+    
+    st.subheader("Camino de la búsqueda binaria")
+    import pandas as pd
+    df_camino = pd.DataFrame(busqueda['evaluaciones'])
+    df_camino.index = np.arange(1, len(df_camino) + 1)
+    st.dataframe(df_camino, use_container_width=True)
+    st.caption(f"Todas las evaluaciones usan los mismos números aleatorios; cada una se detiene "
+               f"cuando el intervalo de Clopper-Pearson decide el criterio (IC95 < {umbral:g}%).")
+    if busqueda['cota_analitica']:
+        lo_a, hi_a = busqueda['cota_analitica']
+        st.caption(f"⚡ El estimador analítico acotó la búsqueda a S₀ ∈ [{lo_a}, {hi_a}] antes de correr la DES.")
+    
+    if busqueda['s0_optimo'] is None:
+        st.error("❌ Ni siquiera S₀=150 cumple el criterio con estos parámetros.")
+
+def mostrar_largo_plazo(simulacion):
+    largo = simulacion.resultado
+    s0_usuario = simulacion.parametros['s0']
+    dias_largo = simulacion.parametros['dias']
+    n_trayectorias = simulacion.parametros['n_trayectorias']
+    lo_lp, hi_lp = largo['ic95']
+    if largo['estacionario']:
+        st.success("✅ Régimen estacionario alcanzado")
+    else:
+        st.warning(f"⚠️ Los lotes muestran tendencia (p = {largo['p_tendencia']:.3g}): "
+                   f"el sistema no se estabiliza en {dias_largo} días y el IC no es de largo plazo")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("❌ Rechazos de largo plazo", f"{largo['pct_rechazos_largo_plazo']:.2f}%",
+                  help=f"IC95 por medias de lotes: [{lo_lp:.2f}%, {hi_lp:.2f}%]")
+        st.caption(f"IC95: [{lo_lp:.2f}%, {hi_lp:.2f}%]")
+    with col2:
+        st.metric("📦 Stock medio estacionario", f"{largo['stock_medio']:.1f}")
+    with col3:
+        st.metric("🔥 Calentamiento descartado", f"{largo['warmup_dias']:.0f} días")
+    with col4:
+        st.metric("🚲 Flota al final", f"{largo['flota_final']} / {s0_usuario}",
+                  help="Bicis que siguen en el sistema (el leak las saca para siempre)")
+    
+    agotamientos = [d for d in largo['agotamiento_dias'] if d is not None]
+    primeros_ceros = [d for d in largo['primer_cero_dias'] if d is not None]
+    col_a1, col_a2, col_a3 = st.columns(3)
+    with col_a1:
+        st.metric("⏳ Primer stock cero",
+                  f"día {np.mean(primeros_ceros):.0f}" if primeros_ceros else "nunca",
+                  help=f"Promedio de las trayectorias que llegaron a cero ({len(primeros_ceros)} de {n_trayectorias})")
+    with col_a2:
+        st.metric("🪫 Flota agotada",
+                  f"día {np.mean(agotamientos):.0f}" if agotamientos else "nunca",
+                  help=f"Promedio de las trayectorias que perdieron todas las bicis ({len(agotamientos)} de {n_trayectorias})")
+    with col_a3:
+        st.metric("⚡ Eventos simulados", f"{largo['eventos_simulados']:,}")
+    st.caption(f"🧮 {largo['n_lotes']} lotes de {largo['dias_por_lote']:.0f} días · "
+               f"autocorrelación entre lotes {largo['autocorrelacion_lotes']:.2f} · "
+               f"costo ≈ {largo['costo_relativo']*100:.0f}% del de {largo['n_lotes']} réplicas "
+               f"independientes con su propio calentamiento")
+    
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=("Stock y flota", "% rechazos por ventana"))
+    for i, tr in enumerate(largo['trayectorias']):
+        pct_ventana = np.where(tr['llegadas'] > 0,
+                               tr['rechazos'] / np.maximum(tr['llegadas'], 1) * 100, 0.0)
+        fig.add_scatter(x=tr['t_dias'], y=tr['stock_medio'], mode='lines',
+                        name=f"Stock medio #{i+1}", line=dict(color='#0077b6', width=1),
+                        row=1, col=1)
+        fig.add_scatter(x=tr['t_dias'], y=tr['flota'], mode='lines',
+                        name=f"Flota #{i+1}", line=dict(color='#2e7d32', width=1, dash='dot'),
+                        row=1, col=1)
+        fig.add_scatter(x=tr['t_dias'], y=pct_ventana, mode='lines',
+                        name=f"% rechazos #{i+1}", line=dict(color='#c62828', width=1),
+                        row=2, col=1)
+    if largo['warmup_dias'] > 0:
+        fig.add_vrect(x0=0, x1=largo['warmup_dias'], fillcolor='#bdbdbd', opacity=0.3,
+                      line_width=0, annotation_text="Calentamiento", annotation_position="top left")
     fig.update_layout(
-        xaxis_title="% Rechazos por Réplica",
-        yaxis_title="Frecuencia",
-        height=450,
+        height=550,
         template='plotly_white',
         paper_bgcolor='#ffffff',
         plot_bgcolor='#ffffff',
         font=dict(color='#424242'),
-        xaxis=dict(
-            title_font=dict(color='#424242'),
-            tickfont=dict(color='#424242'),
-            gridcolor='#e0e0e0'  # ← Gris claro
-        ),
-        yaxis=dict(
-            title_font=dict(color='#424242'),
-            tickfont=dict(color='#424242'),
-            gridcolor='#e0e0e0'  # ← Gris claro
-        ),
+        showlegend=False,
         hovermode='x'
     )
+    fig.update_xaxes(title_text="Día", row=2, col=1)
+    st.plotly_chart(fig, use_container_width=True)
 
+# ============================================
+# TABS
+# ============================================
 
+# Con on_change="rerun" se sabe qué pestaña está abierta: las que solo
+# muestran resultados se dibujan recién al abrirlas. El simulador se dibuja
+# siempre para no perder el estado de sus controles.
+tab1, tab2, tab3 = st.tabs(["📊 Dashboard", "🎮 Simulador interactivo", "📈 Resultados empíricos"],
+                           key="pestana", on_change="rerun")
 
+# ─────────────────────────────────────────────────────────
+# TAB 1: DASHBOARD
+# ─────────────────────────────────────────────────────────
 
-    st.plotly_chart(fig, use_container_width=True)
-    
-    st.subheader("Metadata del análisis")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Observaciones", f"{metadata['n_observaciones']:,}")
-    with col2:
-        st.metric("Evaluaciones DES", metadata['n_evaluaciones'])
+if tab1.open:
+    with tab1:
+        st.header("Resumen del sistema")
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("🚴 λ (arribos/h)", f"{parametros['lambda_global']:.2f}")
+        with col2:
+            st.metric("⏱️ Duración media de los viajes", f"{parametros['duracion_media_min']:.0f} min")
+        with col3:
+            st.metric("🔴 Leak empírico", f"{parametros['leak_mediana']*100:.1f}%")
+        with col4:
+            st.metric("✅ S₀ óptimo", f"{parametros['s0_recomendado']} bicis")
+
+        st.markdown("---")
+        st.subheader("Comparación de escenarios analizados")
+
+        # Convertir a HTML personalizado
+        html_table = datos.html['resumen'].replace('class="dataframe"',
+                                                   'class="dataframe custom-table"', 1)
+        st.markdown(html_table, unsafe_allow_html=True)
+
+        st.info("ℹ️ El sistema está **naturalmente balanceado**: las devoluciones compensan los retiros en el largo plazo. La búsqueda binaria encontró el stock óptimo en solo 15 evaluaciones.")
+
+# ─────────────────────────────────────────────────────────
+# TAB 3: ANÁLISIS EMPÍRICO
+# ─────────────────────────────────────────────────────────
+
+if tab3.open:
+    with tab3:
+        st.header("Resultados del análisis empírico")
+        st.subheader("Curva de sensibilidad: S₀ vs % rechazos")
+
+        fig = go.Figure()
+        fig.add_scatter(
+            x=datos.df_resultados['S0'],
+            y=datos.df_resultados['pct_medio'],
+            mode='lines+markers',
+            name='% Rechazos',
+            line=dict(color='#0077b6', width=3),
+            marker=dict(size=8)
+        )
+        fig.add_hline(y=5, line_dash="dash", line_color="red",
+                     annotation_text="Umbral 5%", annotation_position="right")
+        fig.add_vline(x=parametros['s0_recomendado'], line_dash="dot",
+                     line_color="green", annotation_text=f"S₀ óptimo = {parametros['s0_recomendado']}")
+        fig.update_layout(
+            xaxis_title="% Rechazos por Réplica",
+            yaxis_title="Frecuencia",
+            height=450,
+            template='plotly_white',
+            paper_bgcolor='#ffffff',
+            plot_bgcolor='#ffffff',
+            font=dict(color='#424242'),
+            xaxis=dict(
+                title_font=dict(color='#424242'),
+                tickfont=dict(color='#424242'),
+                gridcolor='#e0e0e0'  # ← Gris claro
+            ),
+            yaxis=dict(
+                title_font=dict(color='#424242'),
+                tickfont=dict(color='#424242'),
+                gridcolor='#e0e0e0'  # ← Gris claro
+            ),
+            hovermode='x'
+        )
+
+
+
+
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("Metadata del análisis")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Observaciones", f"{metadata['n_observaciones']:,}")
+        with col2:
+            st.metric("Evaluaciones DES", metadata['n_evaluaciones'])
         
 # ─────────────────────────────────────────────────────────
 # TAB 2: SIMULADOR
@@ -494,6 +696,18 @@ with tab2:
     
     st.markdown("### ⚙️ Configuración del escenario")
     
+    modo = st.radio(
+        "Modo",
+        options=["Escenario", "Optimizar S₀", "Largo plazo", "Red de estaciones"],
+        horizontal=True,
+        help="Optimizar S₀ busca el menor stock que cumple el criterio de servicio. "
+             "Largo plazo corre pocas trayectorias muy largas y estima el régimen estacionario. "
+             "Red de estaciones simula muchas estaciones con viajes entre ellas"
+    )
+    optimizar = modo == "Optimizar S₀"
+    largo_plazo = modo == "Largo plazo"
+    en_red = modo == "Red de estaciones"
+    
     col_s0, col_demanda, col_leak = st.columns(3)
     
     with col_s0:
@@ -503,6 +717,7 @@ with tab2:
             max_value=150,
             value=42,
             step=1,
+            disabled=optimizar,
             help="Bicis disponibles al inicio"
         )
     
@@ -526,46 +741,411 @@ with tab2:
             help="% bicis que no retornan"
         )
     
-    col_hz, col_reps = st.columns(2)
+    col_hz, col_reps, col_motor, col_workers = st.columns(4)
     
     with col_hz:
         horizonte_dias = st.selectbox(
             "🕐 Horizonte temporal",
             options=[7, 14, 30],
             index=0,
-            format_func=lambda x: f"{x} días"
+            format_func=lambda x: f"{x} días",
+            disabled=largo_plazo
         )
     
     with col_reps:
         n_replicas = st.selectbox(
             "🔁 Réplicas Montecarlo",
             options=[100, 300, 500, 1000],
-            index=1
+            index=1,
+            disabled=largo_plazo
+        )
+    
+    with col_motor:
+        motor = st.selectbox(
+            "⚙️ Motor de simulación",
+            options=list(MOTORES),
+            index=0,
+            format_func=lambda x: MOTORES[x],
+            disabled=largo_plazo or en_red,
+            help="Ambos motores consumen los mismos flujos aleatorios por réplica: sirven para contrastar resultados"
         )
     
+    with col_workers:
+        n_workers = st.number_input(
+            "🧮 Procesos en paralelo",
+            min_value=1,
+            max_value=os.cpu_count() or 1,
+            value=1,
+            step=1,
+            disabled=largo_plazo,
+            help="Reparte las réplicas entre procesos; el resultado es idéntico al serial"
+        )
+    
+    if en_red:
+        if (Path("data") / ARCHIVO_RED).exists():
+            red = obtener_red(0, 0, 0)
+            st.caption(f"🗺️ Red de data/{ARCHIVO_RED}: {red.n} estaciones, {int(red.s0.sum())} bicis")
+        else:
+            col_n_est, col_sem_red = st.columns(2)
+            with col_n_est:
+                n_estaciones = st.number_input(
+                    "🗺️ Estaciones (red sintética)",
+                    min_value=2,
+                    max_value=500,
+                    value=100,
+                    step=10,
+                    help=f"Sin data/{ARCHIVO_RED}, se genera una red con la tasa de Distrito Centro "
+                         "y destinos por modelo de gravedad"
+                )
+            with col_sem_red:
+                semilla_red = st.number_input("🎲 Semilla de la red", min_value=0, value=0, step=1)
+            red = obtener_red(n_estaciones, s0_usuario, semilla_red)
+            st.caption(f"🗺️ Red sintética: {red.n} estaciones, {int(red.s0.sum())} bicis "
+                       f"(S₀ de cada estación proporcional a sus retiros, {s0_usuario} en promedio)")
+    
+    if largo_plazo:
+        col_dias, col_ventana, col_tray = st.columns(3)
+        with col_dias:
+            dias_largo = st.number_input(
+                "📅 Días simulados",
+                min_value=60,
+                max_value=3650,
+                value=365,
+                step=30,
+                help="Largo de cada trayectoria; el calentamiento se descarta solo (MSER-5)"
+            )
+        with col_ventana:
+            ancho_ventana_h = st.selectbox(
+                "🪟 Ventana de registro",
+                options=[6, 12, 24],
+                index=2,
+                format_func=lambda x: f"{x} h",
+                help="Rechazos y stock se acumulan por ventana; los lotes agrupan ventanas consecutivas"
+            )
+        with col_tray:
+            n_trayectorias = st.number_input(
+                "🧵 Trayectorias",
+                min_value=1,
+                max_value=5,
+                value=2,
+                step=1,
+                help="Los 20 lotes se reparten entre las trayectorias"
+            )
+    
+    # Aproximación de pérdida de Erlang: se recalcula en cada movimiento de slider
+    estimacion = estimar_analitico(s0_usuario, factor_demanda, leak_usuario,
+                                   horizonte_dias, interarribos_emp, duraciones_emp)
+    st.caption(f"⚡ Estimación analítica instantánea: ~{estimacion['pct_rechazos']:.2f}% rechazos · "
+               f"P(estación vacía) ≈ {estimacion['prob_sin_stock']*100:.1f}% · "
+               f"stock medio ≈ {estimacion['stock_promedio']:.1f}. "
+               f"Aproximada (Erlang B con corrección por variabilidad y leak): confirmar con la DES.")
+    
+    superficie = obtener_superficie()
+    punto = superficie.estimar(s0_usuario, factor_demanda, leak_usuario, horizonte_dias) if superficie else None
+    if punto is not None:
+        st.caption(f"📈 Superficie de respuesta (DES precalculada, {superficie.n_reps} réplicas por celda, interpolada): "
+                   f"~{punto['pct_medio']:.2f}% rechazos · IC95 [{punto['ic_lower']:.2f}%, {punto['ic_upper']:.2f}%] · "
+                   f"P(stockout) ≈ {punto['prob_stockout']*100:.0f}%")
+    
+    with st.expander("🎯 Modo secuencial: parar cuando el resultado es suficientemente preciso"):
+        secuencial = st.checkbox(
+            "Correr réplicas en lotes hasta alcanzar la meta",
+            value=False,
+            disabled=optimizar or largo_plazo or en_red,
+            help="Las réplicas elegidas arriba pasan a ser el tope"
+        )
+        col_semi, col_dec = st.columns(2)
+        with col_semi:
+            semiamplitud = st.number_input(
+                "Semiamplitud objetivo del IC95 de la media (puntos %)",
+                min_value=0.01,
+                max_value=10.0,
+                value=0.5,
+                step=0.05,
+                disabled=not secuencial
+            )
+        with col_dec:
+            parar_por_decision = st.checkbox(
+                f"Parar también cuando el criterio (< {parametros['umbral_servicio_pct']:g}%) quede decidido",
+                value=True,
+                disabled=not secuencial
+            )
+    
+    with st.expander("🧪 Reducción de varianza"):
+        col_anti, col_control = st.columns(2)
+        with col_anti:
+            antiteticas = st.checkbox(
+                "Variables antitéticas",
+                value=False,
+                disabled=en_red,
+                help="Empareja réplicas con uniformes u y 1-u"
+            )
+        with col_control:
+            variable_control = st.checkbox(
+                "Variable de control (cantidad de arribos)",
+                value=False,
+                disabled=en_red,
+                help="Ajusta la media con los arribos de cada réplica, cuya esperanza se conoce"
+            )
+    
+    with st.expander("🎲 Muestreo de interarribos y duraciones", key="exp_muestreo",
+                     on_change="rerun") as exp_muestreo:
+        muestreo = st.selectbox(
+            "Muestreador",
+            options=list(MUESTREOS),
+            index=0,
+            format_func=lambda x: MUESTREOS[x],
+            help="Las distribuciones ajustadas usan la media de los datos y los CV de parametros_simulacion.json"
+        )
+        # El informe (ajustes con scipy) se calcula solo con el panel abierto
+        if exp_muestreo.open:
+            st.caption("Bondad de ajuste de cada muestreador contra los datos crudos "
+                       "(KS y Wasserstein: menor es mejor; los datos están en minutos enteros)")
+            st.dataframe(
+                obtener_informe_ajuste().round(3),
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    with st.expander("🕐 Perfil horario de arribos"):
+        opciones_perfil = [k for k in PERFILES if k != 'archivo' or cargar_perfil() is not None]
+        nombre_perfil = st.selectbox(
+            "Intensidad según la hora del día",
+            options=opciones_perfil,
+            index=0,
+            format_func=lambda x: PERFILES[x],
+            help="Conserva la tasa media: reparte los arribos entre horas pico y valle. "
+                 "El perfil derivado se genera con python -m simulador.arribos <registros.csv>"
+        )
+        perfil = crear_perfil(nombre_perfil)
+        if perfil is None:
+            st.caption("Tasa constante durante todo el día.")
+        else:
+            fig_perfil = go.Figure(go.Bar(
+                x=np.arange(24),
+                y=perfil.por_hora_del_dia() * parametros['lambda_global'] * factor_demanda,
+                marker_color='#0077b6'
+            ))
+            fig_perfil.update_layout(
+                xaxis_title="Hora del día",
+                yaxis_title="Arribos por hora",
+                height=250,
+                margin=dict(l=20, r=20, t=20, b=20),
+                template='plotly_white'
+            )
+            st.plotly_chart(fig_perfil, use_container_width=True)
+            st.caption("La estimación analítica y la superficie de respuesta suponen tasa constante: "
+                       "con perfil, solo la DES lo tiene en cuenta.")
+    
+    with st.expander("🚚 Rebalanceo con camión"):
+        rebalancear = st.checkbox(
+            "Reponer bicis con una política (s, S)",
+            value=False,
+            disabled=optimizar or largo_plazo or en_red,
+            help="Cuando el stock baja a s, un camión llega después de la demora y completa hasta S "
+                 "con lo que trae. Solo con el motor de eventos."
+        )
+        col_s, col_S, col_cap, col_dem = st.columns(4)
+        with col_s:
+            s_reb = st.number_input("s (pedir con)", min_value=0, max_value=149, value=5,
+                                    disabled=not rebalancear)
+        with col_S:
+            S_reb = st.number_input("S (completar hasta)", min_value=1, max_value=150,
+                                    value=max(int(s0_usuario), 6), disabled=not rebalancear)
+        with col_cap:
+            capacidad_camion = st.number_input("Capacidad del camión", min_value=1, max_value=100,
+                                               value=20, disabled=not rebalancear)
+        with col_dem:
+            demora_camion = st.number_input("Demora (min)", min_value=0, max_value=1440, value=60,
+                                            step=15, disabled=not rebalancear)
+        col_rev, col_per = st.columns(2)
+        with col_rev:
+            revision = st.radio("Revisión del stock", ["Continua", "Periódica"], horizontal=True,
+                                disabled=not rebalancear)
+        with col_per:
+            periodo_h = st.number_input("Cada (horas)", min_value=1, max_value=168, value=12,
+                                        disabled=not rebalancear or revision == "Continua")
+        politica = None
+        if rebalancear:
+            from simulador import PoliticaRebalanceo
+            if s_reb >= S_reb:
+                st.error("s tiene que ser menor que S")
+            else:
+                politica = PoliticaRebalanceo(
+                    s_reb, S_reb, capacidad_camion, demora_camion,
+                    periodo_h * 60.0 if revision == "Periódica" else None)
+        if politica is not None and st.button("🏁 Comparar con políticas vecinas"):
+            from simulador import evaluar_politicas
+            from simulador.rebalanceo import COSTO_VIAJE, grilla_politicas
+            candidatas = [None] + grilla_politicas(
+                sorted({max(s_reb - 3, 0), s_reb, s_reb + 3}),
+                sorted({max(S_reb - 5, 1), S_reb, S_reb + 5}),
+                [capacidad_camion], [demora_camion], [politica.periodo_min])
+            with st.spinner(f"⏳ Comparando {len(candidatas)} políticas..."):
+                comparacion = evaluar_politicas(
+                    candidatas, s0_usuario, factor_demanda, leak_usuario, horizonte_dias,
+                    interarribos_emp, duraciones_emp, n_max=n_replicas, n_workers=n_workers,
+                    muestreo=muestreo, perfil=perfil)
+            mejor = comparacion['mejor']
+            st.success(f"🏆 Mejor: {'Sin rebalanceo' if mejor is None else mejor.descripcion()}")
+            st.dataframe(comparacion['ranking'], use_container_width=True, hide_index=True)
+            st.caption(f"Puntaje por réplica = rechazos + {COSTO_VIAJE:g} × viajes de camión. "
+                       f"Ranking y selección (Kim-Nelson) con números aleatorios comunes: "
+                       f"{comparacion['replicas_usadas']:,} réplicas en lugar de "
+                       f"{comparacion['replicas_sin_eliminar']:,}; las dominadas se descartan temprano.")
+    
+    with st.expander("📈 Trayectorias de stock"):
+        registrar = st.checkbox(
+            "Registrar el stock en el tiempo",
+            value=False,
+            disabled=optimizar or largo_plazo or en_red,
+            help="Guarda cada cambio de stock de las réplicas elegidas (6 bytes por cambio; "
+                 "las corridas grandes se vuelcan a un archivo temporal)"
+        )
+        n_registradas = st.slider(
+            "Réplicas a registrar (las primeras)",
+            min_value=1,
+            max_value=1000,
+            value=100,
+            disabled=not registrar
+        )
+    
+    instrumentar = st.checkbox(
+        "⏱️ Medir rendimiento",
+        value=False,
+        disabled=optimizar or largo_plazo or en_red,
+        help="Cuenta eventos por tipo, el largo máximo de la cola de eventos y el tiempo por réplica y por fase"
+    )
+    
     st.markdown("---")
     boton_simular = st.button("🚀 EJECUTAR SIMULACIÓN", type="primary", use_container_width=True)
     
+    umbral = parametros['umbral_servicio_pct']
+    modo = 'optimizar' if optimizar else 'estacionario' if largo_plazo else 'escenario'
+    
     if boton_simular:
-        with st.spinner("⏳ Simulando..."):
-            resultados = simular_escenario(
-                s0=s0_usuario,
-                factor_demanda=factor_demanda,
-                leak_pct=leak_usuario,
-                horizonte_dias=horizonte_dias,
-                n_reps=n_replicas,
-                interarribos=interarribos_emp,
-                duraciones=duraciones_emp
-            )
-        
-        st.success("✅ Simulación completada")
-        
+        # Una simulación nueva reemplaza (y corta) la que esté corriendo
+        anterior = st.session_state.get('simulacion')
+        if anterior is not None:
+            anterior.cancelar()
+        st.session_state['simulacion'] = None
+    if boton_simular and optimizar:
+        pedido = dict(
+            tarea='optimizar',
+            factor_demanda=factor_demanda,
+            leak_pct=leak_usuario,
+            horizonte_dias=horizonte_dias,
+            interarribos=interarribos_emp,
+            duraciones=duraciones_emp,
+            umbral_pct=umbral,
+            n_max=n_replicas,
+            motor=motor,
+            n_workers=n_workers,
+            muestreo=muestreo,
+            perfil=perfil
+        )
+    elif boton_simular and largo_plazo:
+        pedido = dict(
+            tarea='estacionario',
+            s0=s0_usuario,
+            factor_demanda=factor_demanda,
+            leak_pct=leak_usuario,
+            dias=dias_largo,
+            interarribos=interarribos_emp,
+            duraciones=duraciones_emp,
+            n_trayectorias=n_trayectorias,
+            ancho_ventana_h=ancho_ventana_h,
+            muestreo=muestreo,
+            perfil=perfil
+        )
+    elif boton_simular and en_red:
+        pedido = dict(
+            s0=s0_usuario,
+            factor_demanda=factor_demanda,
+            leak_pct=leak_usuario,
+            horizonte_dias=horizonte_dias,
+            n_reps=n_replicas,
+            interarribos=interarribos_emp,
+            duraciones=duraciones_emp,
+            n_workers=n_workers,
+            tam_lote=5,
+            muestreo=muestreo,
+            perfil=perfil,
+            red=red
+        )
+    elif boton_simular:
+        pedido = dict(
+            s0=s0_usuario,
+            factor_demanda=factor_demanda,
+            leak_pct=leak_usuario,
+            horizonte_dias=horizonte_dias,
+            n_reps=n_replicas,
+            interarribos=interarribos_emp,
+            duraciones=duraciones_emp,
+            motor='eventos' if politica is not None else motor,
+            n_workers=n_workers,
+            cache=obtener_cache(),
+            semiamplitud_objetivo=semiamplitud if secuencial else None,
+            umbral_decision=umbral if secuencial and parar_por_decision else None,
+            antiteticas=antiteticas,
+            variable_control=variable_control,
+            instrumentar=instrumentar,
+            muestreo=muestreo,
+            perfil=perfil,
+            trayectorias=n_registradas if registrar else None,
+            rebalanceo=politica
+        )
+    if boton_simular:
+        id_sesion = st.session_state.setdefault('id_sesion', uuid.uuid4().hex)
+        try:
+            st.session_state['simulacion'] = obtener_servicio().enviar(id_sesion, **pedido)
+        except ColaLlena as e:
+            st.error(f"🚦 {e}")
+    
+    simulacion = st.session_state.get('simulacion')
+    if simulacion is None or simulacion.tarea != modo:
+        st.info("👆 Ajustar los parámetros y presionar **EJECUTAR SIMULACIÓN**")
+    elif not simulacion.terminada:
+        mostrar_avance(simulacion)
+    elif simulacion.error is not None:
+        st.error(f"❌ La simulación falló: {simulacion.error}")
+    elif simulacion.resultado is None:
+        st.warning("⛔ Simulación cancelada antes de tener resultados")
+    elif modo == 'optimizar':
+        mostrar_busqueda(simulacion)
+    elif modo == 'estacionario':
+        mostrar_largo_plazo(simulacion)
+    elif 'ranking' in simulacion.resultado:
+        mostrar_red(simulacion)
+    else:
+        resultados = simulacion.resultado
+        s0_sim = simulacion.parametros['s0']
+        n_usadas = resultados['n_replicas_usadas']
+        if resultados.get('motivo_parada') == 'cancelada':
+            st.warning(f"⛔ Simulación cancelada: resultados parciales con {n_usadas} de {simulacion.n_total} réplicas")
+        else:
+            st.success("✅ Simulación completada")
+        if resultados['replicas_desde_cache'] > 0:
+            st.caption(f"♻️ {resultados['replicas_desde_cache']} de {n_usadas} réplicas recuperadas de la caché")
+        if 'factor_reduccion_varianza' in resultados:
+            st.caption(f"🧪 Factor de reducción de varianza: {resultados['factor_reduccion_varianza']:.2f}× "
+                       f"(un factor k equivale a correr k veces más réplicas sin reducción)")
+        if resultados.get('motivo_parada') in ('precision', 'decision', 'tope'):
+            motivos = {
+                'precision': "se alcanzó la precisión pedida",
+                'decision': "el criterio de servicio quedó decidido",
+                'tope': "se llegó al tope de réplicas",
+            }
+            media_lo, media_up = resultados['pct_rechazos_media_ic95']
+            st.info(f"🎯 Réplicas usadas: **{n_usadas}** de {simulacion.n_total} ({motivos[resultados['motivo_parada']]}). "
+                    f"IC95 de la media: [{media_lo:.2f}%, {media_up:.2f}%]")
+    
         pct_medio = resultados['pct_rechazos_media']
         ic_low, ic_up = resultados['pct_rechazos_ic95']
-        cumple = ic_up < 5.0
-        
+        cumple = resultados.get('cumple', ic_up < 5.0)
+    
         col1, col2, col3 = st.columns(3)
-        
+    
         with col1:
             color_rechazo = "#2e7d32" if cumple else "#c62828"
             st.markdown(f"""
@@ -575,16 +1155,16 @@ with tab2:
             <p>IC95: [{ic_low:.2f}%, {ic_up:.2f}%]</p>
             </div>
             """, unsafe_allow_html=True)
-        
+    
         with col2:
             st.markdown(f"""
             <div class="resultado-box">
-            <h3>Stock Promedio</h3>
+            <h3>Stock Promedio (en el tiempo)</h3>
             <h1 style="color: #01579b;">{resultados['stock_promedio']:.1f}</h1>
-            <p>Utilización: {resultados['stock_promedio']/s0_usuario*100:.0f}%</p>
+            <p>Utilización: {resultados['stock_promedio']/s0_sim*100:.0f}%</p>
             </div>
             """, unsafe_allow_html=True)
-        
+    
         with col3:
             estado = "✅ CUMPLE" if cumple else "❌ NO CUMPLE"
             color = "#2e7d32" if cumple else "#c62828"
@@ -595,10 +1175,63 @@ with tab2:
             <p>Nivel de servicio: {100-ic_up:.1f}%</p>
             </div>
             """, unsafe_allow_html=True)
-        
+
+        st.markdown("")
+        col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+        with col_m1:
+            st.metric("🚫 P(stockout)", f"{resultados['prob_stockout']*100:.1f}%",
+                      help="Fracción de réplicas que llegaron a quedarse sin bicis")
+        with col_m2:
+            st.metric("⏱️ Tiempo sin stock", f"{resultados['t_cero_h']:.1f} h",
+                      help="Horas promedio por réplica con stock cero")
+        with col_m3:
+            st.metric("❌ Rechazos por réplica", f"{resultados['rechazos_media']:.1f}")
+        with col_m4:
+            st.metric("📉 Stock mín / máx", f"{resultados['stock_min']} / {resultados['stock_max']}")
+        if 'viajes_camion_media' in resultados:
+            st.caption(f"🚚 Camión: {resultados['viajes_camion_media']:.1f} viajes y "
+                       f"{resultados['bicis_repuestas_media']:.1f} bicis repuestas por réplica · "
+                       f"política {simulacion.parametros['rebalanceo'].descripcion()}")
+
+        if 'diagnostico' in resultados:
+            diag = resultados['diagnostico']
+            with st.expander("⏱️ Rendimiento", expanded=True):
+                tiempos_ms = diag['tiempos_replica_s'] * 1000
+                col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+                with col_r1:
+                    st.metric("🚴 Arribos", f"{diag['eventos_por_tipo']['arribo']:,}")
+                with col_r2:
+                    st.metric("🔁 Retornos", f"{diag['eventos_por_tipo']['retorno']:,}")
+                with col_r3:
+                    st.metric("📚 Cola de eventos máx.", f"{diag['cola_max']:,}",
+                              help="Retornos pendientes más el próximo arribo")
+                with col_r4:
+                    if len(tiempos_ms):
+                        st.metric("⏱️ Tiempo por réplica", f"{tiempos_ms.mean():.2f} ms",
+                                  help=f"p95: {np.percentile(tiempos_ms, 95):.2f} ms · máx: {tiempos_ms.max():.2f} ms")
+                    else:
+                        st.metric("⏱️ Tiempo por réplica", "—", help="Todas las réplicas vinieron de la caché")
+            
+                fases = {k: v for k, v in diag['fases_s'].items() if k != 'total'}
+                fig_fases = go.Figure(go.Bar(
+                    x=[v * 1000 for v in fases.values()],
+                    y=list(fases),
+                    orientation='h',
+                    marker_color='rgba(0, 119, 182, 0.6)'
+                ))
+                fig_fases.update_layout(
+                    xaxis_title="Tiempo (ms)",
+                    height=250,
+                    margin=dict(l=10, r=10, t=10, b=10),
+                    template='plotly_white'
+                )
+                st.plotly_chart(fig_fases, use_container_width=True)
+                st.caption(f"Total: {diag['fases_s']['total']*1000:.0f} ms para {diag['replicas_simuladas']} réplicas simuladas. "
+                           f"Con varios procesos, muestreo y eventos suman el tiempo de todos los workers.")
+
         st.markdown("---")
         st.subheader("Distribución empírica de rechazos (Montecarlo)")
-        
+    
         fig = go.Figure()
         fig.add_histogram(
             x=resultados['distribucion_rechazos'],
@@ -636,42 +1269,83 @@ with tab2:
 
         st.plotly_chart(fig, use_container_width=True)
         
+        registro = resultados.get('trayectorias')
+        if registro is not None and len(registro):
+            from simulador import bandas, lttb
+            from simulador.trayectorias import escalones
+            st.subheader("Stock en el tiempo")
+            abanico = bandas(registro)
+            t_dias = abanico['t_h'] / 24
+            cuantiles = abanico['cuantiles']
+            fig_tray = go.Figure()
+            # Bandas 5–95% y 25–75%: cada una es un borde inferior y uno
+            # superior rellenado hasta el anterior
+            for (q_lo, q_hi), color in [((0.05, 0.95), 'rgba(0, 119, 182, 0.15)'),
+                                        ((0.25, 0.75), 'rgba(0, 119, 182, 0.3)')]:
+                fig_tray.add_scatter(x=t_dias, y=cuantiles[q_lo], mode='lines',
+                                     line=dict(width=0), showlegend=False, hoverinfo='skip')
+                fig_tray.add_scatter(x=t_dias, y=cuantiles[q_hi], mode='lines',
+                                     line=dict(width=0), fill='tonexty', fillcolor=color,
+                                     name=f"{q_lo*100:.0f}–{q_hi*100:.0f}% de las réplicas")
+            fig_tray.add_scatter(x=t_dias, y=cuantiles[0.5], mode='lines', name='Mediana',
+                                 line=dict(color='#0077b6', width=2))
+            # Algunas réplicas individuales, submuestreadas con LTTB para
+            # que el gráfico siga liviano con millones de puntos
+            for rep in registro.replicas[:3]:
+                x, y = escalones(*registro.trayectoria(rep))
+                x, y = lttb(x, y, 2000)
+                fig_tray.add_scatter(x=x / 1440, y=y, mode='lines', name=f"Réplica {rep}",
+                                     line=dict(width=1), opacity=0.6)
+            fig_tray.add_hline(y=0, line_color='#c62828', line_width=1)
+            fig_tray.update_layout(
+                xaxis_title="Día",
+                yaxis_title="Bicis en la estación",
+                height=450,
+                template='plotly_white',
+                paper_bgcolor='#ffffff',
+                plot_bgcolor='#ffffff',
+                font=dict(color='#424242'),
+                hovermode='x'
+            )
+            st.plotly_chart(fig_tray, use_container_width=True)
+            donde = "en un archivo temporal" if registro.en_disco else "en memoria"
+            st.caption(f"Abanico de {abanico['n_replicas']} réplicas: {registro.n_puntos:,} cambios de stock "
+                       f"({registro.nbytes / 2**20:.1f} MB {donde}).")
+    
+        st.subheader("Rechazos por hora del día")
+        fig_hora = make_subplots(specs=[[{"secondary_y": True}]])
+        fig_hora.add_bar(x=np.arange(24), y=resultados['pct_rechazos_hora'],
+                         name='% rechazos', marker_color='rgba(198, 40, 40, 0.7)')
+        fig_hora.add_scatter(x=np.arange(24), y=resultados['llegadas_hora_media'],
+                             mode='lines+markers', name='Arribos por réplica',
+                             line=dict(color='#0077b6', width=2), secondary_y=True)
+        fig_hora.add_hline(y=5, line_dash="dash", line_color="red",
+                           annotation_text="Umbral 5%", annotation_position="right")
+        fig_hora.update_layout(
+            xaxis_title="Hora del día",
+            height=400,
+            template='plotly_white',
+            paper_bgcolor='#ffffff',
+            plot_bgcolor='#ffffff',
+            font=dict(color='#424242'),
+            hovermode='x'
+        )
+        fig_hora.update_yaxes(title_text="% rechazos", secondary_y=False)
+        fig_hora.update_yaxes(title_text="Arribos por réplica", secondary_y=True)
+        st.plotly_chart(fig_hora, use_container_width=True)
+        hora_pico = int(np.argmax(resultados['pct_rechazos_hora']))
+        if resultados['pct_rechazos_hora'][hora_pico] > 0:
+            st.caption(f"🕐 Hora más crítica: {hora_pico:02d}:00–{hora_pico + 1:02d}:00 "
+                       f"con {resultados['pct_rechazos_hora'][hora_pico]:.1f}% de rechazos.")
+    
         st.markdown("### 💬 Interpretación")
         if cumple:
-            st.success(f"✅ **Escenario viable.** Con S₀={s0_usuario} bicis, el sistema garantiza <5 % rechazos con 95 % confianza. Nivel de servicio: {100-ic_up:.1f}%.")
+            st.success(f"✅ **Escenario viable.** Con S₀={s0_sim} bicis, el sistema garantiza <5 % rechazos con 95 % confianza. Nivel de servicio: {100-ic_up:.1f}%.")
         else:
             st.error(f"❌ **Insuficiente.** IC95 superior ({ic_up:.1f}%) > 5 %. Aumentar S₀ o reducir demanda. Nivel de servicio: {100-ic_up:.1f}%.")
-    
-    else:
-        st.info("👆 Ajustar los parámetros y presionar **EJECUTAR SIMULACIÓN**")
 
 
 
 # FOOTER
 st.markdown("---")
 st.markdown("**Desarrollado por:** Stefania Cuicchi | **Curso:** Modelos y Simulación 2025, LAyGD, UNSL | **Método:** DES + Bootstrap + Búsqueda binaria")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
@@ -0,0 +1,36 @@
+import importlib
+
+# Los submódulos se importan recién cuando se usa uno de sus nombres (PEP
+# 562): importar simulador no carga pandas ni scipy hasta que hacen falta,
+# lo que acorta el arranque en frío de la app
+_EXPORTADOS = {
+    'analitico': ['acotar_s0', 'estimar_analitico'],
+    'arribos': ['PERFILES', 'PerfilIntensidad', 'crear_perfil'],
+    'barrido': ['ejecutar_barrido'],
+    'bundle': ['cargar_bundle', 'empaquetar'],
+    'cache': ['CacheEscenarios', 'clave_escenario'],
+    'datos': ['cargar_datos', 'cargar_empiricos'],
+    'estacionario': ['estimar_estacionario'],
+    'estadisticas': ['AcumuladorStock', 'cumple_criterio', 'decision_temprana', 'ic_media'],
+    'ingesta': ['ingerir'],
+    'motor': ['MOTORES', 'MOTORES_REFERENCIA', 'VERSION_MODELO', 'FlujoArribos', 'FlujoMuestras',
+              'concatenar_replicas', 'correr_replicas', 'flujos_replica', 'resumir_replicas',
+              'simular_escenario', 'simular_lote', 'simular_replicas'],
+    'muestreadores': ['MUESTREOS', 'crear_muestreador', 'informe_ajuste'],
+    'optimizacion': ['evaluar_s0', 'optimizar_s0'],
+    'rebalanceo': ['PoliticaRebalanceo', 'evaluar_politicas'],
+    'red': ['Red', 'simular_red'],
+    'trayectorias': ['RegistroTrayectorias', 'bandas', 'lttb'],
+}
+_MODULO_DE = {nombre: modulo for modulo, nombres in _EXPORTADOS.items() for nombre in nombres}
+__all__ = list(_MODULO_DE)
+
+def __getattr__(nombre):
+    if nombre not in _MODULO_DE:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f".{_MODULO_DE[nombre]}", __name__), nombre)
+    globals()[nombre] = valor
+    return valor
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
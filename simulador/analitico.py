@@ -0,0 +1,95 @@
+import numpy as np
+
+# ============================================
+# ESTIMADOR ANALÍTICO (PÉRDIDA DE ERLANG)
+# ============================================
+
+# La estación con S₀ bicis es un sistema de pérdida M/G/c/c: cada bici es un
+# "servidor" ocupado mientras dura el viaje y quien llega sin bicis se pierde.
+# La probabilidad de bloqueo es la fórmula B de Erlang, que no depende de la
+# distribución de duraciones. Dos correcciones:
+#   - arribos más variables que Poisson (cv_interarribo ≈ 2): aproximación
+#     de Hayward, B(c/z, a/z), con la picosidad z de Whitt para G/GI/∞;
+#   - leak: cada viaje atendido pierde la bici con probabilidad p, así que c
+#     decrece en el tiempo (c' = -p·λ·(1-B)) y se promedia B en el horizonte.
+
+def erlang_b_tabla(a, k_max):
+    # B(k, a) para k = 0..k_max por la recursión estable
+    # B(0) = 1, B(k) = a·B(k-1) / (k + a·B(k-1))
+    tabla = np.empty(k_max + 1)
+    tabla[0] = 1.0
+    for k in range(1, k_max + 1):
+        tabla[k] = a * tabla[k - 1] / (k + a * tabla[k - 1])
+    return tabla
+
+def picosidad(interarribos, duraciones):
+    # z ≈ 1 + (ca² - 1)·E[min(S1, S2)]/E[S] (Whitt, G/GI/∞). E[min] es la
+    # integral de la supervivencia al cuadrado de la duración empírica.
+    ca2 = np.var(interarribos) / np.mean(interarribos) ** 2
+    d = np.sort(np.asarray(duraciones, dtype=float))
+    n = len(d)
+    # Supervivencia escalonada: en [d_i, d_{i+1}) vale (n - i - 1)/n
+    supervivencia = (n - np.arange(1, n)) / n
+    e_min = d[0] + np.sum(supervivencia ** 2 * np.diff(d))
+    return max(float(1 + (ca2 - 1) * e_min / np.mean(d)), 1e-6)
+
+def estimar_analitico(s0, factor_demanda, leak_pct, horizonte_dias,
+                      interarribos, duraciones, n_pasos=200):
+    # Estimación instantánea para uno o varios S₀ (escalar o array)
+    escalar = np.ndim(s0) == 0
+    c0 = np.atleast_1d(np.asarray(s0, dtype=float))
+    tasa = factor_demanda / np.mean(interarribos)          # arribos por minuto
+    a = tasa * np.mean(duraciones)                          # carga ofrecida (Erlang)
+    z = picosidad(interarribos, duraciones)
+    leak_prob = leak_pct / 100.0
+    tiempo_sim = horizonte_dias * 24 * 60
+
+    k_max = int(np.ceil(c0.max() / z)) + 1
+    tabla = erlang_b_tabla(a / z, k_max)
+    bloqueo = lambda c: np.interp(np.maximum(c, 0.0) / z, np.arange(k_max + 1), tabla)
+
+    # Euler sobre el horizonte, con B evaluado en el punto medio de cada paso
+    dt = tiempo_sim / n_pasos
+    c = c0.copy()
+    suma_b = np.zeros_like(c0)
+    suma_stock = np.zeros_like(c0)
+    for _ in range(n_pasos):
+        b = bloqueo(c)
+        c_medio = np.maximum(c - 0.5 * dt * leak_prob * tasa * (1 - b), 0.0)
+        b = bloqueo(c_medio)
+        suma_b += b
+        # Bicis en la estación = flota - bicis en viaje (carga cursada)
+        suma_stock += np.maximum(c_medio - a * (1 - b), 0.0)
+        c = np.maximum(c - dt * leak_prob * tasa * (1 - b), 0.0)
+
+    pct = suma_b / n_pasos * 100
+    resultado = {
+        'pct_rechazos': pct,
+        # PASTA: fracción del tiempo con la estación vacía
+        'prob_sin_stock': suma_b / n_pasos,
+        'stock_promedio': suma_stock / n_pasos,
+        'flota_final': c,
+    }
+    if escalar:
+        resultado = {k: float(v[0]) for k, v in resultado.items()}
+    resultado['carga_erlang'] = float(a)
+    resultado['picosidad'] = float(z)
+    return resultado
+
+def acotar_s0(factor_demanda, leak_pct, horizonte_dias, interarribos,
+              duraciones, umbral_pct=5.0, s0_min=1, s0_max=150,
+              fraccion_segura=0.02, margen=0.25):
+    # Rango [lo, hi] donde buscar S₀ con la DES. lo: menor S₀ cuya media
+    # analítica no supera el umbral (con menos, la media ya lo supera y el
+    # percentil 97.5 también). hi: menor S₀ con media por debajo de
+    # fraccion_segura·umbral, más un margen relativo. Son heurísticas: el
+    # optimizador verifica los extremos con la DES y amplía si hace falta.
+    s0s = np.arange(s0_min, s0_max + 1)
+    pct = estimar_analitico(s0s, factor_demanda, leak_pct, horizonte_dias,
+                            interarribos, duraciones)['pct_rechazos']
+    ok = np.nonzero(pct <= umbral_pct)[0]
+    seguro = np.nonzero(pct <= umbral_pct * fraccion_segura)[0]
+    lo = int(s0s[ok[0]]) if len(ok) else s0_max
+    hi = int(s0s[seguro[0]]) if len(seguro) else s0_max
+    hi = min(max(int(np.ceil(hi * (1 + margen))), lo), s0_max)
+    return lo, hi
@@ -0,0 +1,334 @@
+import argparse
+import json
+import math
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from .arribos import PERFILES, crear_perfil
+from .datos import DIRECTORIO_DATOS, cargar_datos
+from .motor import MOTORES, VERSION_MODELO, simular_lote
+from .muestreadores import MUESTREOS
+from .optimizacion import optimizar_s0
+from .servicio import ColaLlena, ServicioSimulacion
+
+# ============================================
+# API HTTP LOCAL
+# ============================================
+
+# POST /simular y POST /optimizar con un JSON de parámetros; GET /salud y
+# GET /estado. Los datos se cargan una vez al arrancar. Los pedidos simples
+# de /simular que llegan juntos se agrupan: los que comparten horizonte,
+# muestreo y perfil corren en una sola llamada al motor vectorizado. Con
+# "stream": true la respuesta es NDJSON: una línea de avance por lote (o
+# por evaluación de S₀) y al final una con el resultado.
+
+PUERTO = 8765
+MAX_REPS = 20000
+# Topes de costo: el trabajo de una corrida crece con demanda × horizonte
+MAX_FACTOR_DEMANDA = 20.0
+MAX_HORIZONTE_DIAS = 365
+
+CAMPOS_LOTE = {'s0', 'factor_demanda', 'leak_pct', 'horizonte_dias', 'n_reps', 'semilla',
+               'muestreo', 'perfil'}
+CAMPOS_SIMULAR = CAMPOS_LOTE | {'motor', 'n_workers', 'semiamplitud_objetivo', 'umbral_decision',
+                                'antiteticas', 'variable_control', 'stream'}
+CAMPOS_OPTIMIZAR = {'factor_demanda', 'leak_pct', 'horizonte_dias', 'umbral_pct', 's0_min',
+                    's0_max', 'n_max', 'semilla', 'muestreo', 'perfil', 'stream'}
+
+def _a_json(valor):
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+def _json(datos):
+    return json.dumps(datos, default=_a_json, ensure_ascii=False)
+
+class Lotizador:
+    # Junta los pedidos que llegan dentro de espera_s y corre juntos los que
+    # comparten horizonte, muestreo y perfil (simular_lote). Los que llegan
+    # mientras corre un lote esperan al siguiente. max_filas acota las
+    # réplicas por corrida (cada fila lleva sus flujos de muestras y su
+    # columna de cada bloque del motor: la memoria crece con las filas).
+    def __init__(self, interarribos, duraciones, espera_s=0.02, max_filas=MAX_REPS):
+        self.interarribos = interarribos
+        self.duraciones = duraciones
+        self.espera_s = espera_s
+        self.max_filas = max_filas
+        self.n_pedidos = 0
+        self.n_corridas = 0
+        self._pendientes = []
+        self._condicion = threading.Condition()
+        threading.Thread(target=self._trabajar, daemon=True).start()
+
+    def enviar(self, escenario, horizonte_dias, muestreo, nombre_perfil, perfil):
+        futuro = Future()
+        with self._condicion:
+            self.n_pedidos += 1
+            self._pendientes.append(((horizonte_dias, muestreo, nombre_perfil), perfil,
+                                     escenario, futuro))
+            self._condicion.notify()
+        return futuro
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                while not self._pendientes:
+                    self._condicion.wait()
+            # Ventana para que lleguen los pedidos concurrentes
+            time.sleep(self.espera_s)
+            with self._condicion:
+                pendientes, self._pendientes = self._pendientes, []
+            grupos = {}
+            for pedido in pendientes:
+                grupos.setdefault(pedido[0], []).append(pedido)
+            for (horizonte_dias, muestreo, _), pedidos in grupos.items():
+                parte, filas = [], 0
+                for pedido in pedidos:
+                    if parte and filas + pedido[2]['n_reps'] > self.max_filas:
+                        self._correr(horizonte_dias, muestreo, parte)
+                        parte, filas = [], 0
+                    parte.append(pedido)
+                    filas += pedido[2]['n_reps']
+                self._correr(horizonte_dias, muestreo, parte)
+
+    def _correr(self, horizonte_dias, muestreo, pedidos):
+        try:
+            resultados = simular_lote([p[2] for p in pedidos], horizonte_dias,
+                                      self.interarribos, self.duraciones, muestreo,
+                                      pedidos[0][1])
+        except Exception as e:
+            for p in pedidos:
+                p[3].set_exception(e)
+            return
+        self.n_corridas += 1
+        for p, resultado in zip(pedidos, resultados):
+            resultado['pedidos_en_lote'] = len(pedidos)
+            p[3].set_result(resultado)
+
+class APISimulacion:
+    # Lógica de la API, independiente de HTTP. emitir(dict) recibe las
+    # líneas de avance cuando se pide stream.
+    def __init__(self, data_dir=DIRECTORIO_DATOS, espera_lote_s=0.02, n_hilos=1):
+        self.data_dir = Path(data_dir)
+        self.parametros, self.interarribos, self.duraciones, *_ = cargar_datos(self.data_dir)
+        self.lotizador = Lotizador(self.interarribos, self.duraciones, espera_lote_s)
+        self.servicio = ServicioSimulacion(n_hilos=n_hilos)
+        self._perfiles = {}
+        self.defectos = {
+            's0': int(self.parametros['s0_recomendado']),
+            'factor_demanda': 1.0,
+            'leak_pct': round(self.parametros['leak_mediana'] * 100, 1),
+            'horizonte_dias': int(self.parametros['horizonte_dias_default']),
+            'n_reps': int(self.parametros['n_replicas_default']),
+            'semilla': 42,
+            'muestreo': 'empirico',
+            'perfil': 'plano',
+            # Solo para /optimizar (los mismos de optimizar_s0)
+            's0_min': 1,
+            's0_max': 150,
+            'n_max': 500,
+        }
+
+    def _perfil(self, nombre):
+        if nombre not in PERFILES:
+            raise ValueError(f"Perfil desconocido: {nombre!r} (opciones: {', '.join(PERFILES)})")
+        if nombre not in self._perfiles:
+            self._perfiles[nombre] = crear_perfil(nombre, self.data_dir)
+        return self._perfiles[nombre]
+
+    def _validar(self, cuerpo, permitidos):
+        if not isinstance(cuerpo, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON")
+        sobrantes = set(cuerpo) - permitidos
+        if sobrantes:
+            raise ValueError(f"Campos desconocidos: {', '.join(sorted(sobrantes))}")
+        p = {k: v for k, v in self.defectos.items() if k in permitidos}
+        p.update(cuerpo)
+        for campo in ('s0', 'horizonte_dias', 'n_reps', 'semilla', 's0_min', 's0_max', 'n_max'):
+            if campo in p and (not isinstance(p[campo], int) or isinstance(p[campo], bool)
+                               or p[campo] < 0):
+                raise ValueError(f"{campo} debe ser un entero no negativo")
+        if 'n_workers' in p and (not isinstance(p['n_workers'], int)
+                                 or isinstance(p['n_workers'], bool) or p['n_workers'] < 1):
+            raise ValueError("n_workers debe ser un entero positivo")
+        # json.loads acepta NaN e Infinity: un factor infinito deja los
+        # interarribos en 0 y la corrida no termina nunca
+        for campo in ('factor_demanda', 'leak_pct', 'umbral_pct', 'semiamplitud_objetivo',
+                      'umbral_decision'):
+            valor = p.get(campo)
+            if valor is not None and (not isinstance(valor, (int, float)) or isinstance(valor, bool)
+                                      or not math.isfinite(valor)):
+                raise ValueError(f"{campo} debe ser un número finito")
+        if not 0 < p['factor_demanda'] <= MAX_FACTOR_DEMANDA or not 0 <= p['leak_pct'] <= 100:
+            raise ValueError(f"factor_demanda debe estar en (0, {MAX_FACTOR_DEMANDA:g}] "
+                             "y leak_pct entre 0 y 100")
+        if not 1 <= p['horizonte_dias'] <= MAX_HORIZONTE_DIAS:
+            raise ValueError(f"horizonte_dias debe estar entre 1 y {MAX_HORIZONTE_DIAS}")
+        for campo in ('n_reps', 'n_max'):
+            if not 2 <= p.get(campo, 2) <= MAX_REPS:
+                raise ValueError(f"{campo} debe estar entre 2 y {MAX_REPS}")
+        if p.get('s0_min', 0) > p.get('s0_max', 0):
+            raise ValueError("s0_min no puede ser mayor que s0_max")
+        if p['muestreo'] not in MUESTREOS:
+            raise ValueError(f"Muestreo desconocido: {p['muestreo']!r}")
+        if p.get('motor', 'eventos') not in MOTORES:
+            raise ValueError(f"Motor desconocido: {p['motor']!r}")
+        return p
+
+    def simular(self, cuerpo, sesion, emitir=None):
+        recibidos = set(cuerpo) if isinstance(cuerpo, dict) else set()
+        p = self._validar(cuerpo, CAMPOS_SIMULAR)
+        stream = bool(p.pop('stream', False))
+        nombre_perfil = p.pop('perfil')
+        perfil = self._perfil(nombre_perfil)
+        if not stream and recibidos <= CAMPOS_LOTE:
+            escenario = {k: p[k] for k in ('s0', 'factor_demanda', 'leak_pct', 'n_reps', 'semilla')}
+            return self.lotizador.enviar(escenario, p['horizonte_dias'], p['muestreo'],
+                                         nombre_perfil, perfil).result()
+
+        # Con opciones del modo secuencial o stream: por el servicio compartido
+        pedido = self.servicio.enviar(sesion, interarribos=self.interarribos,
+                                      duraciones=self.duraciones, perfil=perfil, **p)
+        try:
+            while not pedido.esperar(0.5):
+                if emitir is not None:
+                    estado = pedido.estado()
+                    emitir({k: estado[k] for k in ('n_hechas', 'n_total', 'media', 'media_ic95',
+                                                   'en_cola', 'posicion', 'transcurrido_s')})
+        except BaseException:
+            # El cliente cortó la conexión: si nadie más espera, se cancela
+            pedido.cancelar()
+            raise
+        if pedido.error is not None:
+            raise pedido.error
+        return pedido.resultado
+
+    def optimizar(self, cuerpo, emitir=None):
+        p = self._validar(cuerpo, CAMPOS_OPTIMIZAR)
+        p.pop('stream', None)
+        perfil = self._perfil(p.pop('perfil'))
+        return optimizar_s0(interarribos=self.interarribos, duraciones=self.duraciones,
+                            perfil=perfil, progreso=emitir, **p)
+
+    def estado(self):
+        return {
+            'servicio': self.servicio.estado(),
+            'lotes': {'pedidos': self.lotizador.n_pedidos,
+                      'corridas': self.lotizador.n_corridas},
+        }
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    silencioso = False
+
+    def _responder(self, codigo, datos):
+        cuerpo = _json(datos).encode()
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _emisor(self):
+        # Respuesta NDJSON sin Content-Length: el fin lo marca el cierre
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.end_headers()
+
+        def emitir(datos):
+            self.wfile.write((_json(datos) + '\n').encode())
+            self.wfile.flush()
+        return emitir
+
+    def do_GET(self):
+        api = self.server.api
+        if self.path == '/salud':
+            self._responder(200, {'ok': True, 'version_modelo': VERSION_MODELO,
+                                  'defectos': api.defectos})
+        elif self.path == '/estado':
+            self._responder(200, api.estado())
+        else:
+            self._responder(404, {'error': f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        api = self.server.api
+        if self.path not in ('/simular', '/optimizar'):
+            self._responder(404, {'error': f"Ruta desconocida: {self.path}"})
+            return
+        try:
+            largo = int(self.headers.get('Content-Length', 0))
+            cuerpo = json.loads(self.rfile.read(largo) or b'{}')
+        except ValueError:
+            self._responder(400, {'error': "JSON inválido"})
+            return
+        stream = isinstance(cuerpo, dict) and bool(cuerpo.get('stream'))
+        sesion = self.headers.get('X-Sesion') or self.client_address[0]
+        emitir = None
+        try:
+            if stream:
+                emitir = self._emisor()
+            if self.path == '/simular':
+                resultado = api.simular(cuerpo, sesion, emitir)
+            else:
+                resultado = api.optimizar(cuerpo, emitir)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        except Exception as e:
+            codigo = 503 if isinstance(e, ColaLlena) else 400 if isinstance(e, ValueError) else 500
+            if emitir is None:
+                self._responder(codigo, {'error': str(e)})
+            else:
+                emitir({'error': str(e)})
+            return
+        if emitir is None:
+            self._responder(200, resultado)
+        else:
+            emitir({'resultado': resultado})
+
+    def log_message(self, formato, *args):
+        if not self.silencioso:
+            super().log_message(formato, *args)
+
+def crear_servidor(api, host='127.0.0.1', puerto=PUERTO, silencioso=False):
+    manejador = type('Manejador', (ManejadorAPI,), {'silencioso': silencioso})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    servidor.api = api
+    return servidor
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local de simulación")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    parser.add_argument('--espera-lote-ms', type=float, default=20.0,
+                        help="Ventana para agrupar pedidos concurrentes")
+    parser.add_argument('--hilos', type=int, default=1,
+                        help="Simulaciones no agrupables en simultáneo")
+    parser.add_argument('--silencioso', action='store_true')
+    args = parser.parse_args(argv)
+
+    api = APISimulacion(args.datos, args.espera_lote_ms / 1000, args.hilos)
+    servidor = crear_servidor(api, args.host, args.puerto, args.silencioso)
+    print(f"API de simulación en http://{args.host}:{args.puerto} "
+          "(POST /simular, POST /optimizar, GET /salud, GET /estado)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        api.servicio.cerrar()
+
+if __name__ == '__main__':
+    main()
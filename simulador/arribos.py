@@ -0,0 +1,140 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .datos import DIRECTORIO_DATOS
+
+# ============================================
+# PERFIL HORARIO DE ARRIBOS
+# ============================================
+
+# Los interarribos empíricos vienen mezclados (sin orden temporal): el modelo
+# base es estacionario. Con un perfil, la tasa varía según la hora del día (y
+# del día de la semana) manteniendo la tasa media. Los interarribos empíricos
+# ya incluyen parte de la variabilidad entre horas: con un perfil fuerte el
+# CV efectivo queda algo por encima del de los datos.
+PERFILES = {
+    'plano': "Plano (tasa constante, como hasta ahora)",
+    'doble_pico': "Doble pico de referencia (ilustrativo, no ajustado a los datos)",
+    'archivo': "Derivado de los registros (data/perfil_intensidad.json)",
+}
+ARCHIVO_PERFIL = "perfil_intensidad.json"
+
+# Intensidad relativa por hora de un día laboral típico con picos a las 8 y
+# a las 18: solo para explorar el efecto de las horas pico
+_DOBLE_PICO = [0.3, 0.2, 0.15, 0.1, 0.1, 0.2, 0.6, 1.4, 2.2, 1.5, 1.0, 1.1,
+               1.3, 1.2, 1.1, 1.2, 1.6, 2.2, 2.4, 1.7, 1.1, 0.8, 0.6, 0.4]
+
+class PerfilIntensidad:
+    # Intensidad relativa por hora: 24 valores (un día, desde las 00:00) o 168
+    # (una semana, desde el lunes 00:00), normalizada a media 1. Lambda(t) es
+    # la intensidad acumulada, lineal por tramos: en un período completo vale
+    # lo mismo que el tiempo real.
+    def __init__(self, intensidades):
+        x = np.asarray(intensidades, dtype=float)
+        if x.shape not in ((24,), (168,)):
+            raise ValueError("El perfil debe tener 24 (día) o 168 (semana) valores por hora")
+        if (x < 0).any() or x.sum() <= 0:
+            raise ValueError("Las intensidades deben ser no negativas y no todas cero")
+        # Un piso mínimo evita tramos planos en Lambda (inversa no definida)
+        x = np.maximum(x, 1e-6 * x.mean())
+        self.intensidades = x / x.mean()
+        self.periodo = len(x) * 60.0
+        self._bordes_t = np.arange(len(x) + 1) * 60.0
+        self._bordes_s = np.concatenate([[0.0], np.cumsum(self.intensidades * 60.0)])
+
+    def acumulada(self, t):
+        # Lambda(t): tiempo operativo transcurrido hasta el instante real t
+        k, r = np.divmod(t, self.periodo)
+        return k * self._bordes_s[-1] + np.interp(r, self._bordes_t, self._bordes_s)
+
+    def a_tiempo_real(self, s):
+        # Lambda^-1(s), vectorizada
+        k, r = np.divmod(s, self._bordes_s[-1])
+        return k * self.periodo + np.interp(r, self._bordes_s, self._bordes_t)
+
+    def por_hora_del_dia(self):
+        # Promedio por hora del día (para mostrar un perfil semanal)
+        return self.intensidades.reshape(-1, 24).mean(axis=0)
+
+def perfil_desde_registros(fechas, semanal=False):
+    # Cantidad de retiros por hora (o por día de la semana y hora) dividida
+    # por las veces que esa franja aparece en el período observado, así un
+    # período que no cubre semanas completas no sesga el perfil
+    import pandas as pd
+    fechas = pd.DatetimeIndex(pd.to_datetime(fechas)).dropna()
+    if len(fechas) == 0:
+        raise ValueError("No hay fechas válidas en los registros")
+    franja = fechas.hour.to_numpy()
+    horas = pd.date_range(fechas.min().floor('h'), fechas.max().floor('h'), freq='h')
+    franja_horas = horas.hour.to_numpy()
+    n_franjas = 24
+    if semanal:
+        franja = franja + 24 * fechas.dayofweek.to_numpy()
+        franja_horas = franja_horas + 24 * horas.dayofweek.to_numpy()
+        n_franjas = 168
+    conteos = np.bincount(franja, minlength=n_franjas)
+    exposicion = np.bincount(franja_horas, minlength=n_franjas)
+    return PerfilIntensidad(conteos / np.maximum(exposicion, 1))
+
+def cargar_perfil(data_dir=DIRECTORIO_DATOS):
+    # None si todavía no se generó el archivo
+    ruta = Path(data_dir) / ARCHIVO_PERFIL
+    if not ruta.exists():
+        return None
+    with open(ruta, 'r') as f:
+        return PerfilIntensidad(json.load(f)['intensidad_por_hora'])
+
+def crear_perfil(nombre='plano', data_dir=DIRECTORIO_DATOS):
+    if nombre == 'plano':
+        return None
+    if nombre == 'doble_pico':
+        return PerfilIntensidad(_DOBLE_PICO)
+    if nombre == 'archivo':
+        perfil = cargar_perfil(data_dir)
+        if perfil is None:
+            raise ValueError(f"No existe {Path(data_dir) / ARCHIVO_PERFIL}: "
+                             "generarlo con python -m simulador.arribos")
+        return perfil
+    raise ValueError(f"Perfil desconocido: {nombre!r}")
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Deriva el perfil horario de intensidad de arribos desde los registros de viajes")
+    parser.add_argument('registros', type=Path, help="CSV con una fila por retiro")
+    parser.add_argument('--columna', default='fecha_retiro',
+                        help="Columna con la fecha y hora del retiro")
+    parser.add_argument('--formato', default=None,
+                        help="Formato de fecha de strptime (por defecto se infiere)")
+    parser.add_argument('--semanal', action='store_true',
+                        help="168 valores (día de la semana × hora) en vez de 24")
+    parser.add_argument('--salida', type=Path, default=DIRECTORIO_DATOS / ARCHIVO_PERFIL)
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    inicio = time.perf_counter()
+    columna = pd.read_csv(args.registros, usecols=[args.columna])[args.columna]
+    fechas = pd.to_datetime(columna, format=args.formato, errors='coerce')
+    perfil = perfil_desde_registros(fechas, semanal=args.semanal)
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.salida, 'w') as f:
+        json.dump({
+            'intensidad_por_hora': [round(float(x), 6) for x in perfil.intensidades],
+            'n_registros': int(fechas.notna().sum()),
+            'periodo_inicio': str(fechas.min()),
+            'periodo_fin': str(fechas.max()),
+        }, f, indent=2)
+    pico = int(np.argmax(perfil.por_hora_del_dia()))
+    print(f"Perfil de {len(perfil.intensidades)} horas en {args.salida} "
+          f"(hora pico: {pico:02d}:00, {perfil.por_hora_del_dia()[pico]:.2f}× la media) "
+          f"en {time.perf_counter() - inicio:.1f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import itertools
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .datos import DIRECTORIO_DATOS, cargar_empiricos
+from .motor import simular_escenario
+
+# ============================================
+# BARRIDOS DE PARÁMETROS SIN INTERFAZ
+# ============================================
+
+# Mismo esquema que data/resultados_busqueda_binaria.csv, más las columnas
+# que identifican el escenario
+COLUMNAS_RESULTADOS = ['S0', 'pct_medio', 'ic_lower', 'ic_upper', 'cumple',
+                       'rechazos_media', 'stock_prom', 'prob_stockout', 't_cero_h']
+COLUMNAS_ESCENARIO = ['factor_demanda', 'leak_pct', 'horizonte_dias', 'n_reps', 'semilla']
+
+EJES_GRILLA = ('s0', 'factor_demanda', 'leak_pct', 'horizonte_dias')
+
+def fila_resultados(celda, resumen, umbral_pct, n_reps, semilla):
+    ic_lower, ic_upper = resumen['pct_rechazos_ic95']
+    return {
+        'S0': int(celda['s0']),
+        'pct_medio': float(resumen['pct_rechazos_media']),
+        'ic_lower': float(ic_lower),
+        'ic_upper': float(ic_upper),
+        'cumple': bool(ic_upper < umbral_pct),
+        'rechazos_media': float(resumen['rechazos_media']),
+        'stock_prom': float(resumen['stock_promedio']),
+        'prob_stockout': float(resumen['prob_stockout']),
+        't_cero_h': float(resumen['t_cero_h']),
+        'factor_demanda': float(celda['factor_demanda']),
+        'leak_pct': float(celda['leak_pct']),
+        'horizonte_dias': int(celda['horizonte_dias']),
+        'n_reps': int(n_reps),
+        'semilla': int(semilla),
+    }
+
+def celdas_grilla(grilla):
+    # Producto cartesiano en orden: S₀ varía más rápido
+    ejes = [grilla[e] for e in reversed(EJES_GRILLA)]
+    return [dict(zip(reversed(EJES_GRILLA), valores)) for valores in itertools.product(*ejes)]
+
+def clave_celda(celda):
+    return "|".join([str(int(celda['s0'])), repr(round(float(celda['factor_demanda']), 6)),
+                     repr(round(float(celda['leak_pct']), 6)), str(int(celda['horizonte_dias']))])
+
+def leer_checkpoint(ruta):
+    # Celdas ya terminadas (una línea JSON por celda). Una última línea
+    # truncada por un corte abrupto se ignora.
+    hechas = {}
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return hechas
+    with open(ruta, 'r') as f:
+        for linea in f:
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+            hechas[fila['clave']] = fila['fila']
+    return hechas
+
+def ejecutar_barrido(grilla, interarribos, duraciones, n_reps=500, semilla=42,
+                     motor='vectorizado', umbral_pct=5.0, n_workers=1,
+                     checkpoint=None, progreso=print):
+    celdas = celdas_grilla(grilla)
+    hechas = leer_checkpoint(checkpoint) if checkpoint else {}
+    # Un checkpoint de otro barrido (otras réplicas o semilla) no se reutiliza
+    hechas = {k: f for k, f in hechas.items()
+              if f['n_reps'] == n_reps and f['semilla'] == semilla}
+    pendientes = [c for c in celdas if clave_celda(c) not in hechas]
+    if progreso and hechas:
+        progreso(f"Retomando: {len(celdas) - len(pendientes)}/{len(celdas)} celdas ya hechas")
+
+    lista_parametros = [dict(s0=int(c['s0']), factor_demanda=float(c['factor_demanda']),
+                             leak_pct=float(c['leak_pct']),
+                             horizonte_dias=int(c['horizonte_dias']), n_reps=n_reps,
+                             motor=motor, semilla=semilla)
+                        for c in pendientes]
+    if n_workers > 1:
+        from .paralelo import simular_escenarios_en_paralelo
+        resultados = simular_escenarios_en_paralelo(lista_parametros, interarribos,
+                                                    duraciones, n_workers)
+    else:
+        resultados = ((i, simular_escenario(interarribos=interarribos,
+                                            duraciones=duraciones, **p))
+                      for i, p in enumerate(lista_parametros))
+
+    inicio = time.perf_counter()
+    archivo = None
+    if checkpoint:
+        Path(checkpoint).parent.mkdir(parents=True, exist_ok=True)
+        archivo = open(checkpoint, 'a')
+    try:
+        for n, (i, resumen) in enumerate(resultados, start=1):
+            celda = pendientes[i]
+            fila = fila_resultados(celda, resumen, umbral_pct, n_reps, semilla)
+            hechas[clave_celda(celda)] = fila
+            if archivo:
+                archivo.write(json.dumps({'clave': clave_celda(celda), 'fila': fila}) + "\n")
+                archivo.flush()
+            if progreso:
+                progreso(f"{n}/{len(pendientes)} celdas ({time.perf_counter() - inicio:.0f} s)")
+    finally:
+        if archivo:
+            archivo.close()
+
+    return pd.DataFrame([hechas[clave_celda(c)] for c in celdas],
+                        columns=COLUMNAS_RESULTADOS + COLUMNAS_ESCENARIO)
+
+def escribir_resultados(df, ruta, formato=None):
+    # csv (mismo formato que resultados_busqueda_binaria.csv) o npz
+    # columnar: un array por columna, para barridos grandes
+    ruta = Path(ruta)
+    formato = formato or ('npz' if ruta.suffix == '.npz' else 'csv')
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    if formato == 'csv':
+        df.to_csv(ruta, index=False)
+    elif formato == 'npz':
+        np.savez_compressed(ruta, **{c: df[c].to_numpy() for c in df.columns})
+    else:
+        raise ValueError(f"Formato desconocido: {formato!r}")
+
+def leer_resultados(ruta):
+    ruta = Path(ruta)
+    if ruta.suffix == '.npz':
+        with np.load(ruta) as datos:
+            return pd.DataFrame({c: datos[c] for c in datos.files})
+    return pd.read_csv(ruta)
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Barrido de escenarios S₀ × demanda × leak × horizonte, sin Streamlit")
+    parser.add_argument('--grilla', type=Path,
+                        help="JSON con listas s0, factor_demanda, leak_pct, horizonte_dias "
+                             "(y opcionalmente n_reps, semilla, motor)")
+    parser.add_argument('--s0', type=int, nargs='+')
+    parser.add_argument('--factores', type=float, nargs='+')
+    parser.add_argument('--leaks', type=float, nargs='+')
+    parser.add_argument('--horizontes', type=int, nargs='+')
+    parser.add_argument('--n-reps', type=int)
+    parser.add_argument('--semilla', type=int)
+    parser.add_argument('--motor', choices=['eventos', 'vectorizado'])
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--salida', type=Path, required=True,
+                        help=".csv o .npz (columnar)")
+    parser.add_argument('--checkpoint', type=Path,
+                        help="Avance por celda (JSONL); por defecto <salida>.checkpoint.jsonl")
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    args = parser.parse_args(argv)
+
+    especificacion = json.loads(args.grilla.read_text()) if args.grilla else {}
+    for eje, valor in [('s0', args.s0), ('factor_demanda', args.factores),
+                       ('leak_pct', args.leaks), ('horizonte_dias', args.horizontes),
+                       ('n_reps', args.n_reps), ('semilla', args.semilla),
+                       ('motor', args.motor)]:
+        if valor is not None:
+            especificacion[eje] = valor
+
+    parametros, interarribos, duraciones = cargar_empiricos(args.datos)
+    grilla = {
+        's0': especificacion.get('s0', [parametros['s0_recomendado']]),
+        'factor_demanda': especificacion.get('factor_demanda', [1.0]),
+        'leak_pct': especificacion.get('leak_pct', [parametros['leak_mediana'] * 100]),
+        'horizonte_dias': especificacion.get('horizonte_dias', [parametros['horizonte_dias_default']]),
+    }
+    checkpoint = args.checkpoint or args.salida.with_name(args.salida.name + ".checkpoint.jsonl")
+
+    df = ejecutar_barrido(grilla, interarribos, duraciones,
+                          n_reps=especificacion.get('n_reps', parametros['n_replicas_default']),
+                          semilla=especificacion.get('semilla', 42),
+                          motor=especificacion.get('motor', 'vectorizado'),
+                          umbral_pct=parametros['umbral_servicio_pct'],
+                          n_workers=args.workers, checkpoint=checkpoint)
+    escribir_resultados(df, args.salida)
+    print(f"Listo: {len(df)} escenarios en {args.salida}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from scipy import stats
+
+from .datos import DIRECTORIO_DATOS, cargar_empiricos
+from .motor import (MOTORES, MOTORES_REFERENCIA, VERSION_MODELO, simular_escenario,
+                    simular_replicas)
+
+# ============================================
+# BENCHMARKS DEL MOTOR
+# ============================================
+
+RUTA_BASE = Path("benchmarks") / "base.json"
+
+# Escenarios representativos: el S₀ recomendado en los tres horizontes,
+# demanda alta, leak alto y un caso grande de 1000 réplicas
+ESCENARIOS = [
+    {'nombre': 's0_42_7d', 's0': 42, 'factor_demanda': 1.0, 'leak_pct': 0.6, 'horizonte_dias': 7, 'n_reps': 100},
+    {'nombre': 's0_42_14d', 's0': 42, 'factor_demanda': 1.0, 'leak_pct': 0.6, 'horizonte_dias': 14, 'n_reps': 100},
+    {'nombre': 's0_42_30d', 's0': 42, 'factor_demanda': 1.0, 'leak_pct': 0.6, 'horizonte_dias': 30, 'n_reps': 100},
+    {'nombre': 's0_42_7d_1000', 's0': 42, 'factor_demanda': 1.0, 'leak_pct': 0.6, 'horizonte_dias': 7, 'n_reps': 1000},
+    {'nombre': 'demanda_x5', 's0': 42, 'factor_demanda': 5.0, 'leak_pct': 0.6, 'horizonte_dias': 7, 'n_reps': 100},
+    {'nombre': 'demanda_x10', 's0': 42, 'factor_demanda': 10.0, 'leak_pct': 0.6, 'horizonte_dias': 7, 'n_reps': 100},
+    {'nombre': 'leak_20', 's0': 42, 'factor_demanda': 1.0, 'leak_pct': 20.0, 'horizonte_dias': 7, 'n_reps': 100},
+    {'nombre': 'leak_50', 's0': 42, 'factor_demanda': 1.0, 'leak_pct': 50.0, 'horizonte_dias': 7, 'n_reps': 100},
+]
+
+def _parametros(escenario):
+    return {k: v for k, v in escenario.items() if k != 'nombre'}
+
+def medir(escenario, motor, interarribos, duraciones, repeticiones=3, semilla=42):
+    # Mejor tiempo de varias corridas (el mínimo es el menos afectado por
+    # ruido del sistema). La memoria se mide aparte, en una corrida más, porque
+    # tracemalloc enlentece la ejecución.
+    parametros = _parametros(escenario)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        res = simular_escenario(interarribos=interarribos, duraciones=duraciones,
+                                motor=motor, semilla=semilla, **parametros)
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    simular_escenario(interarribos=interarribos, duraciones=duraciones,
+                      motor=motor, semilla=semilla, **parametros)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    segundos = min(tiempos)
+    return {
+        'escenario': escenario['nombre'],
+        'motor': motor,
+        'segundos': segundos,
+        'eventos': int(res['eventos_simulados']),
+        'eventos_por_s': res['eventos_simulados'] / segundos,
+        'replicas_por_s': parametros['n_reps'] / segundos,
+        'memoria_pico_mb': pico / 2**20,
+    }
+
+def verificar_equivalencia(escenario, interarribos, duraciones, motores=MOTORES,
+                           semilla=42, alfa=0.01):
+    # Cada motor debe reproducir la distribución de % de rechazos del motor
+    # de eventos (referencia). Con semillas distintas, Kolmogorov-Smirnov de
+    # dos muestras: un motor más rápido que cambió el modelo se detecta aunque
+    # no comparta la secuencia de números aleatorios. Con la misma semilla se
+    # informa además si las réplicas coinciden exactamente.
+    motores = list(motores)
+    parametros = _parametros(escenario)
+    reps = range(parametros.pop('n_reps'))
+    referencia = simular_replicas(reps=reps, interarribos=interarribos, duraciones=duraciones,
+                                  motor=motores[0], semilla=semilla, **parametros)['pct_rechazos']
+    independiente = simular_replicas(reps=reps, interarribos=interarribos, duraciones=duraciones,
+                                     motor=motores[0], semilla=semilla + 1,
+                                     **parametros)['pct_rechazos']
+    resultados = []
+    for motor in motores[1:]:
+        misma_semilla = simular_replicas(reps=reps, interarribos=interarribos,
+                                         duraciones=duraciones, motor=motor,
+                                         semilla=semilla, **parametros)['pct_rechazos']
+        otra_semilla = simular_replicas(reps=reps, interarribos=interarribos,
+                                        duraciones=duraciones, motor=motor,
+                                        semilla=semilla + 1, **parametros)['pct_rechazos']
+        ks = stats.ks_2samp(referencia, otra_semilla)
+        resultados.append({
+            'escenario': escenario['nombre'],
+            'motor': motor,
+            'referencia': motores[0],
+            'identicas': bool(np.array_equal(referencia, misma_semilla)
+                              and np.array_equal(independiente, otra_semilla)),
+            'ks_estadistico': float(ks.statistic),
+            'ks_p_valor': float(ks.pvalue),
+            'equivalente': bool(ks.pvalue >= alfa),
+        })
+    return resultados
+
+def correr_benchmarks(interarribos, duraciones, escenarios=ESCENARIOS, motores=MOTORES,
+                      repeticiones=3, equivalencia=True, progreso=print):
+    motores = list(motores)
+    mediciones = []
+    for escenario in escenarios:
+        for motor in motores:
+            m = medir(escenario, motor, interarribos, duraciones, repeticiones)
+            mediciones.append(m)
+            if progreso:
+                progreso(f"{m['escenario']:<16} {motor:<12} {m['segundos']:8.3f} s  "
+                         f"{m['eventos_por_s']:12,.0f} ev/s  {m['replicas_por_s']:9.1f} rep/s  "
+                         f"{m['memoria_pico_mb']:7.1f} MB")
+    equivalencias = []
+    if equivalencia and len(motores) > 1:
+        for escenario in escenarios:
+            equivalencias.extend(verificar_equivalencia(escenario, interarribos, duraciones, motores))
+    return {
+        'version_modelo': VERSION_MODELO,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'plataforma': {'python': platform.python_version(), 'numpy': np.__version__,
+                       'maquina': platform.machine(), 'procesador': platform.processor()},
+        'mediciones': mediciones,
+        'equivalencia': equivalencias,
+    }
+
+def comparar(actual, base, tolerancia=0.10):
+    # Regresiones respecto de la línea base: throughput que cae más que la
+    # tolerancia o memoria que sube más que la tolerancia
+    previas = {(m['escenario'], m['motor']): m for m in base['mediciones']}
+    regresiones = []
+    for m in actual['mediciones']:
+        b = previas.get((m['escenario'], m['motor']))
+        if b is None:
+            continue
+        if m['replicas_por_s'] < b['replicas_por_s'] * (1 - tolerancia):
+            regresiones.append({'escenario': m['escenario'], 'motor': m['motor'],
+                                'metrica': 'replicas_por_s', 'base': b['replicas_por_s'],
+                                'actual': m['replicas_por_s']})
+        if m['memoria_pico_mb'] > b['memoria_pico_mb'] * (1 + tolerancia):
+            regresiones.append({'escenario': m['escenario'], 'motor': m['motor'],
+                                'metrica': 'memoria_pico_mb', 'base': b['memoria_pico_mb'],
+                                'actual': m['memoria_pico_mb']})
+    return regresiones
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del motor de simulación")
+    parser.add_argument('--escenarios', nargs='+', choices=[e['nombre'] for e in ESCENARIOS],
+                        help="Subconjunto de escenarios (por defecto, todos)")
+    parser.add_argument('--motores', nargs='+', choices=list(MOTORES) + list(MOTORES_REFERENCIA),
+                        default=list(MOTORES),
+                        help="El primero es la referencia de la prueba de equivalencia")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--salida', type=Path, help="Guarda los resultados en este JSON")
+    parser.add_argument('--base', type=Path, default=RUTA_BASE,
+                        help="Línea base contra la que comparar")
+    parser.add_argument('--guardar-base', action='store_true',
+                        help="Guarda estos resultados como nueva línea base")
+    parser.add_argument('--tolerancia', type=float, default=0.10)
+    parser.add_argument('--sin-equivalencia', action='store_true')
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    args = parser.parse_args(argv)
+
+    _, interarribos, duraciones = cargar_empiricos(args.datos)
+    escenarios = [e for e in ESCENARIOS if not args.escenarios or e['nombre'] in args.escenarios]
+    actual = correr_benchmarks(interarribos, duraciones, escenarios, args.motores,
+                               args.repeticiones, not args.sin_equivalencia)
+
+    falla = False
+    for eq in actual['equivalencia']:
+        estado = "OK" if eq['equivalente'] else "DISTINTA"
+        print(f"Equivalencia {eq['escenario']:<16} {eq['motor']} vs {eq['referencia']}: "
+              f"{estado} (KS p={eq['ks_p_valor']:.3f}, idénticas={eq['identicas']})")
+        falla |= not eq['equivalente']
+
+    if args.salida:
+        args.salida.parent.mkdir(parents=True, exist_ok=True)
+        args.salida.write_text(json.dumps(actual, indent=2))
+    if args.guardar_base:
+        args.base.parent.mkdir(parents=True, exist_ok=True)
+        args.base.write_text(json.dumps(actual, indent=2))
+        print(f"Línea base guardada en {args.base}")
+    elif args.base.exists():
+        base = json.loads(args.base.read_text())
+        if base.get('version_modelo') != VERSION_MODELO:
+            print(f"Aviso: la línea base es de la versión {base.get('version_modelo')} "
+                  f"del modelo (actual: {VERSION_MODELO})")
+        regresiones = comparar(actual, base, args.tolerancia)
+        for r in regresiones:
+            print(f"REGRESIÓN {r['escenario']} {r['motor']} {r['metrica']}: "
+                  f"{r['base']:.1f} -> {r['actual']:.1f}")
+        if not regresiones:
+            print(f"Sin regresiones respecto de {args.base} (tolerancia {args.tolerancia:.0%})")
+        falla |= bool(regresiones)
+    return 1 if falla else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
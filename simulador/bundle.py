@@ -0,0 +1,254 @@
+import argparse
+import json
+import mmap
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+from .datos import DIRECTORIO_DATOS, cargar_datos
+
+# ============================================
+# PAQUETE DE DATOS PRECOMPILADO
+# ============================================
+
+# Todo lo que cargar_datos lee de data/ en un solo archivo: una cabecera JSON
+# (parámetros, metadata, tablas ya parseadas y su HTML) seguida de los
+# arrays crudos alineados, que se mapean en memoria sin copiarlos. La
+# cabecera guarda tamaño y fecha de cada archivo fuente: si alguno cambió
+# (por ejemplo, después de una ingesta), el paquete se rehace solo.
+
+FORMATO_BUNDLE = 1
+ARCHIVO_BUNDLE = "datos.bundle"
+FUENTES = ("parametros_simulacion.json", "interarribos_empiricos.npy",
+           "duraciones_empiricas.npy", "resultados_busqueda_binaria.csv",
+           "resumen_ejecutivo.csv", "metadata_analisis.json")
+_MAGIA = b"MYSBUNDL"
+_ALINEACION = 64
+
+def _huella_fuentes(data_dir):
+    huella = {}
+    for nombre in FUENTES:
+        st = (Path(data_dir) / nombre).stat()
+        huella[nombre] = [st.st_size, st.st_mtime_ns]
+    return huella
+
+def _alinear(n):
+    return -(-n // _ALINEACION) * _ALINEACION
+
+class Bundle:
+    # Los mismos datos que cargar_datos. Los arrays son de solo lectura; los
+    # DataFrame se arman (e importan pandas) recién al pedirlos: para
+    # mostrar las tablas alcanza con html.
+    def __init__(self, parametros, interarribos, duraciones, metadata, tablas, html,
+                 ruta=None, fuentes=None):
+        self.parametros = parametros
+        self.interarribos = interarribos
+        self.duraciones = duraciones
+        self.metadata = metadata
+        self.html = html
+        self.ruta = ruta
+        self.fuentes = fuentes
+        self._tablas = tablas
+
+    def _tabla(self, nombre):
+        import pandas as pd
+        t = self._tablas[nombre]
+        return pd.DataFrame(t['datos'], columns=t['columnas']).astype(
+            dict(zip(t['columnas'], t['tipos'])))
+
+    @cached_property
+    def df_resultados(self):
+        return self._tabla('resultados')
+
+    @cached_property
+    def df_resumen(self):
+        return self._tabla('resumen')
+
+    def como_tupla(self):
+        # En el orden de cargar_datos
+        return (self.parametros, self.interarribos, self.duraciones, self.df_resultados,
+                self.df_resumen, self.metadata)
+
+def _desde_fuentes(data_dir):
+    parametros, interarribos, duraciones, df_resultados, df_resumen, metadata = \
+        cargar_datos(data_dir)
+    tablas, html = {}, {}
+    for nombre, df in [('resultados', df_resultados), ('resumen', df_resumen)]:
+        tablas[nombre] = {
+            'columnas': [str(c) for c in df.columns],
+            'tipos': [str(t) for t in df.dtypes],
+            'datos': df.to_dict(orient='split', index=False)['data'],
+        }
+        html[nombre] = df.to_html(index=False, escape=False)
+    return Bundle(parametros, interarribos, duraciones, metadata, tablas, html)
+
+def empaquetar(data_dir=DIRECTORIO_DATOS, ruta=None):
+    data_dir = Path(data_dir)
+    ruta = Path(ruta) if ruta else data_dir / ARCHIVO_BUNDLE
+    huella = _huella_fuentes(data_dir)
+    datos = _desde_fuentes(data_dir)
+    arrays = {'interarribos': np.ascontiguousarray(datos.interarribos),
+              'duraciones': np.ascontiguousarray(datos.duraciones)}
+    # Desplazamientos relativos al inicio de la zona de arrays
+    posiciones, desplazamiento = {}, 0
+    for nombre, arr in arrays.items():
+        posiciones[nombre] = {'desplazamiento': desplazamiento, 'dtype': arr.dtype.str,
+                              'forma': list(arr.shape)}
+        desplazamiento = _alinear(desplazamiento + arr.nbytes)
+    cabecera = json.dumps({
+        'formato': FORMATO_BUNDLE,
+        'fuentes': huella,
+        'parametros': datos.parametros,
+        'metadata': datos.metadata,
+        'tablas': datos._tablas,
+        'html': datos.html,
+        'arrays': posiciones,
+    }, ensure_ascii=False).encode()
+    inicio = _alinear(len(_MAGIA) + 8 + len(cabecera))
+
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_MAGIA + len(cabecera).to_bytes(8, 'little') + cabecera)
+            for nombre, arr in arrays.items():
+                f.seek(inicio + posiciones[nombre]['desplazamiento'])
+                f.write(arr.tobytes())
+        os.replace(tmp, ruta)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return ruta
+
+def _leer(ruta):
+    # Bundle con los arrays sobre un mmap del archivo, o None si no existe o
+    # no es un paquete de este formato
+    try:
+        with open(ruta, 'rb') as f:
+            if f.read(len(_MAGIA)) != _MAGIA:
+                return None
+            largo = int.from_bytes(f.read(8), 'little')
+            cabecera = json.loads(f.read(largo))
+            if cabecera.get('formato') != FORMATO_BUNDLE:
+                return None
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    inicio = _alinear(len(_MAGIA) + 8 + largo)
+    arrays = {}
+    try:
+        for nombre, pos in cabecera['arrays'].items():
+            arrays[nombre] = np.frombuffer(mapa, dtype=np.dtype(pos['dtype']),
+                                           count=int(np.prod(pos['forma'])),
+                                           offset=inicio + pos['desplazamiento']
+                                           ).reshape(pos['forma'])
+    except ValueError:
+        # Archivo truncado
+        return None
+    return Bundle(cabecera['parametros'], arrays['interarribos'], arrays['duraciones'],
+                  cabecera['metadata'], cabecera['tablas'], cabecera['html'], ruta,
+                  cabecera['fuentes'])
+
+def cargar_bundle(data_dir=DIRECTORIO_DATOS):
+    # Paquete de data_dir, rehecho si falta o quedó viejo. Si no se puede
+    # escribir (directorio de solo lectura, o el archivo en uso en Windows),
+    # se arma en memoria desde las fuentes.
+    data_dir = Path(data_dir)
+    ruta = data_dir / ARCHIVO_BUNDLE
+    bundle = _leer(ruta)
+    if bundle is not None and bundle.fuentes == _huella_fuentes(data_dir):
+        return bundle
+    try:
+        empaquetar(data_dir, ruta)
+    except OSError:
+        return _desde_fuentes(data_dir)
+    return _leer(ruta) or _desde_fuentes(data_dir)
+
+# ============================================
+# MEDICIÓN DEL ARRANQUE
+# ============================================
+
+# Cada medición corre en un intérprete nuevo: lo que importa es el arranque
+# en frío, con los módulos sin importar
+_MEDIR_DATOS = """
+import time
+t = time.perf_counter()
+from simulador.{modulo} import {funcion}
+{funcion}({data_dir!r})
+print(time.perf_counter() - t)
+"""
+
+_MEDIR_APP = """
+import logging, time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+logging.disable(logging.WARNING)
+at = AppTest.from_file({app!r}, default_timeout=300)
+t_app = time.perf_counter()
+at.run()
+t_primera = time.perf_counter()
+at.run()
+print(t_primera - t_app, time.perf_counter() - t_primera, len(at.exception))
+"""
+
+def _medir(codigo, repeticiones, raiz):
+    entorno = dict(os.environ, PYTHONPATH=str(raiz))
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True,
+                                cwd=raiz, env=entorno, check=True).stdout
+        tiempos.append([float(x) for x in salida.split()])
+    # Mediana de cada columna: el arranque en frío es ruidoso
+    return [statistics.median(col) for col in zip(*tiempos)]
+
+def medir_arranque(data_dir=DIRECTORIO_DATOS, app=None, repeticiones=5):
+    raiz = Path(__file__).resolve().parent.parent
+    data_dir = Path(data_dir).resolve()
+    cargar_bundle(data_dir)
+    resultado = {
+        'cargar_datos_s': _medir(_MEDIR_DATOS.format(modulo='datos', funcion='cargar_datos',
+                                                     data_dir=str(data_dir)),
+                                 repeticiones, raiz)[0],
+        'cargar_bundle_s': _medir(_MEDIR_DATOS.format(modulo='bundle', funcion='cargar_bundle',
+                                                      data_dir=str(data_dir)),
+                                  repeticiones, raiz)[0],
+    }
+    if app is not None:
+        # Primera ejecución completa del script (primer render) y un rerun
+        primera, rerun, errores = _medir(_MEDIR_APP.format(app=str(Path(app).resolve())),
+                                         repeticiones, raiz)
+        resultado.update({'primer_render_s': primera, 'rerun_s': rerun,
+                          'excepciones': int(errores)})
+    return resultado
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Empaqueta data/ en un solo archivo mapeable y mide el arranque")
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    parser.add_argument('--medir', action='store_true',
+                        help="Mide la carga de datos (y la app con --app) en intérpretes nuevos")
+    parser.add_argument('--app', type=Path, help="Script de Streamlit a medir (p. ej. app.py)")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    ruta = empaquetar(args.datos)
+    print(f"Paquete {ruta} ({ruta.stat().st_size / 1024:.0f} KiB) "
+          f"en {time.perf_counter() - inicio:.2f} s")
+    if args.medir:
+        medicion = medir_arranque(args.datos, args.app, args.repeticiones)
+        for clave, valor in medicion.items():
+            print(f"{clave:<18} {valor:.3f}" if isinstance(valor, float) else f"{clave:<18} {valor}")
+
+if __name__ == '__main__':
+    main()
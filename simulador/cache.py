@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .motor import VERSION_MODELO
+
+# ============================================
+# CACHÉ PERSISTENTE DE ESCENARIOS
+# ============================================
+
+def huella_array(arr):
+    arr = np.ascontiguousarray(arr)
+    return hashlib.sha1(arr.tobytes() + arr.dtype.str.encode()).hexdigest()
+
+def clave_escenario(s0, factor_demanda, leak_pct, horizonte_dias, semilla,
+                    interarribos, duraciones, **extra):
+    # n_reps no forma parte de la clave: la réplica i es la misma en una
+    # corrida de 300 o de 1000, así que se guarda una sola serie por escenario.
+    # Los sliders devuelven floats con ruido de representación: se redondean.
+    campos = {
+        'version': VERSION_MODELO,
+        's0': int(s0),
+        'factor_demanda': round(float(factor_demanda), 6),
+        'leak_pct': round(float(leak_pct), 6),
+        'horizonte_dias': int(horizonte_dias),
+        'semilla': int(semilla),
+        'interarribos': huella_array(interarribos),
+        'duraciones': huella_array(duraciones),
+    }
+    campos.update({k: v for k, v in extra.items() if v is not None})
+    texto = json.dumps(campos, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+class CacheEscenarios:
+    # Resultados por réplica en disco (un .npz por escenario), con desalojo
+    # LRU cuando el directorio supera limite_bytes. Un pedido de n réplicas
+    # se responde con el prefijo de una corrida guardada más larga.
+    def __init__(self, directorio=Path(".cache") / "escenarios",
+                 limite_bytes=256 * 1024 * 1024):
+        self.directorio = Path(directorio)
+        self.limite_bytes = limite_bytes
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def _ruta(self, clave):
+        return self.directorio / f"{clave}.npz"
+
+    def obtener(self, clave, n_reps):
+        # Devuelve las primeras min(n_reps, guardadas) réplicas, o None
+        ruta = self._ruta(clave)
+        try:
+            with np.load(ruta) as datos:
+                replicas = {k: datos[k][:n_reps] for k in datos.files}
+        except (OSError, ValueError):
+            return None
+        # Marca de uso para el LRU
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+        return replicas
+
+    def guardar(self, clave, replicas):
+        ruta = self._ruta(clave)
+        # Escritura atómica: varias sesiones pueden guardar a la vez
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **replicas)
+            os.replace(tmp, ruta)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.desalojar()
+
+    def desalojar(self):
+        archivos = []
+        for ruta in self.directorio.glob("*.npz"):
+            try:
+                st = ruta.stat()
+            except OSError:
+                continue
+            archivos.append((st.st_mtime, st.st_size, ruta))
+        total = sum(tam for _, tam, _ in archivos)
+        for _, tam, ruta in sorted(archivos):
+            if total <= self.limite_bytes:
+                break
+            ruta.unlink(missing_ok=True)
+            total -= tam
+
+    def limpiar(self):
+        for ruta in self.directorio.glob("*.npz"):
+            ruta.unlink(missing_ok=True)
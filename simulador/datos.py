@@ -0,0 +1,33 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+# ============================================
+# CARGAR DATOS
+# ============================================
+
+DIRECTORIO_DATOS = Path("data")
+
+def cargar_datos(data_dir=DIRECTORIO_DATOS):
+    # pandas solo para los dos CSV: cargar_empiricos no lo importa
+    import pandas as pd
+    data_dir = Path(data_dir)
+    with open(data_dir / "parametros_simulacion.json", 'r') as f:
+        parametros = json.load(f)
+    interarribos = np.load(data_dir / "interarribos_empiricos.npy")
+    duraciones = np.load(data_dir / "duraciones_empiricas.npy")
+    df_resultados = pd.read_csv(data_dir / "resultados_busqueda_binaria.csv")
+    df_resumen = pd.read_csv(data_dir / "resumen_ejecutivo.csv")
+    with open(data_dir / "metadata_analisis.json", 'r') as f:
+        metadata = json.load(f)
+    return parametros, interarribos, duraciones, df_resultados, df_resumen, metadata
+
+def cargar_empiricos(data_dir=DIRECTORIO_DATOS):
+    # Solo lo que necesita la simulación: parámetros y arrays empíricos
+    data_dir = Path(data_dir)
+    with open(data_dir / "parametros_simulacion.json", 'r') as f:
+        parametros = json.load(f)
+    interarribos = np.load(data_dir / "interarribos_empiricos.npy")
+    duraciones = np.load(data_dir / "duraciones_empiricas.npy")
+    return parametros, interarribos, duraciones
@@ -0,0 +1,195 @@
+import numpy as np
+
+from .estadisticas import AcumuladorStock
+from .motor import _simular_eventos
+from .muestreadores import crear_muestreador
+
+# ============================================
+# MODO DE LARGO PLAZO (ESTADO ESTACIONARIO)
+# ============================================
+
+# En vez de muchas réplicas cortas que arrancan en S₀, una (o pocas)
+# trayectorias muy largas divididas en ventanas. Se descarta el calentamiento
+# (MSER-5) y el IC95 sale de medias por lotes. Con leak > 0 la flota solo
+# decrece y el único estado estacionario es la estación vacía: los lotes
+# muestran tendencia, se informa como no estacionario y lo relevante pasa a
+# ser el tiempo hasta agotar la flota.
+
+class _AcumuladorVentanas(AcumuladorStock):
+    # Además de las estadísticas de la réplica, cuenta llegadas, rechazos y
+    # fugas por ventana de ancho minutos e integra el stock en cada una
+    __slots__ = ('ancho', 'n_ventanas', 'llegadas_v', 'rechazos_v', 'fugas_v', 'integral_v',
+                 'flota', 'primer_cero', 'agotamiento')
+
+    def __init__(self, s0, ancho, n_ventanas):
+        super().__init__(s0)
+        self.ancho = ancho
+        self.n_ventanas = n_ventanas
+        self.llegadas_v = [0] * n_ventanas
+        self.rechazos_v = [0] * n_ventanas
+        self.fugas_v = [0] * n_ventanas
+        self.integral_v = [0.0] * n_ventanas
+        self.flota = s0
+        self.primer_cero = 0.0 if s0 == 0 else None
+        self.agotamiento = 0.0 if s0 == 0 else None
+
+    def _ventana(self, t):
+        return min(int(t // self.ancho), self.n_ventanas - 1)
+
+    def cambiar(self, t, stock):
+        # Integral del stock en [self.t, t), repartida entre ventanas
+        t0, nivel = self.t, self.stock
+        while t0 < t:
+            v = self._ventana(t0)
+            borde = min((v + 1) * self.ancho, t)
+            self.integral_v[v] += nivel * (borde - t0)
+            t0 = borde
+        AcumuladorStock.cambiar(self, t, stock)
+        if stock == 0 and self.primer_cero is None:
+            self.primer_cero = t
+
+    def arribo(self, atendido, t=None):
+        AcumuladorStock.arribo(self, atendido)
+        v = self._ventana(t)
+        self.llegadas_v[v] += 1
+        if not atendido:
+            self.rechazos_v[v] += 1
+
+    def fuga(self, t):
+        self.fugas_v[self._ventana(t)] += 1
+        self.flota -= 1
+        if self.flota == 0:
+            self.agotamiento = t
+
+class _RegistroVentanas:
+    # Lo que el motor espera en trayectorias=: da el acumulador de la réplica
+    def __init__(self, ancho, n_ventanas):
+        self.ancho = ancho
+        self.n_ventanas = n_ventanas
+        self.acum = None
+
+    def acumulador(self, rep, s0):
+        self.acum = _AcumuladorVentanas(s0, self.ancho, self.n_ventanas)
+        return self.acum
+
+def trayectoria_larga(s0, factor_demanda, leak_pct, dias, interarribos, duraciones,
+                      semilla=42, rep=0, ancho_ventana_h=24, muestreo='empirico',
+                      perfil=None):
+    # La réplica rep del motor de eventos (mismos flujos aleatorios), con
+    # contadores por ventana de ancho_ventana_h horas
+    tiempo_sim = dias * 24 * 60
+    ancho = ancho_ventana_h * 60
+    n_ventanas = int(np.ceil(tiempo_sim / ancho))
+    registro = _RegistroVentanas(ancho, n_ventanas)
+    tabla = _simular_eventos(s0, factor_demanda, leak_pct, dias, [rep],
+                             crear_muestreador(interarribos, muestreo),
+                             crear_muestreador(duraciones, muestreo), semilla,
+                             perfil=perfil, trayectorias=registro)
+    acum = registro.acum
+    duracion_ventanas = np.minimum(ancho, tiempo_sim - np.arange(n_ventanas) * ancho)
+    return {
+        't_dias': (np.arange(n_ventanas) + 1) * ancho / (24 * 60),
+        'llegadas': np.array(acum.llegadas_v, dtype=np.int64),
+        'rechazos': np.array(acum.rechazos_v, dtype=np.int64),
+        'stock_medio': np.array(acum.integral_v) / duracion_ventanas,
+        'flota': s0 - np.cumsum(acum.fugas_v),
+        'primer_cero_dias': None if acum.primer_cero is None else acum.primer_cero / (24 * 60),
+        'agotamiento_dias': None if acum.agotamiento is None else acum.agotamiento / (24 * 60),
+        'eventos': int(tabla['eventos'][0]),
+    }
+
+def truncamiento_mser(y, tam_lote=5):
+    # MSER-5: cantidad de observaciones iniciales a descartar que minimiza
+    # var(resto) / len(resto) sobre promedios de a tam_lote. Se busca solo en
+    # la primera mitad, como recomienda el método.
+    n = len(y) // tam_lote
+    if n < 4:
+        return 0
+    z = np.asarray(y[:n * tam_lote], dtype=float).reshape(n, tam_lote).mean(axis=1)
+    # Sumas desde la derecha: resto = z[d:]
+    k = np.arange(n, 0, -1)
+    suma = np.cumsum(z[::-1])[::-1]
+    suma2 = np.cumsum((z ** 2)[::-1])[::-1]
+    var = suma2 / k - (suma / k) ** 2
+    mser = var / k
+    d = int(np.argmin(mser[:n // 2]))
+    return d * tam_lote
+
+def medias_por_lotes(llegadas, rechazos, n_lotes=20, confianza=0.95):
+    # IC de la tasa de rechazos de largo plazo con lotes de ventanas
+    # consecutivas. Cada lote aporta su cociente rechazos/llegadas.
+    from scipy import stats
+    n = len(llegadas) // n_lotes * n_lotes
+    if n == 0:
+        return None
+    lleg = llegadas[:n].reshape(n_lotes, -1).sum(axis=1)
+    rech = rechazos[:n].reshape(n_lotes, -1).sum(axis=1)
+    pct = np.where(lleg > 0, rech / np.maximum(lleg, 1) * 100, 0.0)
+    media = float(rechazos[:n].sum() / max(llegadas[:n].sum(), 1) * 100)
+    semi = stats.t.ppf((1 + confianza) / 2, n_lotes - 1) * np.std(pct, ddof=1) / np.sqrt(n_lotes)
+    # Lotes casi independientes: autocorrelación de orden 1 chica
+    autocorr = float(np.corrcoef(pct[:-1], pct[1:])[0, 1]) if np.std(pct) > 0 else 0.0
+    # Tendencia entre lotes: si la hay, el proceso no es estacionario
+    tendencia = stats.spearmanr(np.arange(n_lotes), pct) if np.std(pct) > 0 else None
+    return {
+        'media': media,
+        'ic95': (media - float(semi), media + float(semi)),
+        'lotes': pct,
+        'autocorrelacion': autocorr,
+        'p_tendencia': float(tendencia.pvalue) if tendencia is not None else 1.0,
+    }
+
+def estimar_estacionario(s0, factor_demanda, leak_pct, dias, interarribos, duraciones,
+                         n_trayectorias=1, ancho_ventana_h=24, n_lotes=20, semilla=42,
+                         muestreo='empirico', alfa_tendencia=0.01, perfil=None,
+                         progreso=None):
+    # progreso() se llama después de cada trayectoria
+    from scipy import stats
+    trayectorias = []
+    for rep in range(n_trayectorias):
+        trayectorias.append(trayectoria_larga(s0, factor_demanda, leak_pct, dias, interarribos,
+                                              duraciones, semilla, rep, ancho_ventana_h,
+                                              muestreo, perfil))
+        if progreso is not None:
+            progreso()
+    # Calentamiento común, sobre el stock medio promedio de las trayectorias
+    stock = np.mean([tr['stock_medio'] for tr in trayectorias], axis=0)
+    d = truncamiento_mser(stock)
+    lotes_por_trayectoria = max(n_lotes // n_trayectorias, 2)
+    por_trayectoria = [medias_por_lotes(tr['llegadas'][d:], tr['rechazos'][d:],
+                                        lotes_por_trayectoria)
+                       for tr in trayectorias]
+    if any(b is None for b in por_trayectoria):
+        raise ValueError("El horizonte es demasiado corto para formar los lotes: "
+                         "alargarlo o usar ventanas más cortas")
+
+    lotes = np.concatenate([b['lotes'] for b in por_trayectoria])
+    llegadas = sum(int(tr['llegadas'][d:].sum()) for tr in trayectorias)
+    rechazos = sum(int(tr['rechazos'][d:].sum()) for tr in trayectorias)
+    media = rechazos / max(llegadas, 1) * 100
+    semi = stats.t.ppf(0.975, len(lotes) - 1) * np.std(lotes, ddof=1) / np.sqrt(len(lotes))
+    p_tendencia = min(b['p_tendencia'] for b in por_trayectoria)
+
+    ancho_dias = ancho_ventana_h / 24
+    dias_lote = (len(trayectorias[0]['llegadas']) - d) // lotes_por_trayectoria * ancho_dias
+    warmup_dias = d * ancho_dias
+    return {
+        'pct_rechazos_largo_plazo': media,
+        'ic95': (media - float(semi), media + float(semi)),
+        'n_lotes': len(lotes),
+        'dias_por_lote': dias_lote,
+        'autocorrelacion_lotes': float(np.mean([b['autocorrelacion'] for b in por_trayectoria])),
+        'p_tendencia': p_tendencia,
+        'estacionario': p_tendencia >= alfa_tendencia,
+        'warmup_dias': warmup_dias,
+        'stock_medio': float(np.mean(stock[d:])),
+        'flota_final': int(np.mean([tr['flota'][-1] for tr in trayectorias])),
+        'primer_cero_dias': [tr['primer_cero_dias'] for tr in trayectorias],
+        'agotamiento_dias': [tr['agotamiento_dias'] for tr in trayectorias],
+        'eventos_simulados': sum(tr['eventos'] for tr in trayectorias),
+        # Días simulados frente a lo que costarían réplicas independientes de
+        # largo lote, cada una con su propio calentamiento
+        'costo_relativo': n_trayectorias * dias / (len(lotes) * (warmup_dias + dias_lote)),
+        'trayectorias': trayectorias,
+        'truncamiento_ventanas': d,
+    }
@@ -0,0 +1,148 @@
+import numpy as np
+
+# scipy.stats se importa dentro de las funciones que lo usan: tarda cerca de
+# un segundo en cargar y el motor no lo necesita para simular
+
+# ============================================
+# ACUMULADOR DE STOCK EN LÍNEA
+# ============================================
+
+class AcumuladorStock:
+    # Estadísticas de una réplica en memoria constante: integral del stock en
+    # el tiempo (promedio ponderado por tiempo), mínimo, máximo, tiempo con
+    # stock cero y conteo de arribos/rechazos. Se actualiza en O(1) por evento.
+    __slots__ = ('s0', 't', 'stock', 'integral', 'minimo', 'maximo', 't_cero',
+                 'llegadas', 'rechazos')
+
+    def __init__(self, s0, t0=0.0):
+        self.s0 = s0
+        self.t = t0
+        self.stock = s0
+        self.integral = 0.0
+        self.minimo = s0
+        self.maximo = s0
+        self.t_cero = 0.0
+        self.llegadas = 0
+        self.rechazos = 0
+
+    def cambiar(self, t, stock):
+        # El stock vale self.stock en [self.t, t) y pasa a valer stock en t
+        dt = t - self.t
+        self.integral += self.stock * dt
+        if self.stock == 0:
+            self.t_cero += dt
+        self.t = t
+        self.stock = stock
+        if stock < self.minimo:
+            self.minimo = stock
+        elif stock > self.maximo:
+            self.maximo = stock
+
+    def arribo(self, atendido, t=None):
+        # t (minuto del arribo) lo usan las subclases que cuentan por ventana
+        self.llegadas += 1
+        if not atendido:
+            self.rechazos += 1
+
+    def fuga(self, t):
+        # La bici retirada en t no vuelve (leak): no cambia las estadísticas
+        # de la réplica, es un gancho para subclases
+        pass
+
+    def cerrar(self, t_fin):
+        self.cambiar(t_fin, self.stock)
+
+    def resultado(self, duracion):
+        # Bicis devueltas = stock final - inicial + atendidos
+        retornos = self.stock - self.s0 + self.llegadas - self.rechazos
+        return {
+            'pct_rechazos': (self.rechazos / self.llegadas * 100) if self.llegadas > 0 else 0.0,
+            'stock_promedio': self.integral / duracion if duracion > 0 else float(self.stock),
+            'rechazos': self.rechazos,
+            'llegadas': self.llegadas,
+            'stock_min': self.minimo,
+            'stock_max': self.maximo,
+            't_cero_h': self.t_cero / 60.0,
+            'eventos': self.llegadas + retornos,
+        }
+
+def tabla_replicas(filas):
+    # Lista de dicts por réplica -> dict de arrays por métrica
+    if not filas:
+        return {}
+    return {k: np.array([f[k] for f in filas]) for k in filas[0]}
+
+# ============================================
+# INTERVALOS Y CRITERIO DE SERVICIO
+# ============================================
+
+def ic_media(x, confianza=0.95):
+    # Intervalo t de Student para la media de réplicas independientes
+    x = np.asarray(x, dtype=float)
+    media = float(np.mean(x))
+    if len(x) < 2:
+        return (media, media)
+    from scipy import stats
+    semi = stats.t.ppf((1 + confianza) / 2, len(x) - 1) * np.std(x, ddof=1) / np.sqrt(len(x))
+    return (media - float(semi), media + float(semi))
+
+def estimar_media_reducida(y, c=None, media_c=None, antiteticas=False,
+                           confianza=0.95):
+    # Media de y con reducción de varianza: promedios de pares antitéticos
+    # (réplicas 2i, 2i+1) y/o variable de control c de esperanza media_c.
+    # factor_reduccion = Var(media ingenua) / Var(estimador).
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    var_ingenua = np.var(y, ddof=1) / n if n > 1 else 0.0
+    if antiteticas:
+        m = n // 2 * 2
+        y_u = (y[0:m:2] + y[1:m:2]) / 2
+        c_u = None if c is None else (np.asarray(c[0:m:2], float) + np.asarray(c[1:m:2], float)) / 2
+    else:
+        y_u = y
+        c_u = None if c is None else np.asarray(c, dtype=float)
+    k = len(y_u)
+    beta = None
+    if c_u is not None and k > 2 and np.var(c_u) > 0:
+        beta = float(np.cov(y_u, c_u)[0, 1] / np.var(c_u, ddof=1))
+        z = y_u - beta * (c_u - media_c)
+        gl = k - 2
+    else:
+        z = y_u
+        gl = k - 1
+    media = float(np.mean(z)) if k > 0 else float(np.mean(y))
+    if gl < 1:
+        return {'media': media, 'ic95': (media, media), 'beta': beta,
+                'factor_reduccion': 1.0}
+    var_est = np.var(z, ddof=1) / k * ((k - 1) / gl)
+    from scipy import stats
+    semi = float(stats.t.ppf((1 + confianza) / 2, gl) * np.sqrt(var_est))
+    if var_est > 0:
+        factor = float(var_ingenua / var_est)
+    else:
+        factor = float('inf') if var_ingenua > 0 else 1.0
+    return {'media': media, 'ic95': (media - semi, media + semi), 'beta': beta,
+            'factor_reduccion': factor}
+
+def cumple_criterio(pct_rechazos, umbral_pct):
+    # Criterio de la app: percentil 97.5 de % rechazos por réplica < umbral
+    return bool(np.percentile(pct_rechazos, 97.5) < umbral_pct)
+
+def decision_temprana(pct_rechazos, umbral_pct, confianza=0.95):
+    # El criterio equivale a que la proporción p de réplicas con rechazos
+    # >= umbral sea menor a 2.5%. Con el intervalo de Clopper-Pearson de p se
+    # decide antes de correr todas las réplicas: True (cumple), False (no
+    # cumple) o None si el intervalo todavía contiene 2.5%.
+    n = len(pct_rechazos)
+    if n == 0:
+        return None
+    k = int(np.sum(np.asarray(pct_rechazos) >= umbral_pct))
+    alfa = 1 - confianza
+    from scipy import stats
+    inferior = stats.beta.ppf(alfa / 2, k, n - k + 1) if k > 0 else 0.0
+    superior = stats.beta.ppf(1 - alfa / 2, k + 1, n - k) if k < n else 1.0
+    if superior < 0.025:
+        return True
+    if inferior > 0.025:
+        return False
+    return None
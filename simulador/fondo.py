@@ -0,0 +1,92 @@
+import threading
+import time
+
+import numpy as np
+
+from .estadisticas import ic_media
+from .motor import simular_escenario
+
+# ============================================
+# SIMULACIÓN EN SEGUNDO PLANO
+# ============================================
+
+class SimulacionEnFondo:
+    # Corre simular_escenario en un hilo, en lotes de réplicas. Después de
+    # cada lote publica la distribución parcial de rechazos, que la interfaz
+    # lee con estado() mientras la corrida sigue. cancelar() la corta sin
+    # esperar el fin del lote: el motor de eventos y la red paran antes de la
+    # réplica siguiente y las tareas del pool que no empezaron se cancelan
+    # (el vectorizado termina el lote en curso). El resultado queda con las
+    # réplicas hechas.
+    def __init__(self, **parametros):
+        self.parametros = parametros
+        self.n_total = parametros.get('n_reps')
+        self.resultado = None
+        self.error = None
+        self._n_hechas = 0
+        self._parcial = np.empty(0)
+        self._inicio = None
+        self._fin = None
+        self._lock = threading.Lock()
+        self._cancelar = threading.Event()
+        self._terminado = threading.Event()
+        self._hilo = threading.Thread(target=self._correr, daemon=True)
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        self._hilo.start()
+        return self
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def terminada(self):
+        return self._terminado.is_set()
+
+    @property
+    def cancelada(self):
+        return self._cancelar.is_set()
+
+    def esperar(self, timeout=None):
+        self._terminado.wait(timeout)
+        return self.terminada
+
+    def _avance(self, replicas, n):
+        with self._lock:
+            self._n_hechas = n
+            self._parcial = replicas['pct_rechazos'][:n].copy()
+        return not self._cancelar.is_set()
+
+    def _ejecutar(self):
+        return simular_escenario(progreso=self._avance, cancelado=self._cancelar,
+                                 **self.parametros)
+
+    def _correr(self):
+        try:
+            self.resultado = self._ejecutar()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._fin = time.perf_counter()
+            self._terminado.set()
+
+    def estado(self):
+        with self._lock:
+            n, parcial = self._n_hechas, self._parcial
+        # Sin _inicio la corrida todavía espera turno (servicio compartido)
+        transcurrido = ((self._fin or time.perf_counter()) - self._inicio
+                        if self._inicio is not None else 0.0)
+        # ETA lineal con el ritmo observado hasta ahora
+        eta = transcurrido / n * (self.n_total - n) if n and self.n_total else None
+        return {
+            'n_hechas': n,
+            'n_total': self.n_total,
+            'fraccion': min(n / self.n_total, 1.0) if self.n_total else None,
+            'transcurrido_s': transcurrido,
+            'eta_s': eta,
+            # Las búsquedas y el largo plazo (servicio) no tienen réplicas parciales
+            'media': float(np.mean(parcial)) if len(parcial) else None,
+            'media_ic95': ic_media(parcial) if len(parcial) >= 2 else None,
+            'distribucion_rechazos': parcial,
+        }
@@ -0,0 +1,382 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .datos import DIRECTORIO_DATOS
+
+# ============================================
+# INGESTA DE REGISTROS DE VIAJES
+# ============================================
+
+# Reconstruye interarribos_empiricos.npy, duraciones_empiricas.npy,
+# parametros_simulacion.json y metadata_analisis.json desde los CSV crudos.
+# Los CSV se leen por partes (memoria acotada por tam_chunk, no por el
+# tamaño del archivo); de cada parte solo se guardan los eventos de la
+# estación. El estado incremental (ingesta_estado.json) permite sumar días
+# nuevos sin volver a leer la historia: guarda cuántas filas se leyeron de
+# cada archivo (uno que creció se retoma desde ahí) y los eventos que todavía
+# pueden quedar intercalados con los de archivos futuros. Los archivos deben
+# seguir el orden de los retiros (p. ej. uno por día de retiro); las
+# devoluciones de un viaje que cruza la medianoche pueden caer en el
+# período del archivo siguiente. Con esa condición, sumar los archivos de a
+# uno da lo mismo que procesarlos todos juntos.
+
+ARCHIVO_ESTADO = "ingesta_estado.json"
+ESTACION = "Distrito Centro"
+COLUMNAS = {
+    'origen': 'estacion_retiro',
+    'destino': 'estacion_devolucion',
+    'retiro': 'fecha_retiro',
+    'devolucion': 'fecha_devolucion',
+}
+# Filtros de los arrays empíricos, en minutos: sin retiros simultáneos ni
+# huecos de la noche (estación cerrada), viajes de 1 a 60 minutos
+INTER_MAX = 900.0
+DUR_MIN = 1.0
+DUR_MAX = 60.0
+
+def _estado_inicial(estacion):
+    return {
+        'estacion': estacion,
+        'archivos': [],
+        'n_observaciones': 0,
+        'n_retiros': 0,
+        'n_devoluciones': 0,
+        'primer_retiro': None,
+        'ultimo_retiro': None,
+        # Retiros y devoluciones por día (fecha ISO -> [retiros, devoluciones])
+        'diario': {},
+        # Déficit acumulado (retiros - devoluciones) y sus máximos: en todo el
+        # período y dentro de cada semana ISO
+        'deficit': 0,
+        'cota_global': 0,
+        'semana': None,
+        'deficit_inicio_semana': 0,
+        'cota_semanal': 0,
+        # Eventos desde el último retiro en adelante, fuera del déficit: un
+        # archivo futuro puede traer otros anteriores a ellos (ver
+        # _separar_pendientes)
+        'pendientes': {'retiros': [], 'devoluciones': []},
+    }
+
+def leer_eventos(rutas, estacion=ESTACION, columnas=COLUMNAS, formato=None,
+                 tam_chunk=100_000, saltar=None):
+    # Retiros (con su duración) y devoluciones de la estación, de todos los
+    # archivos, leyendo tam_chunk filas por vez. saltar (ruta -> filas)
+    # omite las primeras filas de datos de un archivo ya procesado en parte.
+    retiros, duraciones, devoluciones = [], [], []
+    n_obs = 0
+    filas = {}
+    for ruta in rutas:
+        previas = (saltar or {}).get(ruta, 0)
+        partes = pd.read_csv(ruta, usecols=list(columnas.values()), dtype=str,
+                             chunksize=tam_chunk,
+                             skiprows=range(1, previas + 1) if previas else None)
+        filas[ruta] = previas
+        for parte in partes:
+            n_obs += len(parte)
+            filas[ruta] += len(parte)
+            t_ret = pd.to_datetime(parte[columnas['retiro']], format=formato, errors='coerce')
+            t_dev = pd.to_datetime(parte[columnas['devolucion']], format=formato, errors='coerce')
+            es_retiro = (parte[columnas['origen']].str.strip() == estacion) & t_ret.notna()
+            es_devolucion = (parte[columnas['destino']].str.strip() == estacion) & t_dev.notna()
+            retiros.append(t_ret[es_retiro].to_numpy())
+            duraciones.append(((t_dev - t_ret)[es_retiro].dt.total_seconds() / 60).to_numpy())
+            devoluciones.append(t_dev[es_devolucion].to_numpy())
+    vacio = np.array([], dtype='datetime64[ns]')
+    retiros = np.concatenate([vacio] + retiros)
+    duraciones = np.concatenate([np.array([])] + duraciones)
+    orden = np.argsort(retiros, kind='stable')
+    return {
+        'n_observaciones': n_obs,
+        'filas': filas,
+        'retiros': retiros[orden],
+        'duraciones': duraciones[orden],
+        'devoluciones': np.sort(np.concatenate([vacio] + devoluciones)),
+    }
+
+def _actualizar_deficit(estado, retiros, devoluciones):
+    # Recorre retiros (+1) y devoluciones (-1) en orden temporal desde el
+    # déficit acumulado que dejó la ingesta anterior. Ante un empate va
+    # primero la devolución.
+    tiempos = np.concatenate([devoluciones, retiros])
+    pasos = np.concatenate([-np.ones(len(devoluciones), dtype=np.int64),
+                            np.ones(len(retiros), dtype=np.int64)])
+    if len(tiempos) == 0:
+        return
+    orden = np.argsort(tiempos, kind='stable')
+    tiempos, pasos = tiempos[orden], pasos[orden]
+    deficit = estado['deficit'] + np.cumsum(pasos)
+    estado['cota_global'] = max(estado['cota_global'], int(deficit.max()))
+
+    iso = pd.DatetimeIndex(tiempos).isocalendar()
+    semanas = (iso['year'].astype(str) + '-' + iso['week'].astype(str).str.zfill(2)).to_numpy()
+    previo = np.concatenate([[estado['deficit']], deficit[:-1]])
+    for semana in pd.unique(semanas):
+        en_semana = semanas == semana
+        if semana != estado['semana']:
+            estado['semana'] = semana
+            estado['deficit_inicio_semana'] = int(previo[en_semana][0])
+        dentro = deficit[en_semana] - estado['deficit_inicio_semana']
+        estado['cota_semanal'] = max(estado['cota_semanal'], int(dentro.max()))
+    estado['deficit'] = int(deficit[-1])
+
+def _fechas(textos):
+    return np.array(textos, dtype='datetime64[ns]')
+
+def _separar_pendientes(estado, retiros, devoluciones):
+    # Junta los eventos nuevos con los pendientes y devuelve los que ya se
+    # pueden pasar al déficit; el resto queda pendiente. Los retiros futuros
+    # no son anteriores al último retiro, y sus devoluciones tampoco: todo
+    # lo anterior a él está en su lugar definitivo. Lo que coincide con él
+    # espera, porque ante un empate la devolución va antes que el retiro.
+    pendientes = estado.setdefault('pendientes', {'retiros': [], 'devoluciones': []})
+    retiros = np.sort(np.concatenate([_fechas(pendientes['retiros']), retiros]), kind='stable')
+    devoluciones = np.sort(np.concatenate([_fechas(pendientes['devoluciones']), devoluciones]),
+                           kind='stable')
+    if estado['ultimo_retiro'] is None:
+        corte = None
+    else:
+        corte = np.datetime64(pd.Timestamp(estado['ultimo_retiro']), 'ns')
+    listos_ret = retiros < corte if corte is not None else np.zeros(len(retiros), dtype=bool)
+    listos_dev = (devoluciones < corte if corte is not None
+                  else np.zeros(len(devoluciones), dtype=bool))
+    estado['pendientes'] = {
+        'retiros': [str(pd.Timestamp(t)) for t in retiros[~listos_ret]],
+        'devoluciones': [str(pd.Timestamp(t)) for t in devoluciones[~listos_dev]],
+    }
+    return retiros[listos_ret], devoluciones[listos_dev]
+
+def deficit_final(estado):
+    # Cotas del déficit como si no fueran a llegar más archivos: copia del
+    # estado con los pendientes ya pasados
+    final = json.loads(json.dumps(estado))
+    pendientes = final.pop('pendientes', None) or {'retiros': [], 'devoluciones': []}
+    _actualizar_deficit(final, _fechas(pendientes['retiros']),
+                        _fechas(pendientes['devoluciones']))
+    return final['cota_global'], final['cota_semanal']
+
+def _por_dia(tiempos):
+    dias = pd.DatetimeIndex(tiempos).strftime('%Y-%m-%d')
+    return pd.Series(1, index=dias).groupby(level=0).sum().to_dict()
+
+def incorporar(estado, eventos):
+    # Suma los eventos nuevos al estado y devuelve los interarribos y
+    # duraciones nuevos (ya filtrados) para agregar a los arrays, y cuántos
+    # eventos llegaron antes que lo ya incorporado (archivos fuera de orden:
+    # solo una reconstrucción desde cero los ubica bien)
+    retiros = eventos['retiros']
+    fuera_de_orden = 0
+    if estado['ultimo_retiro'] is not None:
+        corte = np.datetime64(pd.Timestamp(estado['ultimo_retiro']), 'ns')
+        fuera_de_orden = int((retiros < corte).sum())
+    estado['n_observaciones'] += eventos['n_observaciones']
+    estado['n_retiros'] += len(retiros)
+    estado['n_devoluciones'] += len(eventos['devoluciones'])
+
+    previo = ([np.datetime64(estado['ultimo_retiro'])] if estado['ultimo_retiro'] else [])
+    tiempos = np.concatenate([np.array(previo, dtype='datetime64[ns]'), retiros])
+    inter = np.diff(tiempos).astype('timedelta64[s]').astype(float) / 60
+    inter = inter[(inter > 0) & (inter <= INTER_MAX)]
+    dur = eventos['duraciones']
+    dur = dur[(dur >= DUR_MIN) & (dur <= DUR_MAX)]
+
+    if len(retiros):
+        if estado['primer_retiro'] is None:
+            estado['primer_retiro'] = str(pd.Timestamp(retiros[0]))
+        estado['ultimo_retiro'] = str(max(pd.Timestamp(retiros[-1]),
+                                          pd.Timestamp(estado['ultimo_retiro'] or retiros[-1])))
+    estado.pop('ultima_devolucion', None)
+    for indice, nuevos in [(0, _por_dia(retiros)), (1, _por_dia(eventos['devoluciones']))]:
+        for dia, n in nuevos.items():
+            conteo = estado['diario'].setdefault(dia, [0, 0])
+            conteo[indice] += int(n)
+    # El déficit recorre los eventos en orden temporal global
+    _actualizar_deficit(estado, *_separar_pendientes(estado, retiros, eventos['devoluciones']))
+    return inter, dur, fuera_de_orden
+
+def calcular_parametros(estado, interarribos, duraciones, anteriores=None):
+    # Mismas claves que parametros_simulacion.json. Las que salen del
+    # análisis de S₀ (s0_recomendado, umbral, réplicas...) se conservan de
+    # anteriores.
+    parametros = dict(anteriores or {})
+    minutos = ((pd.Timestamp(estado['ultimo_retiro']) - pd.Timestamp(estado['primer_retiro']))
+               .total_seconds() / 60)
+    # Tasa media de todo el período, con todos los retiros (también los
+    # simultáneos y los separados por la noche que no entran al array)
+    lambda_global = (estado['n_retiros'] - 1) / minutos * 60 if minutos > 0 else 0.0
+    cota_global, cota_semanal = deficit_final(estado)
+    # Leak diario: fracción de los retiros del día que no volvió ese día
+    diario = np.array([c for c in estado['diario'].values() if c[0] > 0], dtype=float).reshape(-1, 2)
+    leak = np.maximum(diario[:, 0] - diario[:, 1], 0) / diario[:, 0] if len(diario) else np.zeros(1)
+    parametros.update({
+        'lambda_global': float(lambda_global),
+        'cv_interarribo': float(np.std(interarribos, ddof=1) / np.mean(interarribos)),
+        'duracion_media_min': float(np.mean(duraciones)),
+        'duracion_std_min': float(np.std(duraciones, ddof=1)),
+        'cv_duracion': float(np.std(duraciones, ddof=1) / np.mean(duraciones)),
+        'leak_mediana': float(np.median(leak)),
+        'leak_p95': float(np.percentile(leak, 95)),
+        'balance_neto': int(estado['n_devoluciones'] - estado['n_retiros']),
+        'cota_global': int(cota_global),
+        'cota_semanal': int(cota_semanal),
+        'fecha_analisis': time.strftime('%Y-%m-%d'),
+    })
+    return parametros
+
+def _fecha_metadata(texto):
+    # Formato de metadata_analisis.json: 1/1/2024 00:06
+    t = pd.Timestamp(texto)
+    return f"{t.month}/{t.day}/{t.year} {t:%H:%M}"
+
+def _escribir_atomico(ruta, escribir):
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            escribir(f)
+        os.replace(tmp, ruta)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+def _escribir_json(ruta, datos):
+    _escribir_atomico(ruta, lambda f: f.write(json.dumps(datos, indent=2).encode()))
+
+def ingerir(rutas, data_dir=DIRECTORIO_DATOS, estacion=ESTACION, columnas=COLUMNAS,
+            formato=None, tam_chunk=100_000, desde_cero=False, progreso=print):
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    ruta_estado = data_dir / ARCHIVO_ESTADO
+    rutas = [Path(r) for r in rutas]
+    ruta_inter = data_dir / "interarribos_empiricos.npy"
+    ruta_dur = data_dir / "duraciones_empiricas.npy"
+
+    if ruta_estado.exists() and not desde_cero:
+        with open(ruta_estado, 'r') as f:
+            estado = json.load(f)
+        if estado['estacion'] != estacion:
+            raise ValueError(f"El estado es de la estación {estado['estacion']!r}, no de {estacion!r}: "
+                             "usar desde_cero para reconstruir")
+        interarribos = np.load(ruta_inter)
+        duraciones = np.load(ruta_dur)
+    else:
+        # Sin estado, los arrays existentes (congelados o de otra estación)
+        # no se pueden continuar: se reconstruyen desde estos archivos
+        estado = _estado_inicial(estacion)
+        interarribos = np.empty(0)
+        duraciones = np.empty(0)
+
+    # Avance por archivo: uno ya visto solo se vuelve a leer si creció (se
+    # le agregaron filas al final), y desde la primera fila sin procesar.
+    # La clave es la ruta absoluta: dos archivos con el mismo nombre en
+    # carpetas distintas son archivos distintos. Los estados anteriores solo
+    # guardaban el nombre; esa entrada pasa al primer archivo que lo lleve.
+    procesados = {a.get('ruta', a['nombre']): a for a in estado['archivos']}
+    nuevos, saltar, claves = [], {}, {}
+    for r in rutas:
+        claves[r] = clave = str(r.resolve())
+        heredado = procesados.get(r.name)
+        if clave not in procesados and heredado is not None and 'ruta' not in heredado:
+            heredado['ruta'] = clave
+            procesados[clave] = procesados.pop(r.name)
+        previo = procesados.get(clave)
+        if previo is None:
+            nuevos.append(r)
+        elif 'filas' in previo and r.stat().st_size > previo['bytes']:
+            nuevos.append(r)
+            saltar[r] = previo['filas']
+        else:
+            progreso(f"Omitido (ya procesado): {r}")
+    if not nuevos:
+        progreso("No hay archivos nuevos")
+        return None
+
+    inicio = time.perf_counter()
+    eventos = leer_eventos(nuevos, estacion, columnas, formato, tam_chunk, saltar)
+    inter, dur, fuera_de_orden = incorporar(estado, eventos)
+    if fuera_de_orden:
+        progreso(f"⚠️ {fuera_de_orden:,} retiros anteriores a lo ya procesado: los archivos no "
+                 "siguen el orden de los retiros; usar desde_cero para ubicarlos bien")
+    interarribos = np.concatenate([interarribos, inter])
+    duraciones = np.concatenate([duraciones, dur])
+    if len(interarribos) < 2 or len(duraciones) < 2:
+        raise ValueError(f"Muy pocos viajes de {estacion!r} para estimar los parámetros")
+    for r in nuevos:
+        procesados[claves[r]] = {'nombre': r.name, 'ruta': claves[r], 'bytes': r.stat().st_size,
+                                 'filas': eventos['filas'][r]}
+    estado['archivos'] = list(procesados.values())
+
+    ruta_parametros = data_dir / "parametros_simulacion.json"
+    anteriores = None
+    if ruta_parametros.exists():
+        with open(ruta_parametros, 'r') as f:
+            anteriores = json.load(f)
+    parametros = calcular_parametros(estado, interarribos, duraciones, anteriores)
+
+    ruta_metadata = data_dir / "metadata_analisis.json"
+    metadata = {}
+    if ruta_metadata.exists():
+        with open(ruta_metadata, 'r') as f:
+            metadata = json.load(f)
+    metadata.update({
+        'n_observaciones': estado['n_observaciones'],
+        'n_retiros_dc': estado['n_retiros'],
+        'n_devoluciones_dc': estado['n_devoluciones'],
+        'periodo_inicio': _fecha_metadata(estado['primer_retiro']),
+        'periodo_fin': _fecha_metadata(estado['ultimo_retiro']),
+    })
+
+    _escribir_atomico(ruta_inter, lambda f: np.save(f, interarribos))
+    _escribir_atomico(ruta_dur, lambda f: np.save(f, duraciones))
+    _escribir_json(ruta_parametros, parametros)
+    _escribir_json(ruta_metadata, metadata)
+    # El estado va al final: si algo falla antes, la próxima ingesta repite estos archivos
+    _escribir_json(ruta_estado, estado)
+
+    progreso(f"{len(nuevos)} archivo(s), {eventos['n_observaciones']:,} filas: "
+             f"+{len(eventos['retiros']):,} retiros, +{len(eventos['devoluciones']):,} devoluciones, "
+             f"+{len(inter):,} interarribos, +{len(dur):,} duraciones "
+             f"en {time.perf_counter() - inicio:.1f} s")
+    return parametros
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Reconstruye los archivos de data/ desde los CSV crudos de viajes")
+    parser.add_argument('archivos', type=Path, nargs='+', help="CSV de viajes, en orden cronológico")
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    parser.add_argument('--estacion', default=ESTACION)
+    parser.add_argument('--col-origen', default=COLUMNAS['origen'])
+    parser.add_argument('--col-destino', default=COLUMNAS['destino'])
+    parser.add_argument('--col-retiro', default=COLUMNAS['retiro'])
+    parser.add_argument('--col-devolucion', default=COLUMNAS['devolucion'])
+    parser.add_argument('--formato', default=None,
+                        help="Formato de fecha de strptime (por defecto se infiere)")
+    parser.add_argument('--tam-chunk', type=int, default=100_000,
+                        help="Filas leídas por vez")
+    parser.add_argument('--desde-cero', action='store_true',
+                        help="Ignora el estado incremental y reconstruye todo")
+    args = parser.parse_args(argv)
+
+    columnas = {'origen': args.col_origen, 'destino': args.col_destino,
+                'retiro': args.col_retiro, 'devolucion': args.col_devolucion}
+    parametros = ingerir(args.archivos, args.datos, args.estacion, columnas, args.formato,
+                         args.tam_chunk, args.desde_cero)
+    if parametros is not None:
+        print(f"λ = {parametros['lambda_global']:.3f}/h · duración media "
+              f"{parametros['duracion_media_min']:.1f} min · leak mediana "
+              f"{parametros['leak_mediana']*100:.2f}% · balance neto {parametros['balance_neto']}")
+        print("La superficie de respuesta y la caché de escenarios dependen de los datos: "
+              "reconstruir la superficie con python -m simulador.superficie")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,789 @@
+import heapq
+import time
+
+import numpy as np
+
+from .estadisticas import (AcumuladorStock, cumple_criterio, decision_temprana,
+                           estimar_media_reducida, ic_media, tabla_replicas)
+from .muestreadores import crear_muestreador
+from .trayectorias import seleccion_replicas
+
+# ============================================
+# FUNCIÓN DES
+# ============================================
+
+MOTORES = {
+    'eventos': "Eventos discretos (réplica a réplica)",
+    'vectorizado': "Vectorizado (todas las réplicas a la vez)",
+}
+# Implementaciones anteriores, solo para benchmarks y contraste
+MOTORES_REFERENCIA = {
+    'eventos_heapq': "Eventos discretos con heapq de tuplas (versión original)",
+}
+
+# Subir cuando cambie el modelo o las métricas por réplica (no el motor):
+# invalida la caché de escenarios
+VERSION_MODELO = 4
+
+def simular_escenario(s0, factor_demanda, leak_pct, horizonte_dias, n_reps,
+                      interarribos, duraciones, motor='eventos', semilla=42,
+                      n_workers=1, cache=None, semiamplitud_objetivo=None,
+                      umbral_decision=None, tam_lote=50, n_min_precision=100,
+                      antiteticas=False, variable_control=False,
+                      instrumentar=False, progreso=None, muestreo='empirico',
+                      perfil=None, red=None, trayectorias=None, rebalanceo=None,
+                      cancelado=None):
+    # Con semiamplitud_objetivo (puntos porcentuales del IC95 de la media) o
+    # umbral_decision (% contra el que se decide el criterio de servicio),
+    # las réplicas se corren en lotes hasta cumplir la meta y n_reps pasa a
+    # ser el tope. La meta de precisión recién se evalúa desde
+    # n_min_precision réplicas: con pocas réplicas todas en 0% el IC de la t
+    # tiene ancho cero y pararía antes de tiempo.
+    # antiteticas empareja las réplicas (2i, 2i+1) con uniformes u y 1-u;
+    # variable_control ajusta la media con la
+    # cantidad de arribos, cuya esperanza se conoce.
+    # instrumentar agrega resultado['diagnostico']: eventos por tipo, largo
+    # máximo de la cola de eventos y tiempos por réplica y por fase.
+    # muestreo elige cómo se generan interarribos y duraciones (ver
+    # muestreadores.MUESTREOS); por defecto, remuestreo de los datos.
+    # perfil (arribos.PerfilIntensidad) hace variar la tasa de arribos según
+    # la hora; None es el proceso estacionario.
+    # red (red.Red) simula una red de estaciones en vez de una sola: el stock
+    # inicial es red.s0 (s0 y motor no se usan) y el resultado agrega el %
+    # de rechazos por estación y el ranking de las de mayor riesgo.
+    # trayectorias (cantidad de réplicas, las primeras, o réplicas puntuales)
+    # registra el stock en el tiempo de esas réplicas: el resultado agrega
+    # 'trayectorias', un trayectorias.RegistroTrayectorias. Las que no corrió
+    # el motor de eventos en este proceso (otro motor, workers, caché) se
+    # vuelven a simular con él: sus flujos aleatorios son los mismos.
+    # rebalanceo (rebalanceo.PoliticaRebalanceo) repone bicis con un camión
+    # según una política (s, S); solo con el motor de eventos. El resultado
+    # agrega los viajes de camión y las bicis repuestas por réplica.
+    # progreso(replicas, n) se llama después de cada lote con las réplicas
+    # hechas hasta el momento; si devuelve False la corrida se corta ahí y
+    # el resumen cubre esas n réplicas (motivo_parada = 'cancelada').
+    # cancelado (threading.Event) corta antes, sin esperar el fin del lote:
+    # el motor de eventos lo mira antes de cada réplica y con workers se
+    # cancelan las tareas que no empezaron. El vectorizado avanza todas las
+    # réplicas del lote juntas y solo corta entre lotes.
+    if red is not None:
+        if (cache is not None or semiamplitud_objetivo is not None
+                or umbral_decision is not None or antiteticas or variable_control
+                or instrumentar or trayectorias is not None or rebalanceo is not None):
+            raise ValueError("Con red no hay caché, modo secuencial, reducción de varianza, "
+                             "instrumentación, trayectorias ni rebalanceo")
+        from .red import simular_red
+        return simular_red(red, factor_demanda, leak_pct, horizonte_dias, n_reps,
+                           interarribos, duraciones, semilla=semilla, n_workers=n_workers,
+                           progreso=progreso, tam_lote=tam_lote, muestreo=muestreo,
+                           perfil=perfil, cancelado=cancelado)
+    inicio = time.perf_counter()
+    diagnostico = nuevo_diagnostico() if instrumentar else None
+    t_cache = 0.0
+    parametros = dict(s0=s0, factor_demanda=factor_demanda, leak_pct=leak_pct,
+                      horizonte_dias=horizonte_dias, interarribos=interarribos,
+                      duraciones=duraciones, motor=motor, semilla=semilla,
+                      antiteticas=antiteticas, muestreo=muestreo, perfil=perfil,
+                      rebalanceo=rebalanceo)
+    secuencial = semiamplitud_objetivo is not None or umbral_decision is not None
+    por_lotes = secuencial or progreso is not None or cancelado is not None
+    replicas = None
+    registro = (seleccion_replicas(trayectorias, n_reps) if trayectorias is not None
+                else None)
+    if cache is not None:
+        from .cache import clave_escenario, huella_array
+        clave = clave_escenario(s0, factor_demanda, leak_pct, horizonte_dias,
+                                semilla, interarribos, duraciones,
+                                antiteticas=antiteticas or None,
+                                muestreo=None if muestreo == 'empirico' else muestreo,
+                                perfil=None if perfil is None else huella_array(perfil.intensidades),
+                                rebalanceo=None if rebalanceo is None else rebalanceo.clave())
+        replicas = cache.obtener(clave, n_reps)
+        t_cache += time.perf_counter() - inicio
+    n_previas = 0 if replicas is None else len(replicas['pct_rechazos'])
+    n_disponibles = n_previas
+
+    n = 0
+    decision = None
+    motivo = 'tope'
+    while n < n_reps:
+        fin = min(n + tam_lote, n_reps) if por_lotes else n_reps
+        if fin > n_disponibles:
+            # Solo se simulan las réplicas que faltan: la caché aporta el prefijo
+            nuevas = correr_replicas(parametros, n_disponibles, fin, n_workers,
+                                     diagnostico, registro, cancelado)
+            replicas = nuevas if replicas is None else concatenar_replicas([replicas, nuevas])
+            # Cancelada a mitad del lote: vuelven menos réplicas
+            n_disponibles += len(nuevas['pct_rechazos'])
+        n = min(fin, n_disponibles)
+        cortada = n < fin
+        if progreso is not None and progreso(replicas, n) is False:
+            cortada = True
+        if cortada:
+            motivo = 'cancelada'
+            break
+        if not secuencial:
+            continue
+        pct = replicas['pct_rechazos'][:n]
+        if umbral_decision is not None:
+            decision = decision_temprana(pct, umbral_decision)
+            if decision is not None:
+                motivo = 'decision'
+                break
+        if semiamplitud_objetivo is not None and n >= max(n_min_precision, 2):
+            lo, hi = ic_media(pct)
+            if (hi - lo) / 2 <= semiamplitud_objetivo:
+                motivo = 'precision'
+                break
+
+    if registro is not None:
+        faltan = [rep for rep in registro.pendientes if rep < n]
+        if faltan:
+            simular_replicas(reps=faltan, trayectorias=registro,
+                             **dict(parametros, motor='eventos'))
+
+    if cache is not None and n_disponibles > n_previas:
+        t_guardar = time.perf_counter()
+        cache.guardar(clave, replicas)
+        t_cache += time.perf_counter() - t_guardar
+    t_resumen = time.perf_counter()
+
+    control = (llegadas_esperadas(interarribos, factor_demanda, horizonte_dias, muestreo,
+                                  perfil)
+               if variable_control else None)
+    resultado = resumir_replicas({k: v[:n] for k, v in replicas.items()},
+                                 antiteticas=antiteticas, llegadas_control=control)
+    resultado['replicas_desde_cache'] = min(n_previas, n)
+    if registro is not None:
+        resultado['trayectorias'] = registro
+    if secuencial or motivo == 'cancelada':
+        resultado['motivo_parada'] = motivo
+        if umbral_decision is not None:
+            resultado['cumple'] = (decision if decision is not None else
+                                   cumple_criterio(resultado['distribucion_rechazos'],
+                                                   umbral_decision))
+    if instrumentar:
+        fin = time.perf_counter()
+        simuladas = slice(n_previas, n_disponibles)
+        llegadas = replicas['llegadas'][simuladas]
+        resultado['diagnostico'] = {
+            'replicas_simuladas': n_disponibles - n_previas,
+            # Solo de las réplicas simuladas en esta llamada (no de la caché)
+            'eventos_por_tipo': {
+                'arribo': int(llegadas.sum()),
+                'retorno': int(replicas['eventos'][simuladas].sum() - llegadas.sum()),
+            },
+            'cola_max': diagnostico['cola_max'],
+            'tiempos_replica_s': np.array(diagnostico['tiempos_replica']),
+            # Con varios workers, muestreo y eventos suman el tiempo de todos
+            # los procesos y pueden superar al total
+            'fases_s': {
+                'cache': t_cache,
+                'muestreo': diagnostico['muestreo_s'],
+                'eventos': diagnostico['motor_s'] - diagnostico['muestreo_s'],
+                'resumen': fin - t_resumen,
+                'total': fin - inicio,
+            },
+        }
+    return resultado
+
+def correr_replicas(parametros, rep_ini, rep_fin, n_workers=1, diagnostico=None,
+                    trayectorias=None, cancelado=None):
+    # Réplicas rep_ini..rep_fin-1 del escenario, en serie o en el pool. Las
+    # trayectorias solo se registran en serie (el registro no cruza procesos).
+    # Con cancelado activado devuelve un prefijo (al menos una réplica).
+    if n_workers > 1:
+        from .paralelo import simular_replicas_en_paralelo
+        return simular_replicas_en_paralelo(n_reps=rep_fin - rep_ini,
+                                            n_workers=n_workers,
+                                            rep_ini=rep_ini,
+                                            diagnostico=diagnostico,
+                                            cancelado=cancelado, **parametros)
+    return simular_replicas(reps=range(rep_ini, rep_fin), diagnostico=diagnostico,
+                            trayectorias=trayectorias, cancelado=cancelado, **parametros)
+
+def simular_replicas(s0, factor_demanda, leak_pct, horizonte_dias, reps,
+                     interarribos, duraciones, motor='eventos', semilla=42,
+                     antiteticas=False, diagnostico=None, muestreo='empirico',
+                     perfil=None, trayectorias=None, rebalanceo=None, cancelado=None):
+    # Resultados por réplica (un array por métrica, en el orden de reps).
+    # trayectorias (RegistroTrayectorias) anota el stock de las réplicas
+    # elegidas; solo lo hacen los motores de eventos. Si cancelado se activa,
+    # los motores de eventos paran antes de la réplica siguiente y devuelven
+    # las hechas (siempre al menos una).
+    # Cada réplica depende solo de (semilla, rep): se puede simular en
+    # cualquier orden o partición y el resultado es el mismo.
+    if rebalanceo is not None and motor != 'eventos':
+        raise ValueError("El rebalanceo solo está en el motor 'eventos'")
+    extra = {} if rebalanceo is None else {'rebalanceo': rebalanceo}
+    if motor == 'eventos':
+        simular = _simular_eventos
+    elif motor == 'vectorizado':
+        simular = _simular_vectorizado
+    elif motor == 'eventos_heapq':
+        simular = _simular_eventos_heapq
+    else:
+        raise ValueError(f"Motor desconocido: {motor!r}")
+    inicio = time.perf_counter()
+    replicas = simular(s0, factor_demanda, leak_pct, horizonte_dias, list(reps),
+                       crear_muestreador(interarribos, muestreo),
+                       crear_muestreador(duraciones, muestreo), semilla,
+                       antiteticas=antiteticas, diagnostico=diagnostico,
+                       perfil=perfil, trayectorias=trayectorias, cancelado=cancelado,
+                       **extra)
+    if diagnostico is not None:
+        diagnostico['motor_s'] += time.perf_counter() - inicio
+    return replicas
+
+def simular_lote(escenarios, horizonte_dias, interarribos, duraciones,
+                 muestreo='empirico', perfil=None):
+    # Varios escenarios del mismo horizonte y los mismos datos en una sola
+    # corrida del motor vectorizado: cada fila es una réplica de un escenario
+    # con su S₀, demanda, leak y semilla. Cada escenario (dict con s0,
+    # factor_demanda, leak_pct, n_reps y opcionalmente semilla) da el mismo
+    # resumen que simular_escenario con esas n_reps réplicas.
+    n_reps = [int(e['n_reps']) for e in escenarios]
+    por_fila = lambda clave, defecto=None: np.repeat(
+        [e.get(clave, defecto) for e in escenarios], n_reps)
+    replicas = _simular_vectorizado(
+        por_fila('s0'), por_fila('factor_demanda'), por_fila('leak_pct'), horizonte_dias,
+        [rep for n in n_reps for rep in range(n)],
+        crear_muestreador(interarribos, muestreo), crear_muestreador(duraciones, muestreo),
+        por_fila('semilla', 42), perfil=perfil)
+    resultados = []
+    inicio = 0
+    for n in n_reps:
+        resultado = resumir_replicas({k: v[inicio:inicio + n] for k, v in replicas.items()})
+        resultado['replicas_desde_cache'] = 0
+        resultados.append(resultado)
+        inicio += n
+    return resultados
+
+def nuevo_diagnostico():
+    # Contadores del modo instrumentado, que los motores van acumulando
+    return {'cola_max': 0, 'tiempos_replica': [], 'muestreo_s': 0.0, 'motor_s': 0.0}
+
+def acumular_diagnostico(destino, origen):
+    destino['cola_max'] = max(destino['cola_max'], origen['cola_max'])
+    destino['tiempos_replica'].extend(origen['tiempos_replica'])
+    destino['muestreo_s'] += origen['muestreo_s']
+    destino['motor_s'] += origen['motor_s']
+
+def concatenar_replicas(partes):
+    return {k: np.concatenate([p[k] for p in partes]) for k in partes[0]}
+
+def resumir_replicas(replicas, antiteticas=False, llegadas_control=None):
+    rechazos_lista = replicas['pct_rechazos']
+    if antiteticas or llegadas_control is not None:
+        estimacion = estimar_media_reducida(
+            rechazos_lista, replicas['llegadas'] if llegadas_control is not None else None,
+            llegadas_control, antiteticas)
+    else:
+        estimacion = {'media': float(np.mean(rechazos_lista)),
+                      'ic95': ic_media(rechazos_lista)}
+    resumen = {
+        'n_replicas_usadas': len(rechazos_lista),
+        'pct_rechazos_media': estimacion['media'],
+        # IC95 de la media (t de Student); pct_rechazos_ic95 es el rango
+        # central del 95% de las réplicas
+        'pct_rechazos_media_ic95': estimacion['ic95'],
+        'pct_rechazos_ic95': (float(np.percentile(rechazos_lista, 2.5)),
+                              float(np.percentile(rechazos_lista, 97.5))),
+        'stock_promedio': float(np.mean(replicas['stock_promedio'])),
+        'distribucion_rechazos': rechazos_lista.tolist(),
+        'rechazos_media': float(np.mean(replicas['rechazos'])),
+        # Fracción de réplicas que llegaron a quedarse sin bicis
+        'prob_stockout': float(np.mean(replicas['stock_min'] == 0)),
+        't_cero_h': float(np.mean(replicas['t_cero_h'])),
+        'stock_min': int(np.min(replicas['stock_min'])),
+        'stock_max': int(np.max(replicas['stock_max'])),
+        'eventos_simulados': int(np.sum(replicas['eventos'])),
+        # Por hora del día (0-23), sumando arribos y rechazos de todas las réplicas
+        'llegadas_hora_media': replicas['llegadas_hora'].mean(axis=0).tolist(),
+        'pct_rechazos_hora': (replicas['rechazos_hora'].sum(axis=0)
+                              / np.maximum(replicas['llegadas_hora'].sum(axis=0), 1) * 100).tolist(),
+    }
+    if 'factor_reduccion' in estimacion:
+        resumen['factor_reduccion_varianza'] = estimacion['factor_reduccion']
+        resumen['beta_control'] = estimacion['beta']
+    if 'viajes_camion' in replicas:
+        resumen['viajes_camion_media'] = float(np.mean(replicas['viajes_camion']))
+        resumen['bicis_repuestas_media'] = float(np.mean(replicas['bicis_repuestas']))
+    return resumen
+
+# ============================================
+# GENERADORES ALEATORIOS POR RÉPLICA
+# ============================================
+
+class FlujoMuestras:
+    # Muestras de un Generator propio, generadas en bloques y entregadas de a
+    # una (siguiente) o en bloque. Con muestreador, cada uniforme u se
+    # transforma en muestreador.inversa(u) / escala; sin él se entregan los
+    # uniformes. Con espejo se usa 1-u: la muestra antitética.
+    def __init__(self, rng, muestreador=None, escala=1.0, tam_bloque=4096,
+                 espejo=False):
+        self.rng = rng
+        self.muestreador = muestreador
+        self.espejo = espejo
+        self.escala = escala
+        self.tam_bloque = tam_bloque
+        self._buffer = []
+        self._pos = 0
+        # Tiempo generando bloques (se mide siempre: son pocas llamadas)
+        self.segundos = 0.0
+
+    def bloque(self, n):
+        inicio = time.perf_counter()
+        u = self.rng.random(n)
+        if self.muestreador is None:
+            x = 1.0 - u if self.espejo else u
+        else:
+            x = self.muestreador.inversa(u, self.espejo) / self.escala
+        self.segundos += time.perf_counter() - inicio
+        return x
+
+    def siguiente(self):
+        if self._pos == len(self._buffer):
+            self._buffer = self.bloque(self.tam_bloque).tolist()
+            self._pos = 0
+        x = self._buffer[self._pos]
+        self._pos += 1
+        return x
+
+class FlujoArribos(FlujoMuestras):
+    # Interarribos en tiempo real. Con perfil, las muestras se interpretan en
+    # tiempo operativo (tasa constante) y los instantes de arribo se llevan a
+    # tiempo real con la inversa de la intensidad acumulada, de a un bloque
+    # con np.interp: el mismo proceso de renovación, más denso en las horas
+    # pico. Además cuenta los arribos por hora del día hasta el horizonte, con
+    # los mismos instantes que reconstruyen los motores (t + interarribo).
+    def __init__(self, rng, muestreador, escala=1.0, tam_bloque=4096,
+                 espejo=False, perfil=None, horizonte=np.inf):
+        super().__init__(rng, muestreador, escala, tam_bloque, espejo)
+        self.perfil = perfil
+        self.horizonte = horizonte
+        self.llegadas_hora = np.zeros(24, dtype=np.int64)
+        self._s = 0.0
+        self._t = 0.0
+        self._primero = True
+
+    def bloque(self, n):
+        x = super().bloque(n)
+        inicio = time.perf_counter()
+        if self.perfil is not None:
+            s = _acumular_desde(self._s, x)
+            self._s = s[-1]
+            x = np.diff(self.perfil.a_tiempo_real(s), prepend=self._t)
+        t = _acumular_desde(self._t, x)
+        if self._t < self.horizonte:
+            # El primer arribo cuenta si t <= horizonte; los demás si t < horizonte
+            procesados = t < self.horizonte
+            if self._primero and t[0] == self.horizonte:
+                procesados[0] = True
+            horas = (t[procesados] // 60 % 24).astype(np.intp)
+            self.llegadas_hora += np.bincount(horas, minlength=24)
+        self._t = t[-1]
+        self._primero = False
+        self.segundos += time.perf_counter() - inicio
+        return x
+
+def _acumular_desde(t0, x):
+    # t0 + x[0], (t0 + x[0]) + x[1], ...: las mismas sumas, en el mismo orden,
+    # que hace un motor avanzando arribo por arribo
+    t = x.copy()
+    t[0] += t0
+    return np.cumsum(t, out=t)
+
+def flujos_replica(semilla, rep, m_inter, m_dur, factor_demanda,
+                   antiteticas=False, perfil=None, horizonte=np.inf):
+    # Cada réplica tiene su propia SeedSequence (independiente de n_reps y del
+    # orden de ejecución) y tres flujos: interarribos, leak y duraciones.
+    # Los tres se consumen uno por arribo, se atienda o no, de modo que ambos
+    # motores ven exactamente los mismos números.
+    # Con antiteticas la réplica impar reutiliza la semilla de la par anterior
+    # y espeja los tres flujos. El leak también se espeja: compartirlo en el
+    # par correlaciona positivamente los rechazos cuando el leak domina.
+    # perfil y horizonte (minutos) van al flujo de interarribos.
+    espejo = antiteticas and rep % 2 == 1
+    base = rep - 1 if espejo else rep
+    ss_inter, ss_leak, ss_dur = np.random.SeedSequence(semilla, spawn_key=(base,)).spawn(3)
+    return (FlujoArribos(np.random.default_rng(ss_inter), m_inter, factor_demanda,
+                         espejo=espejo, perfil=perfil, horizonte=horizonte),
+            FlujoMuestras(np.random.default_rng(ss_leak), espejo=espejo),
+            FlujoMuestras(np.random.default_rng(ss_dur), m_dur, espejo=espejo))
+
+def llegadas_esperadas(interarribos, factor_demanda, horizonte_dias, muestreo='empirico',
+                       perfil=None):
+    # E[N(T)] de un proceso de renovación con los interarribos muestreados:
+    # T/mu + (cv² - 1)/2 (segundo orden). Se calcula de los momentos del
+    # muestreador y no de lambda_global para que la variable de control no
+    # quede sesgada. Con perfil, T es el tiempo operativo Lambda(T).
+    media, varianza = crear_muestreador(interarribos, muestreo).momentos()
+    mu = media / factor_demanda
+    cv2 = varianza / media ** 2
+    tiempo = horizonte_dias * 24 * 60
+    if perfil is not None:
+        tiempo = float(perfil.acumulada(tiempo))
+    return float(tiempo / mu + (cv2 - 1) / 2)
+
+# ============================================
+# MOTORES
+# ============================================
+
+def _simular_eventos(s0, factor_demanda, leak_pct, horizonte_dias, reps,
+                     m_inter, m_dur, semilla=42, antiteticas=False,
+                     diagnostico=None, perfil=None, trayectorias=None, rebalanceo=None,
+                     cancelado=None):
+    # Calendario de eventos propio: como hay a lo sumo un arribo pendiente,
+    # se guarda aparte (prox, inf si no hay más) y el heap solo tiene
+    # tiempos de retorno (floats, sin tuplas ni etiquetas). Ante un empate
+    # se atiende primero el arribo, igual que en la versión con tuplas.
+    # El camión de rebalanceo tampoco va al heap: hay a lo sumo uno en
+    # viaje (t_camion) y una próxima revisión periódica (t_revision); t_reb
+    # es el menor de los dos, inf sin política.
+    tiempo_sim = horizonte_dias * 24 * 60
+    leak_prob = leak_pct / 100.0
+    medir = diagnostico is not None
+    heappush, heappop = heapq.heappush, heapq.heappop
+    inf = float('inf')
+    filas = []
+    # disparo: stock al que un retiro manda el camión (revisión continua);
+    # -1 si no hay política o la revisión es periódica
+    disparo = -1
+    periodo = None
+    if rebalanceo is not None:
+        s_reb, S_reb = rebalanceo.s, rebalanceo.S
+        capacidad, demora = rebalanceo.capacidad, rebalanceo.demora_min
+        periodo = rebalanceo.periodo_min
+        if periodo is None:
+            disparo = s_reb
+
+    for rep in reps:
+        if filas and cancelado is not None and cancelado.is_set():
+            break
+        inicio = time.perf_counter()
+        f_inter, f_leak, f_dur = flujos_replica(semilla, rep, m_inter, m_dur,
+                                                factor_demanda, antiteticas,
+                                                perfil, tiempo_sim)
+        siguiente_inter = f_inter.siguiente
+        siguiente_leak = f_leak.siguiente
+        siguiente_dur = f_dur.siguiente
+        cola_max = 1
+        stock = s0
+        acum = AcumuladorStock(s0) if trayectorias is None else trayectorias.acumulador(rep, s0)
+        rechazos_hora = [0] * 24
+        retornos = []
+        prox = siguiente_inter()
+        t_camion = demora if stock <= disparo else inf
+        t_revision = periodo if periodo is not None else inf
+        t_reb = min(t_camion, t_revision)
+        viajes = repuestas = 0
+
+        while True:
+            if t_reb < prox and not (retornos and retornos[0] < t_reb):
+                t = t_reb
+                if t > tiempo_sim:
+                    break
+                if t == t_camion:
+                    # Llega el camión: completa hasta S con lo que trae
+                    carga = min(capacidad, S_reb - stock)
+                    if carga > 0:
+                        stock += carga
+                        repuestas += carga
+                        acum.cambiar(t, stock)
+                    viajes += 1
+                    t_camion = t + demora if stock <= disparo else inf
+                else:
+                    t_revision += periodo
+                    if stock <= s_reb and t_camion == inf:
+                        t_camion = t + demora
+                t_reb = min(t_camion, t_revision)
+                continue
+
+            if retornos and retornos[0] < prox:
+                t = heappop(retornos)
+                if t > tiempo_sim:
+                    break
+                stock += 1
+                acum.cambiar(t, stock)
+                continue
+
+            t = prox
+            if t > tiempo_sim:
+                break
+            u_leak = siguiente_leak()
+            dur = siguiente_dur()
+            if stock > 0:
+                stock -= 1
+                acum.arribo(True, t)
+                acum.cambiar(t, stock)
+                if u_leak > leak_prob:
+                    heappush(retornos, t + dur)
+                else:
+                    acum.fuga(t)
+                if stock <= disparo and t_camion == inf:
+                    t_camion = t + demora
+                    t_reb = min(t_camion, t_revision)
+            else:
+                acum.arribo(False, t)
+                rechazos_hora[int(t // 60 % 24)] += 1
+            prox = t + siguiente_inter()
+            if not prox < tiempo_sim:
+                prox = inf
+            if medir and len(retornos) + (prox < inf) > cola_max:
+                cola_max = len(retornos) + (prox < inf)
+
+        acum.cerrar(tiempo_sim)
+        fila = acum.resultado(tiempo_sim)
+        fila['llegadas_hora'] = f_inter.llegadas_hora
+        fila['rechazos_hora'] = rechazos_hora
+        if rebalanceo is not None:
+            # Las bicis repuestas no son retornos; cada viaje es un evento
+            fila['eventos'] += viajes - repuestas
+            fila['viajes_camion'] = viajes
+            fila['bicis_repuestas'] = repuestas
+        filas.append(fila)
+        if medir:
+            diagnostico['tiempos_replica'].append(time.perf_counter() - inicio)
+            diagnostico['cola_max'] = max(diagnostico['cola_max'], cola_max)
+            diagnostico['muestreo_s'] += f_inter.segundos + f_leak.segundos + f_dur.segundos
+
+    return tabla_replicas(filas)
+
+def _simular_eventos_heapq(s0, factor_demanda, leak_pct, horizonte_dias, reps,
+                           m_inter, m_dur, semilla=42, antiteticas=False,
+                           diagnostico=None, perfil=None, trayectorias=None,
+                           cancelado=None):
+    # Versión original con un heapq de tuplas (tiempo, 'arribo'|'retorno'):
+    # se conserva como referencia para benchmarks. Los empates se resuelven
+    # comparando las etiquetas ('arribo' < 'retorno').
+    tiempo_sim = horizonte_dias * 24 * 60
+    leak_prob = leak_pct / 100.0
+    medir = diagnostico is not None
+    filas = []
+
+    for rep in reps:
+        if filas and cancelado is not None and cancelado.is_set():
+            break
+        inicio = time.perf_counter()
+        f_inter, f_leak, f_dur = flujos_replica(semilla, rep, m_inter, m_dur,
+                                                factor_demanda, antiteticas,
+                                                perfil, tiempo_sim)
+        cola_max = 1
+        stock = s0
+        t = 0.0
+        acum = AcumuladorStock(s0) if trayectorias is None else trayectorias.acumulador(rep, s0)
+        rechazos_hora = [0] * 24
+        eventos = []
+        inter = f_inter.siguiente()
+        heapq.heappush(eventos, (inter, 'arribo'))
+
+        while eventos:
+            t, tipo = heapq.heappop(eventos)
+            if t > tiempo_sim:
+                break
+
+            if tipo == 'arribo':
+                u_leak = f_leak.siguiente()
+                dur = f_dur.siguiente()
+                if stock > 0:
+                    stock -= 1
+                    acum.arribo(True)
+                    acum.cambiar(t, stock)
+                    if u_leak > leak_prob:
+                        heapq.heappush(eventos, (t + dur, 'retorno'))
+                else:
+                    acum.arribo(False)
+                    rechazos_hora[int(t // 60 % 24)] += 1
+                inter = f_inter.siguiente()
+                prox = t + inter
+                if prox < tiempo_sim:
+                    heapq.heappush(eventos, (prox, 'arribo'))
+                if medir and len(eventos) > cola_max:
+                    cola_max = len(eventos)
+            elif tipo == 'retorno':
+                stock += 1
+                acum.cambiar(t, stock)
+
+        acum.cerrar(tiempo_sim)
+        fila = acum.resultado(tiempo_sim)
+        fila['llegadas_hora'] = f_inter.llegadas_hora
+        fila['rechazos_hora'] = rechazos_hora
+        filas.append(fila)
+        if medir:
+            diagnostico['tiempos_replica'].append(time.perf_counter() - inicio)
+            diagnostico['cola_max'] = max(diagnostico['cola_max'], cola_max)
+            diagnostico['muestreo_s'] += f_inter.segundos + f_leak.segundos + f_dur.segundos
+
+    return tabla_replicas(filas)
+
+def _simular_vectorizado(s0, factor_demanda, leak_pct, horizonte_dias, reps,
+                         m_inter, m_dur, semilla=42, antiteticas=False,
+                         diagnostico=None, perfil=None, trayectorias=None, cancelado=None,
+                         tam_bloque=1024):
+    # Avanza todas las réplicas a la vez, un arribo por paso, sin mirar las
+    # bicis una por una. La duración se sortea en cada arribo aunque se
+    # rechace, así que el retorno posible de cada arribo (inf si es leak) se
+    # conoce antes de decidir: al atenderlo se anota +1 en el paso (arribo)
+    # desde el que esa bici ya está disponible. Cada paso suma lo anotado y
+    # decide con unas pocas operaciones sobre las réplicas, sin depender de
+    # S₀. Las estadísticas salen después, por bloque, de las decisiones.
+    # s0, factor_demanda, leak_pct y semilla pueden ser un valor por réplica
+    # (varios escenarios en una misma corrida, ver simular_lote).
+    # No registra trayectorias: simular_escenario las completa con el motor
+    # de eventos. Tampoco se corta con cancelado: las réplicas terminan juntas.
+    tiempo_sim = horizonte_dias * 24 * 60
+    n_reps = len(reps)
+    s0 = np.broadcast_to(np.asarray(s0, dtype=np.int64), (n_reps,))
+    factores = np.broadcast_to(np.asarray(factor_demanda), (n_reps,))
+    semillas = np.broadcast_to(np.asarray(semilla), (n_reps,))
+    leak_prob = np.broadcast_to(np.asarray(leak_pct, dtype=float) / 100.0, (n_reps,))
+    medir = diagnostico is not None
+    inicio = time.perf_counter()
+    flujos = [flujos_replica(int(sem), rep, m_inter, m_dur, fac.item(),
+                             antiteticas, perfil, tiempo_sim)
+              for sem, rep, fac in zip(semillas, reps, factores)]
+    filas = np.arange(n_reps)
+    # Las matrices de cada bloque son (paso, réplica): un paso es una fila
+    # contigua. Los pasos B y B+1 de la matriz de retornos anotados son
+    # "después del bloque" y "nunca" (leak o después del horizonte). Con
+    # muchas réplicas el bloque se acorta para que cada matriz quede en ~2 MB.
+    B = min(tam_bloque, max(64, 2**18 // max(n_reps, 1)))
+
+    libres = s0.copy()
+    llegadas = np.zeros(n_reps, dtype=np.int64)
+    rechazos = np.zeros(n_reps, dtype=np.int64)
+    retornos = np.zeros(n_reps, dtype=np.int64)
+    rechazos_hora = np.zeros((n_reps, 24), dtype=np.int64)
+    afuera = np.zeros(n_reps)
+    t_cero = np.zeros(n_reps)
+    stock_min = s0.copy()
+    # Último arribo del bloque anterior y stock después de él
+    t_ant = np.zeros(n_reps)
+    stock_ant = s0.copy()
+    # Réplicas cuyo tramo desde el último arribo hasta el horizonte falta sumar
+    abierta = np.ones(n_reps, dtype=bool)
+    # Retornos que caen después del último arribo de su bloque (réplica,
+    # instante), solo de las réplicas que siguen activas
+    pend_fila = np.zeros(0, dtype=np.intp)
+    pend_t = np.zeros(0)
+    en_viaje = np.zeros(n_reps, dtype=np.int64)
+    activa = np.ones(n_reps, dtype=bool)
+    primero = True
+
+    while activa.any():
+        inter = np.stack([f[0].bloque(B) for f in flujos], axis=1)
+        u_leak = np.stack([f[1].bloque(B) for f in flujos], axis=1)
+        durs = np.stack([f[2].bloque(B) for f in flujos], axis=1)
+        tiempos = np.cumsum(np.concatenate([t_ant[None], inter]), axis=0)[1:]
+        # El primer arribo se procesa si t <= horizonte, los siguientes si t < horizonte
+        activo = tiempos < tiempo_sim
+        if primero:
+            activo[0] |= tiempos[0] <= tiempo_sim
+        n_activos = activo.sum(axis=0)
+        retorno = np.where(u_leak > leak_prob, tiempos + durs, np.inf)
+
+        # Paso desde el que está disponible cada retorno: el primer arribo
+        # posterior (con empate se atiende primero el arribo)
+        paso = np.full((n_reps, B), B + 1, dtype=np.intp)
+        orden = np.argsort(pend_fila, kind='stable')
+        pend_fila, pend_t = pend_fila[orden], pend_t[orden]
+        limites = np.searchsorted(pend_fila, np.arange(n_reps + 1))
+        paso_pend = np.empty(len(pend_t), dtype=np.intp)
+        por_fila_t = np.ascontiguousarray(tiempos.T)
+        por_fila_r = retorno.T
+        for i in np.flatnonzero(activa):
+            paso[i] = np.searchsorted(por_fila_t[i], por_fila_r[i], side='right')
+            a, b = limites[i], limites[i + 1]
+            paso_pend[a:b] = np.searchsorted(por_fila_t[i], pend_t[a:b], side='right')
+        paso = paso.T
+        paso[retorno > tiempo_sim] = B + 1
+        llegan = np.zeros((B + 2, n_reps), dtype=np.int64)
+        np.add.at(llegan, (paso_pend, pend_fila), 1)
+        destino = (paso * n_reps + filas).ravel()
+        anotar = llegan.reshape(-1)
+
+        atendido = np.zeros((B, n_reps), dtype=bool)
+        stock = np.zeros((B, n_reps), dtype=np.int64)
+        for k in range(int(n_activos.max())):
+            libres += llegan[k]
+            atendido_k = atendido[k]
+            np.greater(libres, 0, out=atendido_k)
+            atendido_k &= activo[k]
+            libres -= atendido_k
+            stock[k] = libres
+            anotar[destino[k * n_reps:(k + 1) * n_reps]] += atendido_k
+
+        rechazado = activo & ~atendido
+        llegadas += n_activos
+        rechazos += rechazado.sum(axis=0)
+        if rechazado.any():
+            k, i = np.nonzero(rechazado)
+            horas = (tiempos[k, i] // 60 % 24).astype(np.intp)
+            rechazos_hora += np.bincount(i * 24 + horas, minlength=n_reps * 24).reshape(n_reps, 24)
+        stock_min = np.minimum(stock_min, np.where(activo, stock, stock_min).min(axis=0))
+        # Integral del stock = s0 * horizonte - tiempo que pasó cada bici afuera
+        afuera += np.where(atendido, np.minimum(retorno, tiempo_sim) - tiempos, 0.0).sum(axis=0)
+        retornos += (atendido & (retorno <= tiempo_sim)).sum(axis=0)
+
+        # Tiempo en cero: entre cada arribo que deja el stock en cero y el
+        # primer retorno que cae antes del arribo siguiente (o del horizonte,
+        # en el primer paso inactivo de cada réplica)
+        tramo = activo.copy()
+        cierre = abierta & (n_activos < B)
+        tramo[n_activos[cierre], filas[cierre]] = True
+        abierta &= ~cierre
+        desde = np.concatenate([t_ant[None], tiempos[:-1]])
+        en_cero = tramo & (np.concatenate([stock_ant[None], stock[:-1]]) == 0)
+        if en_cero.any():
+            primer = np.full((B + 2, n_reps), np.inf)
+            cae = atendido & en_cero[np.minimum(paso, B - 1), filas] & (paso < B)
+            np.minimum.at(primer, (paso[cae], np.broadcast_to(filas, paso.shape)[cae]),
+                          retorno[cae])
+            cae = en_cero[np.minimum(paso_pend, B - 1), pend_fila] & (paso_pend < B)
+            np.minimum.at(primer, (paso_pend[cae], pend_fila[cae]), pend_t[cae])
+            hasta = np.minimum(primer[:B], np.where(activo, tiempos, tiempo_sim))
+            t_cero += np.where(en_cero, hasta - desde, 0.0).sum(axis=0)
+
+        if medir:
+            # Equivalente a la cola del motor de eventos: retornos
+            # pendientes más el próximo arribo
+            en_camino = atendido & (retorno < np.inf)
+            pendientes = (en_viaje + np.cumsum(en_camino, axis=0)
+                          - np.cumsum(llegan[:B], axis=0))
+            diagnostico['cola_max'] = max(diagnostico['cola_max'],
+                                          int(np.where(activo, pendientes, 0).max()) + 1)
+            en_viaje += en_camino.sum(axis=0) - llegan[:B].sum(axis=0)
+
+        sigue = atendido & (paso == B)
+        quedan = paso_pend == B
+        activa = activo[-1]
+        pend_fila = np.concatenate([pend_fila[quedan], np.nonzero(sigue)[1]])
+        pend_t = np.concatenate([pend_t[quedan], retorno[sigue]])
+        sigue = activa[pend_fila]
+        pend_fila, pend_t = pend_fila[sigue], pend_t[sigue]
+        t_ant = tiempos[-1]
+        stock_ant = stock[-1]
+        primero = False
+
+    if medir:
+        # Las réplicas avanzan juntas: se reparte el tiempo en partes iguales
+        diagnostico['tiempos_replica'].extend([(time.perf_counter() - inicio) / n_reps] * n_reps)
+        diagnostico['muestreo_s'] += sum(f.segundos for fs in flujos for f in fs)
+
+    duracion = float(tiempo_sim)
+    stock_final = s0 - llegadas + rechazos + retornos
+    return {
+        'pct_rechazos': np.where(llegadas > 0, rechazos / np.maximum(llegadas, 1) * 100, 0.0),
+        'stock_promedio': (s0 * duracion - afuera) / duracion if duracion > 0
+                          else stock_final.astype(float),
+        'rechazos': rechazos,
+        'llegadas': llegadas,
+        'stock_min': stock_min,
+        # Sin rebalanceo el stock nunca pasa del inicial
+        'stock_max': s0.copy(),
+        't_cero_h': t_cero / 60.0,
+        'eventos': llegadas + retornos,
+        'llegadas_hora': np.array([f[0].llegadas_hora for f in flujos]).reshape(n_reps, 24),
+        'rechazos_hora': rechazos_hora,
+    }
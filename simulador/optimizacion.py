@@ -0,0 +1,88 @@
+from .analitico import acotar_s0
+from .motor import simular_escenario
+
+# ============================================
+# BÚSQUEDA BINARIA DE S₀
+# ============================================
+
+def evaluar_s0(s0, factor_demanda, leak_pct, horizonte_dias, interarribos,
+               duraciones, umbral_pct=5.0, n_max=500, tam_lote=50,
+               motor='eventos', semilla=42, n_workers=1, cache=None,
+               muestreo='empirico', perfil=None):
+    # Corre réplicas en lotes y corta apenas el criterio queda decidido.
+    # Todas las evaluaciones usan la misma semilla: la réplica i ve los mismos
+    # arribos y duraciones para cualquier S₀ (números aleatorios comunes).
+    res = simular_escenario(s0, factor_demanda, leak_pct, horizonte_dias, n_max,
+                            interarribos, duraciones, motor=motor,
+                            semilla=semilla, n_workers=n_workers, cache=cache,
+                            umbral_decision=umbral_pct, tam_lote=tam_lote,
+                            muestreo=muestreo, perfil=perfil)
+    return {
+        's0': int(s0),
+        'n_replicas': res['n_replicas_usadas'],
+        'pct_medio': res['pct_rechazos_media'],
+        'ic_lower': res['pct_rechazos_ic95'][0],
+        'ic_upper': res['pct_rechazos_ic95'][1],
+        'cumple': res['cumple'],
+        'parada_temprana': res['motivo_parada'] == 'decision' and res['n_replicas_usadas'] < n_max,
+        'eventos': res['eventos_simulados'],
+    }
+
+def optimizar_s0(factor_demanda, leak_pct, horizonte_dias, interarribos,
+                 duraciones, umbral_pct=5.0, s0_min=1, s0_max=150, n_max=500,
+                 tam_lote=50, motor='eventos', semilla=42, n_workers=1,
+                 cache=None, acotar=True, muestreo='empirico', perfil=None,
+                 progreso=None):
+    # Menor S₀ en [s0_min, s0_max] que cumple el criterio, suponiendo que
+    # los rechazos decrecen con S₀. Devuelve el camino de evaluaciones.
+    # Con acotar, el estimador analítico propone el rango y la DES solo
+    # verifica sus extremos (ampliándolo si se equivocó) antes de bisecar.
+    # El estimador analítico no conoce el perfil horario: con uno marcado la
+    # cota suele quedar baja y se amplía.
+    # progreso(evaluacion) se llama después de cada evaluación.
+    evaluaciones = []
+    cumple = {}
+
+    def evaluar(s0):
+        if s0 not in cumple:
+            ev = evaluar_s0(s0, factor_demanda, leak_pct, horizonte_dias,
+                            interarribos, duraciones, umbral_pct, n_max, tam_lote,
+                            motor, semilla, n_workers, cache, muestreo, perfil)
+            evaluaciones.append(ev)
+            cumple[s0] = ev['cumple']
+            if progreso is not None:
+                progreso(ev)
+        return cumple[s0]
+
+    cota = None
+    if acotar:
+        cota = acotar_s0(factor_demanda, leak_pct, horizonte_dias, interarribos,
+                         duraciones, umbral_pct, s0_min, s0_max)
+        lo, hi = cota
+        while not evaluar(hi) and hi < s0_max:
+            lo, hi = hi + 1, min(2 * hi, s0_max)
+        if cumple[hi] and lo > s0_min and evaluar(lo - 1):
+            lo, hi = s0_min, lo - 1
+    else:
+        lo, hi = s0_min, s0_max
+
+    s0_optimo = None
+    if evaluar(hi):
+        # Invariante: hi cumple; se busca el menor que cumple en [lo, hi]
+        while lo < hi:
+            medio = (lo + hi) // 2
+            if evaluar(medio):
+                hi = medio
+            else:
+                lo = medio + 1
+        s0_optimo = hi
+
+    replicas_usadas = sum(ev['n_replicas'] for ev in evaluaciones)
+    return {
+        's0_optimo': s0_optimo,
+        'cota_analitica': cota,
+        'evaluaciones': evaluaciones,
+        'replicas_usadas': replicas_usadas,
+        'replicas_sin_parada': n_max * len(evaluaciones),
+        'eventos_totales': sum(ev['eventos'] for ev in evaluaciones),
+    }
@@ -0,0 +1,162 @@
+import atexit
+import hashlib
+import multiprocessing as mp
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .motor import (acumular_diagnostico, concatenar_replicas, nuevo_diagnostico,
+                    simular_escenario, simular_replicas)
+
+# ============================================
+# POOL DE PROCESOS REUTILIZABLE
+# ============================================
+
+# Un pool por cantidad de workers, vivo mientras viva el proceso. Streamlit
+# re-ejecuta app.py en cada interacción pero no re-importa este módulo, así
+# que los reruns reutilizan los mismos procesos.
+_POOLS = {}
+# Arrays publicados en memoria compartida, por hash de contenido
+_COMPARTIDOS = {}
+
+def obtener_pool(n_workers):
+    pool = _POOLS.get(n_workers)
+    if pool is None:
+        # spawn: los workers no heredan los hilos de Streamlit
+        pool = ProcessPoolExecutor(max_workers=n_workers,
+                                   mp_context=mp.get_context('spawn'))
+        _POOLS[n_workers] = pool
+    return pool
+
+def compartir_array(arr):
+    # Copia el array a memoria compartida una sola vez y devuelve un
+    # descriptor liviano (nombre, forma, dtype) para pasar a las tareas.
+    arr = np.ascontiguousarray(arr)
+    clave = hashlib.sha1(arr.tobytes()).hexdigest() + arr.dtype.str + str(arr.shape)
+    if clave not in _COMPARTIDOS:
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        _COMPARTIDOS[clave] = (shm, (shm.name, arr.shape, arr.dtype.str))
+    return _COMPARTIDOS[clave][1]
+
+@atexit.register
+def _liberar():
+    for pool in _POOLS.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    for shm, _ in _COMPARTIDOS.values():
+        shm.close()
+        shm.unlink()
+    _POOLS.clear()
+    _COMPARTIDOS.clear()
+
+# ============================================
+# LADO WORKER
+# ============================================
+
+_ADJUNTOS = {}
+
+def _adjuntar(descriptor):
+    nombre, forma, dtype = descriptor
+    if nombre not in _ADJUNTOS:
+        # Con spawn los workers comparten el resource_tracker del proceso
+        # principal, que es quien libera el segmento al terminar
+        shm = shared_memory.SharedMemory(name=nombre)
+        arr = np.ndarray(forma, dtype=dtype, buffer=shm.buf)
+        arr.flags.writeable = False
+        _ADJUNTOS[nombre] = (shm, arr)
+    return _ADJUNTOS[nombre][1]
+
+def _tarea_replicas(parametros, desc_inter, desc_dur, rep_ini, rep_fin,
+                    instrumentar=False):
+    diagnostico = nuevo_diagnostico() if instrumentar else None
+    replicas = simular_replicas(
+        reps=range(rep_ini, rep_fin),
+        interarribos=_adjuntar(desc_inter),
+        duraciones=_adjuntar(desc_dur),
+        diagnostico=diagnostico,
+        **parametros)
+    return replicas, diagnostico
+
+def _tarea_escenario(parametros, desc_inter, desc_dur):
+    resumen = simular_escenario(interarribos=_adjuntar(desc_inter),
+                                duraciones=_adjuntar(desc_dur), **parametros)
+    # La distribución completa no hace falta en los barridos
+    resumen.pop('distribucion_rechazos', None)
+    return resumen
+
+# ============================================
+# EJECUCIÓN EN PARALELO
+# ============================================
+
+def repartir(n_reps, n_partes):
+    # Rangos contiguos [ini, fin) que cubren 0..n_reps en orden
+    limites = np.linspace(0, n_reps, n_partes + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(limites[:-1], limites[1:]) if b > a]
+
+def recoger_en_orden(futuros, cancelado=None, espera_s=0.1):
+    # Resultados de los futuros, en el orden en que se enviaron. Si cancelado
+    # se activa mientras tanto, devuelve solo el prefijo ya terminado (al
+    # menos el primero, para que haya resumen). Al salir, también por un
+    # error, se cancelan las tareas que no empezaron; las que están
+    # corriendo terminan en su worker y su resultado se descarta.
+    try:
+        pendientes = set(futuros)
+        while pendientes and not (cancelado is not None and cancelado.is_set()):
+            _, pendientes = wait(pendientes, timeout=None if cancelado is None else espera_s,
+                                 return_when=FIRST_COMPLETED)
+        resultados = [futuros[0].result()]
+        for futuro in futuros[1:]:
+            if not futuro.done():
+                break
+            resultados.append(futuro.result())
+        return resultados
+    finally:
+        for futuro in futuros:
+            futuro.cancel()
+
+def simular_replicas_en_paralelo(s0, factor_demanda, leak_pct, horizonte_dias,
+                                 n_reps, interarribos, duraciones,
+                                 motor='eventos', semilla=42, n_workers=2,
+                                 rep_ini=0, antiteticas=False, diagnostico=None,
+                                 muestreo='empirico', perfil=None, rebalanceo=None,
+                                 cancelado=None):
+    # Reparte las réplicas rep_ini..rep_ini+n_reps entre los workers y las une
+    # en orden de réplica: el resultado es idéntico al de la ejecución serial.
+    # Con diagnostico, los contadores de cada worker se suman en él. Si
+    # cancelado se activa, vuelven solo las réplicas de las tareas terminadas
+    # en orden (ver recoger_en_orden).
+    parametros = dict(s0=s0, factor_demanda=factor_demanda, leak_pct=leak_pct,
+                      horizonte_dias=horizonte_dias, motor=motor, semilla=semilla,
+                      antiteticas=antiteticas, muestreo=muestreo, perfil=perfil,
+                      rebalanceo=rebalanceo)
+    desc_inter = compartir_array(interarribos)
+    desc_dur = compartir_array(duraciones)
+    # El motor de eventos se equilibra mejor con varias tareas por worker; el
+    # vectorizado rinde más con lotes grandes, una tarea por worker
+    rangos = repartir(n_reps, n_workers * (4 if motor == 'eventos' else 1))
+    pool = obtener_pool(n_workers)
+    futuros = [pool.submit(_tarea_replicas, parametros, desc_inter, desc_dur,
+                           rep_ini + a, rep_ini + b, diagnostico is not None)
+               for a, b in rangos]
+    partes = recoger_en_orden(futuros, cancelado)
+    if diagnostico is not None:
+        for _, parcial in partes:
+            acumular_diagnostico(diagnostico, parcial)
+    return concatenar_replicas([replicas for replicas, _ in partes])
+
+def simular_escenarios_en_paralelo(lista_parametros, interarribos, duraciones,
+                                   n_workers=2):
+    # Un escenario completo por tarea. Devuelve (índice, resumen) a medida
+    # que terminan, para poder guardar avance sin esperar al más lento.
+    desc_inter = compartir_array(interarribos)
+    desc_dur = compartir_array(duraciones)
+    pool = obtener_pool(n_workers)
+    futuros = {pool.submit(_tarea_escenario, parametros, desc_inter, desc_dur): i
+               for i, parametros in enumerate(lista_parametros)}
+    try:
+        for futuro in as_completed(futuros):
+            yield futuros[futuro], futuro.result()
+    finally:
+        for futuro in futuros:
+            futuro.cancel()
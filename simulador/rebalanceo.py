@@ -0,0 +1,232 @@
+import argparse
+import itertools
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .datos import DIRECTORIO_DATOS, cargar_empiricos
+from .estadisticas import ic_media
+from .motor import correr_replicas
+
+# ============================================
+# POLÍTICAS DE REBALANCEO
+# ============================================
+
+# Con leak la estación pierde bicis de a poco (balance_neto < 0 en los
+# datos): en la práctica se repone con un camión. Una política (s, S) manda
+# el camión cuando el stock baja a s o menos; llega demora_min minutos
+# después y completa hasta S con lo que trae (a lo sumo capacidad bicis).
+# Sin periodo_min la revisión es continua (el retiro que deja el stock en s
+# dispara el viaje); con periodo_min el stock se mira cada tantos minutos.
+
+class PoliticaRebalanceo:
+    def __init__(self, s, S, capacidad=20, demora_min=60.0, periodo_min=None):
+        if not 0 <= s < S:
+            raise ValueError("La política (s, S) necesita 0 <= s < S")
+        if capacidad < 1:
+            raise ValueError("El camión tiene que poder llevar al menos una bici")
+        if demora_min < 0:
+            raise ValueError("La demora del camión no puede ser negativa")
+        if periodo_min is not None and periodo_min <= 0:
+            raise ValueError("El período de revisión tiene que ser positivo")
+        self.s = int(s)
+        self.S = int(S)
+        self.capacidad = int(capacidad)
+        self.demora_min = float(demora_min)
+        self.periodo_min = None if periodo_min is None else float(periodo_min)
+
+    def clave(self):
+        # Para la caché de escenarios y para comparar pedidos
+        return [self.s, self.S, self.capacidad, self.demora_min, self.periodo_min]
+
+    def descripcion(self):
+        revision = ("continua" if self.periodo_min is None
+                    else f"cada {self.periodo_min / 60:g} h")
+        return (f"(s={self.s}, S={self.S}) {revision}, camión de {self.capacidad}, "
+                f"demora {self.demora_min:g} min")
+
+    def __repr__(self):
+        return f"PoliticaRebalanceo{tuple(self.clave())}"
+
+def grilla_politicas(valores_s, valores_S, capacidades=(20,), demoras_min=(60.0,),
+                     periodos_min=(None,)):
+    # Todas las combinaciones con s < S
+    return [PoliticaRebalanceo(s, S, c, d, p)
+            for s, S, c, d, p in itertools.product(valores_s, valores_S, capacidades,
+                                                   demoras_min, periodos_min)
+            if s < S]
+
+# ============================================
+# EVALUACIÓN: RANKING Y SELECCIÓN
+# ============================================
+
+# Costo de un viaje de camión medido en usuarios rechazados: el puntaje de
+# una réplica es rechazos + COSTO_VIAJE × viajes (+ costo_bici × repuestas)
+COSTO_VIAJE = 5.0
+
+def evaluar_politicas(politicas, s0, factor_demanda, leak_pct, horizonte_dias,
+                      interarribos, duraciones, costo_viaje=COSTO_VIAJE, costo_bici=0.0,
+                      delta=2.0, alfa=0.05, n0=20, n_max=500, tam_lote=20, semilla=42,
+                      n_workers=1, muestreo='empirico', perfil=None, progreso=None):
+    # Elige la política de menor puntaje medio con el procedimiento
+    # totalmente secuencial de Kim y Nelson (KN): todas corren n0 réplicas,
+    # de ahí sale la varianza de cada diferencia entre pares, y después las
+    # que siguen en carrera avanzan de a tam_lote réplicas. Una política se
+    # descarta cuando su media supera a la de otra por más de un margen que
+    # se achica con las réplicas. Así el esfuerzo va a las que están cerca de
+    # la mejor y las claramente dominadas salen temprano.
+    # Todas usan la misma semilla: la réplica i ve los mismos arribos y
+    # duraciones con cualquier política (números aleatorios comunes), y la
+    # varianza de las diferencias es mucho menor que la de cada una.
+    # None en politicas es "sin rebalanceo". Con probabilidad >= 1 - alfa la
+    # elegida está a menos de delta (en unidades de puntaje) de la mejor.
+    # Revisar cada tam_lote réplicas en vez de en cada una solo hace el
+    # procedimiento más conservador.
+    # progreso(r, vivas) se llama después de cada etapa.
+    k = len(politicas)
+    if k == 0:
+        raise ValueError("No hay políticas para evaluar")
+    if n0 < 2 or n0 > n_max:
+        raise ValueError("Hacen falta 2 <= n0 <= n_max")
+    puntajes = np.full((k, n_max), np.nan)
+    pct = np.full((k, n_max), np.nan)
+    viajes = np.zeros((k, n_max))
+    repuestas = np.zeros((k, n_max))
+    eventos = 0
+    n_hechas = np.zeros(k, dtype=int)
+
+    def correr(i, rep_ini, rep_fin):
+        nonlocal eventos
+        parametros = dict(s0=s0, factor_demanda=factor_demanda, leak_pct=leak_pct,
+                          horizonte_dias=horizonte_dias, interarribos=interarribos,
+                          duraciones=duraciones, motor='eventos', semilla=semilla,
+                          muestreo=muestreo, perfil=perfil, rebalanceo=politicas[i])
+        reps = correr_replicas(parametros, rep_ini, rep_fin, n_workers)
+        tramo = slice(rep_ini, rep_fin)
+        if politicas[i] is not None:
+            viajes[i, tramo] = reps['viajes_camion']
+            repuestas[i, tramo] = reps['bicis_repuestas']
+        puntajes[i, tramo] = (reps['rechazos'] + costo_viaje * viajes[i, tramo]
+                              + costo_bici * repuestas[i, tramo])
+        pct[i, tramo] = reps['pct_rechazos']
+        eventos += int(reps['eventos'].sum())
+        n_hechas[i] = rep_fin
+
+    vivas = list(range(k))
+    eliminada_en = {}
+    for i in vivas:
+        correr(i, 0, n0)
+    r = n0
+    if k > 1:
+        # Varianza de las diferencias con las n0 réplicas iniciales y
+        # constante h² de KN
+        eta = 0.5 * ((2 * alfa / (k - 1)) ** (-2 / (n0 - 1)) - 1)
+        h2 = 2 * eta * (n0 - 1)
+        inicial = puntajes[:, :n0]
+        var_dif = np.var(inicial[:, None, :] - inicial[None, :, :], axis=2, ddof=1)
+    while True:
+        if progreso is not None:
+            progreso(r, [politicas[i] for i in vivas])
+        if len(vivas) == 1:
+            break
+        medias = puntajes[vivas, :r].mean(axis=1)
+        margen = np.maximum(0.0, delta / (2 * r)
+                            * (h2 * var_dif[np.ix_(vivas, vivas)] / delta ** 2 - r))
+        # i sale si alguna otra le gana por más que el margen
+        sale = ((medias[:, None] - medias[None, :]) > margen).any(axis=1)
+        for i, fuera in zip(list(vivas), sale):
+            if fuera:
+                eliminada_en[i] = r
+        vivas = [i for i, fuera in zip(vivas, sale) if not fuera]
+        if len(vivas) == 1 or r >= n_max:
+            break
+        fin = min(r + tam_lote, n_max)
+        for i in vivas:
+            correr(i, r, fin)
+        r = fin
+
+    ranking = []
+    for i, politica in enumerate(politicas):
+        n = n_hechas[i]
+        lo, hi = ic_media(puntajes[i, :n])
+        ranking.append({
+            'politica': "Sin rebalanceo" if politica is None else politica.descripcion(),
+            'n_replicas': int(n),
+            'puntaje_medio': float(puntajes[i, :n].mean()),
+            'puntaje_ic95_inf': lo,
+            'puntaje_ic95_sup': hi,
+            'pct_rechazos_medio': float(pct[i, :n].mean()),
+            'viajes_medio': float(viajes[i, :n].mean()),
+            'bicis_repuestas_medio': float(repuestas[i, :n].mean()),
+            'eliminada_en': eliminada_en.get(i),
+        })
+    # Las que siguen en carrera primero; entre ellas y entre las
+    # descartadas, por puntaje
+    orden = sorted(range(k), key=lambda i: (i in eliminada_en, ranking[i]['puntaje_medio']))
+    mejor = min(vivas, key=lambda i: ranking[i]['puntaje_medio'])
+    return {
+        'mejor': politicas[mejor],
+        'ranking': [ranking[i] for i in orden],
+        'finalistas': len(vivas),
+        'replicas_usadas': int(n_hechas.sum()),
+        'replicas_sin_eliminar': k * n_max,
+        'eventos_totales': eventos,
+    }
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara políticas de rebalanceo (s, S) con ranking y selección")
+    parser.add_argument('--s0', type=int, default=20)
+    parser.add_argument('--factor', type=float, default=1.0)
+    parser.add_argument('--leak', type=float, default=5.0)
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--s', type=int, nargs='+', default=[2, 5, 10])
+    parser.add_argument('--S', type=int, nargs='+', default=[15, 20, 30])
+    parser.add_argument('--capacidad', type=int, nargs='+', default=[20])
+    parser.add_argument('--demora', type=float, nargs='+', default=[60.0],
+                        help="Demora del camión (minutos)")
+    parser.add_argument('--periodos', type=float, nargs='+', default=[0.0],
+                        help="Período de revisión en minutos; 0 = revisión continua")
+    parser.add_argument('--sin-rebalanceo', action='store_true',
+                        help="Incluir la alternativa de no reponer")
+    parser.add_argument('--costo-viaje', type=float, default=COSTO_VIAJE)
+    parser.add_argument('--costo-bici', type=float, default=0.0)
+    parser.add_argument('--delta', type=float, default=2.0)
+    parser.add_argument('--alfa', type=float, default=0.05)
+    parser.add_argument('--n0', type=int, default=20)
+    parser.add_argument('--n-max', type=int, default=300)
+    parser.add_argument('--lote', type=int, default=20)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    args = parser.parse_args(argv)
+
+    _, interarribos, duraciones = cargar_empiricos(args.datos)
+    politicas = grilla_politicas(args.s, args.S, args.capacidad, args.demora,
+                                 [p if p > 0 else None for p in args.periodos])
+    if args.sin_rebalanceo:
+        politicas.insert(0, None)
+    inicio = time.perf_counter()
+    res = evaluar_politicas(politicas, args.s0, args.factor, args.leak, args.dias,
+                            interarribos, duraciones, costo_viaje=args.costo_viaje,
+                            costo_bici=args.costo_bici, delta=args.delta, alfa=args.alfa,
+                            n0=args.n0, n_max=args.n_max, tam_lote=args.lote,
+                            semilla=args.semilla, n_workers=args.workers)
+    segundos = time.perf_counter() - inicio
+    mejor = "Sin rebalanceo" if res['mejor'] is None else res['mejor'].descripcion()
+    print(f"{len(politicas)} políticas, {res['replicas_usadas']:,} réplicas de "
+          f"{res['replicas_sin_eliminar']:,} sin eliminación, "
+          f"{res['eventos_totales']:,} eventos en {segundos:.1f} s")
+    print(f"Mejor: {mejor} ({res['finalistas']} finalista(s))")
+    import pandas as pd
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 60,
+                           'display.float_format', '{:.2f}'.format):
+        print(pd.DataFrame(res['ranking']).to_string())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+import argparse
+import heapq
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .datos import DIRECTORIO_DATOS, cargar_empiricos
+from .estadisticas import ic_media
+from .muestreadores import crear_muestreador
+
+# ============================================
+# RED DE ESTACIONES
+# ============================================
+
+ARCHIVO_RED = "red_estaciones.json"
+
+class Red:
+    # Estado de la red en arrays indexados por estación (sin un objeto por
+    # estación): stock inicial, retiros por hora, matriz origen-destino (cada
+    # fila suma 1) y, opcional, un factor de duración del viaje por par
+    # origen-destino (1 = duración empírica).
+    def __init__(self, s0, tasas_h, od, nombres=None, escala_duracion=None):
+        self.s0 = np.asarray(s0, dtype=np.int64)
+        self.tasas_h = np.asarray(tasas_h, dtype=float)
+        od = np.asarray(od, dtype=float)
+        n = len(self.s0)
+        if self.tasas_h.shape != (n,) or od.shape != (n, n):
+            raise ValueError("s0, tasas_h y od deben tener una fila por estación")
+        if (self.s0 < 0).any() or (self.tasas_h < 0).any() or (od < 0).any():
+            raise ValueError("s0, tasas_h y od no pueden tener valores negativos")
+        filas = od.sum(axis=1)
+        if (filas <= 0).any():
+            raise ValueError("Cada fila de la matriz origen-destino necesita algún destino")
+        self.od = od / filas[:, None]
+        self.nombres = list(nombres) if nombres is not None else [f"E{i:03d}" for i in range(n)]
+        self.escala_duracion = (None if escala_duracion is None
+                                else np.asarray(escala_duracion, dtype=float))
+        if self.escala_duracion is not None and self.escala_duracion.shape != (n, n):
+            raise ValueError("escala_duracion debe ser de estaciones × estaciones")
+        # FDA de cada fila, para elegir destinos con searchsorted
+        self.od_acumulada = np.cumsum(self.od, axis=1)
+        self.od_acumulada[:, -1] = 1.0
+
+    @property
+    def n(self):
+        return len(self.s0)
+
+    def flujo_neto_h(self):
+        # Devoluciones esperadas menos retiros por hora (sin leak)
+        return self.od.T @ self.tasas_h - self.tasas_h
+
+    @classmethod
+    def sintetica(cls, n_estaciones=50, tasa_media_h=2.1167, s0_medio=42,
+                  lado_km=5.0, semilla=0):
+        # Red de prueba: estaciones al azar en un cuadrado, retiros
+        # lognormales alrededor de tasa_media_h, destinos por modelo de
+        # gravedad (más populares y más cercanos, más probables) y duración
+        # proporcional a la distancia. S₀ proporcional a los retiros.
+        rng = np.random.default_rng(semilla)
+        xy = rng.uniform(0, lado_km, (n_estaciones, 2))
+        distancia = np.sqrt(((xy[:, None, :] - xy[None, :, :]) ** 2).sum(axis=2))
+        tasas = rng.lognormal(0.0, 0.6, n_estaciones)
+        tasas *= tasa_media_h / tasas.mean()
+        od = tasas[None, :] * np.exp(-distancia / (lado_km / 4))
+        od = od / od.sum(axis=1, keepdims=True)
+        # Media 1 ponderada por los viajes: la duración media global se conserva
+        escala = 0.3 + distancia
+        escala /= (od * tasas[:, None] * escala).sum() / tasas.sum()
+        s0 = np.maximum(1, np.round(s0_medio * tasas / tasas.mean())).astype(np.int64)
+        return cls(s0, tasas, od, escala_duracion=escala)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, 'r') as f:
+            datos = json.load(f)
+        return cls(datos['s0'], datos['tasas_h'], datos['od'], datos.get('nombres'),
+                   datos.get('escala_duracion'))
+
+    def guardar(self, ruta):
+        datos = {'nombres': self.nombres, 's0': self.s0.tolist(),
+                 'tasas_h': self.tasas_h.tolist(), 'od': self.od.tolist()}
+        if self.escala_duracion is not None:
+            datos['escala_duracion'] = self.escala_duracion.tolist()
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta, 'w') as f:
+            json.dump(datos, f)
+
+# ============================================
+# MOTOR DE RED
+# ============================================
+
+def _retiros_estacion(rng, muestreador, escala, tiempo_sim, perfil=None):
+    # Instantes de retiro en [0, tiempo_sim) de una estación, en bloques
+    # vectorizados: el proceso de renovación de los interarribos empíricos,
+    # con la tasa de la estación y, si hay perfil, el cambio de tiempo
+    limite = tiempo_sim if perfil is None else float(perfil.acumulada(tiempo_sim))
+    media, _ = muestreador.momentos()
+    tam = int(1.1 * limite * escala / media) + 64
+    partes = []
+    t0 = 0.0
+    while t0 < limite:
+        s = np.cumsum(muestreador.inversa(rng.random(tam)) / escala)
+        s += t0
+        partes.append(s)
+        t0 = s[-1]
+    s = np.concatenate(partes)
+    s = s[s < limite]
+    return s if perfil is None else perfil.a_tiempo_real(s)
+
+def _viajes_red(red, factor_demanda, leak_prob, tiempo_sim, m_inter, m_dur, semilla, rep,
+                perfil=None):
+    # Retiros de todas las estaciones, ordenados por tiempo, con origen,
+    # destino e instante de devolución (inf si la bici se pierde por leak).
+    # Cada estación saca sus uniformes de sus propios flujos, en la misma
+    # cantidad y orden que _retiros_estacion; las transformaciones (inversa,
+    # perfil, duraciones) se aplican a todas juntas y solo la suma acumulada
+    # y la búsqueda del destino van por estación, sobre vistas de los mismos
+    # arrays. El primer bloque de cada estación casi siempre alcanza el
+    # horizonte; la que no, se genera entera con _retiros_estacion.
+    limite = tiempo_sim if perfil is None else float(perfil.acumulada(tiempo_sim))
+    media_inter, _ = m_inter.momentos()
+    activas = np.flatnonzero(red.tasas_h > 0)
+    if len(activas) == 0:
+        vacio = np.empty(0)
+        return vacio, np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), vacio
+    # Escala que lleva la media de los interarribos a 60 / (tasa · factor)
+    escalas = red.tasas_h[activas] * factor_demanda * media_inter / 60.0
+    tams = (1.1 * limite * escalas / media_inter).astype(np.intp) + 64
+    semillas = [np.random.SeedSequence(semilla, spawn_key=(rep, int(i))).spawn(2)
+                for i in activas]
+    bordes = np.concatenate([[0], np.cumsum(tams)])
+    u = np.empty(bordes[-1])
+    for (ss_retiros, _), a, b in zip(semillas, bordes[:-1], bordes[1:]):
+        np.random.default_rng(ss_retiros).random(out=u[a:b])
+    x = m_inter.inversa(u) / np.repeat(escalas, tams)
+    partes = []
+    for fila, (a, b) in enumerate(zip(bordes[:-1], bordes[1:])):
+        s = np.cumsum(x[a:b], out=x[a:b])
+        largo = np.searchsorted(s, limite)
+        if largo < b - a:
+            partes.append(s[:largo])
+        else:
+            # En tiempo operativo: el perfil se aplica abajo, a todas juntas
+            partes.append(_retiros_estacion(np.random.default_rng(semillas[fila][0]), m_inter,
+                                            escalas[fila], limite))
+    largos = np.array([len(p) for p in partes])
+    t = np.concatenate(partes)
+    if perfil is not None:
+        t = perfil.a_tiempo_real(t)
+
+    # Marcas de cada retiro: destino, leak y duración
+    origen = np.repeat(activas, largos)
+    marcas = np.empty((len(t), 3))
+    destino = np.empty(len(t), dtype=np.intp)
+    inicio = 0
+    for i, (_, ss_marcas), largo in zip(activas, semillas, largos):
+        tramo = slice(inicio, inicio + largo)
+        np.random.default_rng(ss_marcas).random(out=marcas[tramo])
+        destino[tramo] = np.searchsorted(red.od_acumulada[i], marcas[tramo, 0], side='right')
+        inicio += largo
+    np.minimum(destino, red.n - 1, out=destino)
+    duracion = m_dur.inversa(marcas[:, 2])
+    if red.escala_duracion is not None:
+        duracion = duracion * red.escala_duracion[origen, destino]
+    retorno = np.where(marcas[:, 1] <= leak_prob, np.inf, t + duracion)
+
+    orden = np.argsort(t, kind='stable')
+    return t[orden], origen[orden], destino[orden], retorno[orden]
+
+def _replica_red(red, factor_demanda, leak_pct, tiempo_sim, m_inter, m_dur,
+                 semilla, rep, perfil=None):
+    # Cada estación tiene dos flujos propios, de SeedSequence(semilla,
+    # (rep, estación)): retiros y marcas (destino, leak, duración) de cada
+    # retiro. No dependen del stock: dos redes con distinto S₀ ven los mismos
+    # viajes (números aleatorios comunes).
+    # 300 estaciones × 30 días (~460.000 retiros) tardan ~0,5 s por réplica
+    # acá: la mitad es el bucle de abajo, el resto muestreo y estadísticas.
+    t_ret, o_ret, d_ret, r_ret = _viajes_red(red, factor_demanda, leak_pct / 100.0, tiempo_sim,
+                                             m_inter, m_dur, semilla, rep, perfil)
+
+    # El bucle solo decide qué retiros se atienden. Las devoluciones quedan
+    # en un heap por estación de destino y se suman al stock cuando esa
+    # estación tiene un retiro (el stock de las demás no hace falta en ese
+    # momento). Las estadísticas por estación salen después, vectorizadas.
+    stock = red.s0.tolist()
+    pendientes = [[] for _ in range(red.n)]
+    # Destino -1: la bici no vuelve
+    destinos = np.where(r_ret < np.inf, d_ret, -1).tolist()
+    rechazados = []
+    rechazar = rechazados.append
+    heappush, heappop = heapq.heappush, heapq.heappop
+    k = -1
+    for t, o, d, r in zip(t_ret.tolist(), o_ret.tolist(), destinos, r_ret.tolist()):
+        k += 1
+        # Ante un empate se atiende primero el retiro, como en una estación sola
+        p = pendientes[o]
+        s = stock[o]
+        while p and p[0] < t:
+            heappop(p)
+            s += 1
+        if s:
+            stock[o] = s - 1
+            if d >= 0:
+                heappush(pendientes[d], r)
+        else:
+            stock[o] = 0
+            rechazar(k)
+
+    atendido = np.ones(len(t_ret), dtype=bool)
+    atendido[rechazados] = False
+    return _estadisticas_red(red, tiempo_sim, t_ret, o_ret, d_ret, r_ret, atendido)
+
+def _estadisticas_red(red, tiempo_sim, t_ret, o_ret, d_ret, r_ret, atendido):
+    # Stock de cada estación como escalones: -1 en cada retiro atendido y +1
+    # en cada devolución hasta el horizonte (inclusive). Ordenados por
+    # estación y tiempo (a igual tiempo, el retiro primero), de ahí salen la
+    # integral, el tiempo en cero y el mínimo de cada una.
+    n = red.n
+    vuelve = atendido & (r_ret <= tiempo_sim)
+    orden_dev = np.argsort(r_ret[vuelve])
+    # Los retiros ya están en orden de tiempo: el sort estable (timsort) solo
+    # intercala dos tramos ordenados y deja el retiro antes en los empates.
+    # Después, por estación: con enteros de 16 bits el sort estable es radix.
+    tiempo = np.concatenate([t_ret[atendido], r_ret[vuelve][orden_dev]])
+    estacion = np.concatenate([o_ret[atendido], d_ret[vuelve][orden_dev]]).astype(
+        np.int16 if n < 2 ** 15 else np.intp)
+    cambio = np.ones(len(tiempo), dtype=np.int64)
+    cambio[:int(atendido.sum())] = -1
+    orden = np.argsort(tiempo, kind='stable')
+    orden = orden[np.argsort(estacion[orden], kind='stable')]
+    estacion, tiempo, cambio = estacion[orden].astype(np.intp), tiempo[orden], cambio[orden]
+
+    integral = np.zeros(n)
+    t_cero = np.zeros(n)
+    minimo = red.s0.copy()
+    ultimo = np.zeros(n)
+    if len(estacion):
+        primero = np.ones(len(estacion), dtype=bool)
+        primero[1:] = estacion[1:] != estacion[:-1]
+        acumulado = np.cumsum(cambio)
+        inicios = np.flatnonzero(primero)
+        # Suma de los cambios anteriores de la misma estación
+        base = np.repeat(acumulado[inicios] - cambio[inicios], np.diff(np.append(inicios, len(cambio))))
+        despues = red.s0[estacion] + acumulado - base
+        antes = despues - cambio
+        previo = np.empty_like(tiempo)
+        previo[0] = 0.0
+        previo[1:] = tiempo[:-1]
+        previo[primero] = 0.0
+        dt = tiempo - previo
+        integral = np.bincount(estacion, weights=antes * dt, minlength=n)
+        t_cero = np.bincount(estacion, weights=np.where(antes == 0, dt, 0.0), minlength=n)
+        minimo[estacion[inicios]] = np.minimum(minimo[estacion[inicios]],
+                                               np.minimum.reduceat(despues, inicios))
+        ultimos = np.append(inicios[1:], len(estacion)) - 1
+        ultimo[estacion[ultimos]] = tiempo[ultimos]
+
+    stock = red.s0 + np.bincount(estacion, weights=cambio, minlength=n).astype(np.int64)
+    resto = tiempo_sim - ultimo
+    integral = integral + stock * resto
+    t_cero = t_cero + np.where(stock == 0, resto, 0.0)
+    llegadas = np.bincount(o_ret, minlength=n)
+    rechazos = np.bincount(o_ret[~atendido], minlength=n)
+    return {
+        'pct_rechazos': rechazos.sum() / max(llegadas.sum(), 1) * 100,
+        'eventos': int(llegadas.sum()) + int(vuelve.sum()),
+        'llegadas_estacion': llegadas,
+        'rechazos_estacion': rechazos,
+        'stock_promedio_estacion': integral / tiempo_sim,
+        't_cero_h_estacion': t_cero / 60.0,
+        'stock_min_estacion': minimo,
+    }
+
+def simular_replicas_red(red, factor_demanda, leak_pct, horizonte_dias, reps,
+                         interarribos, duraciones, semilla=42, muestreo='empirico',
+                         perfil=None, cancelado=None):
+    # Arrays por réplica: 1-D para la red, réplicas × estaciones por estación.
+    # Si cancelado se activa, para antes de la réplica siguiente.
+    tiempo_sim = horizonte_dias * 24 * 60
+    m_inter = crear_muestreador(interarribos, muestreo)
+    m_dur = crear_muestreador(duraciones, muestreo)
+    filas = []
+    for rep in reps:
+        if filas and cancelado is not None and cancelado.is_set():
+            break
+        filas.append(_replica_red(red, factor_demanda, leak_pct, tiempo_sim, m_inter, m_dur,
+                                  semilla, rep, perfil))
+    return {k: np.array([f[k] for f in filas]) for k in filas[0]}
+
+def _tarea_replicas_red(red, parametros, desc_inter, desc_dur, rep_ini, rep_fin):
+    from .paralelo import _adjuntar
+    return simular_replicas_red(red, reps=range(rep_ini, rep_fin),
+                                interarribos=_adjuntar(desc_inter),
+                                duraciones=_adjuntar(desc_dur), **parametros)
+
+def _correr_replicas_red(red, parametros, rep_ini, rep_fin, n_workers, cancelado=None):
+    if n_workers <= 1:
+        return simular_replicas_red(red, reps=range(rep_ini, rep_fin), cancelado=cancelado,
+                                    **parametros)
+    from .motor import concatenar_replicas
+    from .paralelo import compartir_array, obtener_pool, recoger_en_orden, repartir
+    parametros = dict(parametros)
+    desc_inter = compartir_array(parametros.pop('interarribos'))
+    desc_dur = compartir_array(parametros.pop('duraciones'))
+    pool = obtener_pool(n_workers)
+    futuros = [pool.submit(_tarea_replicas_red, red, parametros, desc_inter, desc_dur,
+                           rep_ini + a, rep_ini + b)
+               for a, b in repartir(rep_fin - rep_ini, n_workers)]
+    return concatenar_replicas(recoger_en_orden(futuros, cancelado))
+
+def simular_red(red, factor_demanda, leak_pct, horizonte_dias, n_reps, interarribos,
+                duraciones, semilla=42, n_workers=1, progreso=None, tam_lote=50,
+                muestreo='empirico', perfil=None, cancelado=None):
+    # Igual que simular_escenario: con progreso se corre en lotes y
+    # progreso(replicas, n) == False corta la corrida; cancelado la corta
+    # antes de la réplica siguiente
+    parametros = dict(factor_demanda=factor_demanda, leak_pct=leak_pct,
+                      horizonte_dias=horizonte_dias, interarribos=interarribos,
+                      duraciones=duraciones, semilla=semilla, muestreo=muestreo,
+                      perfil=perfil)
+    replicas = None
+    n = 0
+    motivo = 'tope'
+    while n < n_reps:
+        por_lotes = progreso is not None or cancelado is not None
+        fin = min(n + tam_lote, n_reps) if por_lotes else n_reps
+        nuevas = _correr_replicas_red(red, parametros, n, fin, n_workers, cancelado)
+        replicas = nuevas if replicas is None else {k: np.concatenate([replicas[k], nuevas[k]])
+                                                    for k in replicas}
+        n += len(nuevas['pct_rechazos'])
+        cortada = n < fin
+        if progreso is not None and progreso(replicas, n) is False:
+            cortada = True
+        if cortada:
+            motivo = 'cancelada'
+            break
+    resultado = resumir_red(replicas, red)
+    if motivo == 'cancelada':
+        resultado['motivo_parada'] = motivo
+    return resultado
+
+def resumir_red(replicas, red):
+    # pandas recién acá: importar red (la app lo hace al arrancar) no lo carga
+    import pandas as pd
+    pct = replicas['pct_rechazos']
+    llegadas = replicas['llegadas_estacion']
+    rechazos = replicas['rechazos_estacion']
+    # % por réplica y estación (0 si no hubo retiros), para el IC de cada estación
+    pct_rep = np.where(llegadas > 0, rechazos / np.maximum(llegadas, 1) * 100, 0.0)
+    pct_estacion = rechazos.sum(axis=0) / np.maximum(llegadas.sum(axis=0), 1) * 100
+    # Con pocas réplicas el IC de la t puede salirse de [0, 100]
+    ic = np.clip(np.array([ic_media(pct_rep[:, i]) for i in range(red.n)]).reshape(red.n, 2),
+                 0.0, 100.0)
+    estaciones = pd.DataFrame({
+        'estacion': red.nombres,
+        's0': red.s0,
+        'retiros_h': red.tasas_h,
+        'flujo_neto_h': red.flujo_neto_h(),
+        'pct_rechazos': pct_estacion,
+        'ic95_inf': ic[:, 0],
+        'ic95_sup': ic[:, 1],
+        'prob_stockout': (replicas['stock_min_estacion'] == 0).mean(axis=0),
+        't_cero_h': replicas['t_cero_h_estacion'].mean(axis=0),
+        'stock_promedio': replicas['stock_promedio_estacion'].mean(axis=0),
+    })
+    # Más riesgo: más rechazos; a igualdad, más réplicas que se quedaron sin
+    # bicis y más horas vacía
+    ranking = estaciones.sort_values(['pct_rechazos', 'prob_stockout', 't_cero_h'],
+                                     ascending=False, kind='stable').reset_index(drop=True)
+    ranking.index = np.arange(1, len(ranking) + 1)
+    return {
+        'n_replicas_usadas': len(pct),
+        'n_estaciones': red.n,
+        'pct_rechazos_media': float(np.mean(pct)),
+        'pct_rechazos_media_ic95': ic_media(pct),
+        'pct_rechazos_ic95': (float(np.percentile(pct, 2.5)), float(np.percentile(pct, 97.5))),
+        'distribucion_rechazos': pct.tolist(),
+        'rechazos_media': float(np.mean(rechazos.sum(axis=1))),
+        'stock_promedio': float(np.mean(replicas['stock_promedio_estacion'].sum(axis=1))),
+        # Fracción de réplicas en las que alguna estación se quedó sin bicis
+        'prob_stockout': float(np.mean((replicas['stock_min_estacion'] == 0).any(axis=1))),
+        'eventos_simulados': int(np.sum(replicas['eventos'])),
+        'pct_rechazos_estacion': pct_estacion,
+        'estaciones': estaciones,
+        'ranking': ranking,
+    }
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simula una red de estaciones y lista las de mayor riesgo")
+    parser.add_argument('--red', type=Path, default=None,
+                        help=f"JSON con s0, tasas_h y od, como {ARCHIVO_RED} (por defecto, una red sintética)")
+    parser.add_argument('--estaciones', type=int, default=100,
+                        help="Tamaño de la red sintética")
+    parser.add_argument('--factor', type=float, default=1.0)
+    parser.add_argument('--leak', type=float, default=0.6)
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--reps', type=int, default=10)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    args = parser.parse_args(argv)
+
+    parametros, interarribos, duraciones = cargar_empiricos(args.datos)
+    red = (Red.cargar(args.red) if args.red is not None
+           else Red.sintetica(args.estaciones, tasa_media_h=parametros['lambda_global']))
+    inicio = time.perf_counter()
+    res = simular_red(red, args.factor, args.leak, args.dias, args.reps, interarribos,
+                      duraciones, semilla=args.semilla, n_workers=args.workers)
+    segundos = time.perf_counter() - inicio
+    lo, hi = res['pct_rechazos_media_ic95']
+    print(f"{red.n} estaciones, {args.dias} días, {args.reps} réplicas: "
+          f"{res['pct_rechazos_media']:.2f}% rechazos en la red (IC95 [{lo:.2f}%, {hi:.2f}%]), "
+          f"{res['eventos_simulados']:,} eventos en {segundos:.1f} s")
+    import pandas as pd
+    with pd.option_context('display.width', 160, 'display.float_format', '{:.2f}'.format):
+        print(res['ranking'].head(args.top).to_string())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+import numpy as np
+
+from .cache import huella_array
+from .datos import DIRECTORIO_DATOS, cargar_empiricos
+from .fondo import SimulacionEnFondo
+
+# ============================================
+# SERVICIO DE SIMULACIÓN COMPARTIDO
+# ============================================
+
+# Una instancia por proceso, compartida por todas las sesiones de la app.
+# Los pedidos entran a una cola por sesión y n_hilos trabajadores los toman
+# por turno rotativo entre sesiones: una sesión con muchos pedidos no demora
+# a las demás. Un pedido idéntico a uno en cola o en curso se engancha a ese
+# trabajo en vez de correrlo otra vez. Además de escenarios sueltos, la cola
+# corre las búsquedas de S₀ y las estimaciones de largo plazo (tareas).
+
+TAREAS = ('escenario', 'optimizar', 'estacionario')
+
+class ColaLlena(RuntimeError):
+    pass
+
+class _Cancelada(Exception):
+    pass
+
+def _normalizar(valor):
+    # Forma serializable de los parámetros para comparar pedidos: los arrays
+    # (y los objetos que los contienen, como el perfil o la red) por su huella
+    if isinstance(valor, np.ndarray):
+        return huella_array(valor)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return valor
+    if isinstance(valor, Path):
+        return str(valor)
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in valor.items()}
+    if hasattr(valor, '__dict__'):
+        return [type(valor).__name__, _normalizar(vars(valor))]
+    return repr(valor)
+
+def clave_trabajo(parametros):
+    # n_workers no cambia los resultados (cada réplica tiene su propio flujo
+    # aleatorio), solo la velocidad: no separa pedidos
+    campos = {k: _normalizar(v) for k, v in parametros.items() if k != 'n_workers'}
+    texto = json.dumps(campos, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+class Trabajo(SimulacionEnFondo):
+    # Una corrida que comparten uno o más pedidos: simular_escenario, o con
+    # tarea 'optimizar'/'estacionario' optimizar_s0/estimar_estacionario,
+    # que avanzan de a una evaluación/trayectoria (n_hechas). La corre un
+    # hilo del servicio, no un hilo propio.
+    def __init__(self, clave, sesion, tarea='escenario', **parametros):
+        super().__init__(**parametros)
+        self.clave = clave
+        self.sesion = sesion
+        self.tarea = tarea
+        if tarea == 'optimizar':
+            self.n_total = None
+        elif tarea == 'estacionario':
+            self.n_total = parametros.get('n_trayectorias', 1)
+        self.suscriptores = 1
+        self.encolado = time.perf_counter()
+
+    def iniciar(self):
+        raise RuntimeError("Los trabajos del servicio los inicia ServicioSimulacion")
+
+    def _ejecutar(self):
+        if self.tarea == 'escenario':
+            return super()._ejecutar()
+        if self.tarea == 'optimizar':
+            from .optimizacion import optimizar_s0 as funcion
+        else:
+            from .estacionario import estimar_estacionario as funcion
+        try:
+            return funcion(progreso=self._paso, **self.parametros)
+        except _Cancelada:
+            return None
+
+    def _paso(self, *_):
+        # Sin resultados parciales: al cancelar se corta en el paso siguiente
+        # y el trabajo queda sin resultado
+        if self._cancelar.is_set():
+            raise _Cancelada()
+        with self._lock:
+            self._n_hechas += 1
+
+    @property
+    def en_cola(self):
+        return self._inicio is None and not self.terminada
+
+    @property
+    def espera_s(self):
+        return (self._inicio or time.perf_counter()) - self.encolado
+
+class Pedido:
+    # Lo que recibe cada sesión: misma interfaz que SimulacionEnFondo. Al
+    # cancelar, si otras sesiones esperan el mismo trabajo, solo esta se
+    # desengancha (y queda sin resultado); si era la única, se cancela el
+    # trabajo y quedan las réplicas hechas, como antes.
+    def __init__(self, servicio, trabajo, compartido):
+        self._servicio = servicio
+        self.trabajo = trabajo
+        self.compartido = compartido
+        self._retirado = False
+
+    @property
+    def parametros(self):
+        return self.trabajo.parametros
+
+    @property
+    def tarea(self):
+        return self.trabajo.tarea
+
+    @property
+    def n_total(self):
+        return self.trabajo.n_total
+
+    @property
+    def resultado(self):
+        return None if self._retirado else self.trabajo.resultado
+
+    @property
+    def error(self):
+        return None if self._retirado else self.trabajo.error
+
+    @property
+    def terminada(self):
+        return self._retirado or self.trabajo.terminada
+
+    @property
+    def cancelada(self):
+        return self._retirado or self.trabajo.cancelada
+
+    def cancelar(self):
+        self._servicio._retirar(self)
+
+    def esperar(self, timeout=None):
+        if self._retirado:
+            return True
+        return self.trabajo.esperar(timeout)
+
+    def estado(self):
+        estado = self.trabajo.estado()
+        estado.update(self._servicio.posicion(self.trabajo))
+        estado['compartido'] = self.compartido or self.trabajo.suscriptores > 1
+        return estado
+
+class ServicioSimulacion:
+    # n_hilos: trabajos simultáneos. max_workers_trabajo: tope de procesos
+    # que puede pedir cada trabajo (n_workers), así el total queda acotado
+    # por n_hilos × max_workers_trabajo. max_cola: trabajos esperando turno.
+    def __init__(self, n_hilos=1, max_workers_trabajo=None, max_cola=32):
+        self.n_hilos = n_hilos
+        self.max_workers_trabajo = max_workers_trabajo or max(1, (os.cpu_count() or 1) // n_hilos)
+        self.max_cola = max_cola
+        self._condicion = threading.Condition()
+        self._colas = OrderedDict()
+        self._activos = {}
+        self._en_curso = set()
+        self._esperas = deque(maxlen=50)
+        self._n_pedidos = 0
+        self._n_enganchados = 0
+        self._cerrado = False
+        self._hilos = [threading.Thread(target=self._trabajar, daemon=True)
+                       for _ in range(n_hilos)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def enviar(self, sesion, tarea='escenario', **parametros):
+        if tarea not in TAREAS:
+            raise ValueError(f"Tarea desconocida: {tarea!r} (opciones: {', '.join(TAREAS)})")
+        if 'n_workers' in parametros:
+            parametros['n_workers'] = max(1, min(parametros['n_workers'], self.max_workers_trabajo))
+        clave = clave_trabajo(dict(parametros, tarea=tarea))
+        with self._condicion:
+            if self._cerrado:
+                raise RuntimeError("El servicio está cerrado")
+            self._n_pedidos += 1
+            trabajo = self._activos.get(clave)
+            if trabajo is not None:
+                trabajo.suscriptores += 1
+                self._n_enganchados += 1
+                return Pedido(self, trabajo, compartido=True)
+            if self._en_espera() >= self.max_cola:
+                self._n_pedidos -= 1
+                raise ColaLlena(f"Hay {self.max_cola} simulaciones esperando turno: "
+                                "reintentar en unos segundos")
+            trabajo = Trabajo(clave, sesion, tarea, **parametros)
+            self._activos[clave] = trabajo
+            self._colas.setdefault(sesion, deque()).append(trabajo)
+            self._condicion.notify()
+            return Pedido(self, trabajo, compartido=False)
+
+    def _en_espera(self):
+        return sum(len(cola) for cola in self._colas.values())
+
+    def _siguiente(self):
+        # Turno rotativo: la primera sesión con pedidos pasa al final
+        for sesion in list(self._colas):
+            cola = self._colas[sesion]
+            if not cola:
+                del self._colas[sesion]
+                continue
+            trabajo = cola.popleft()
+            if cola:
+                self._colas.move_to_end(sesion)
+            else:
+                del self._colas[sesion]
+            return trabajo
+        return None
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                trabajo = self._siguiente()
+                while trabajo is None:
+                    if self._cerrado:
+                        return
+                    self._condicion.wait()
+                    trabajo = self._siguiente()
+                trabajo._inicio = time.perf_counter()
+                self._esperas.append(trabajo.espera_s)
+                self._en_curso.add(trabajo)
+            trabajo._correr()
+            with self._condicion:
+                self._en_curso.discard(trabajo)
+                if self._activos.get(trabajo.clave) is trabajo:
+                    del self._activos[trabajo.clave]
+
+    def _retirar(self, pedido):
+        trabajo = pedido.trabajo
+        with self._condicion:
+            if pedido._retirado or trabajo.terminada or trabajo.cancelada:
+                return
+            trabajo.suscriptores -= 1
+            if trabajo.suscriptores > 0:
+                pedido._retirado = True
+                return
+            # Cancelado no se reutiliza: un pedido igual posterior corre de nuevo
+            if self._activos.get(trabajo.clave) is trabajo:
+                del self._activos[trabajo.clave]
+            trabajo.cancelar()
+            cola = self._colas.get(trabajo.sesion)
+            if cola is not None and trabajo in cola:
+                # Todavía no empezó: se saca de la cola y termina sin resultado
+                cola.remove(trabajo)
+                pedido._retirado = True
+                trabajo._fin = time.perf_counter()
+                trabajo._terminado.set()
+
+    def posicion(self, trabajo):
+        # Trabajos que van a empezar antes que este, simulando el turno
+        # rotativo sobre las colas actuales
+        with self._condicion:
+            if not trabajo.en_cola:
+                return {'en_cola': False, 'posicion': 0, 'espera_s': trabajo.espera_s}
+            colas = [list(cola) for cola in self._colas.values()]
+            antes = 0
+            while colas:
+                for cola in colas:
+                    if cola.pop(0) is trabajo:
+                        return {'en_cola': True, 'posicion': antes + 1,
+                                'espera_s': trabajo.espera_s}
+                    antes += 1
+                colas = [cola for cola in colas if cola]
+            return {'en_cola': True, 'posicion': antes + 1, 'espera_s': trabajo.espera_s}
+
+    def estado(self):
+        with self._condicion:
+            en_espera = [t for cola in self._colas.values() for t in cola]
+            return {
+                'en_cola': len(en_espera),
+                'en_curso': len(self._en_curso),
+                'sesiones_en_cola': sum(1 for cola in self._colas.values() if cola),
+                'n_hilos': self.n_hilos,
+                'espera_max_s': max((t.espera_s for t in en_espera), default=0.0),
+                'espera_media_s': float(np.mean(self._esperas)) if self._esperas else 0.0,
+                'pedidos': self._n_pedidos,
+                'enganchados': self._n_enganchados,
+            }
+
+    def cerrar(self):
+        # Los trabajos en curso terminan; los que esperaban quedan sin correr
+        with self._condicion:
+            self._cerrado = True
+            for cola in self._colas.values():
+                for trabajo in cola:
+                    trabajo._fin = time.perf_counter()
+                    trabajo._terminado.set()
+            self._colas.clear()
+            self._activos.clear()
+            self._condicion.notify_all()
+
+# ============================================
+# PRUEBA CON SESIONES CONCURRENTES
+# ============================================
+
+def simular_sesiones(servicio, interarribos, duraciones, n_sesiones=5, n_distintos=2,
+                     pedidos_por_sesion=2, n_reps=200, horizonte_dias=7):
+    # Cada sesión es un hilo que envía sus pedidos de una vez (como varios
+    # clics seguidos) y espera los resultados. Los escenarios se repiten entre
+    # sesiones: n_distintos valores de S₀.
+    resultados = []
+    lock = threading.Lock()
+
+    def sesion(i):
+        pedidos = []
+        for j in range(pedidos_por_sesion):
+            s0 = 38 + 2 * ((i + j) % n_distintos)
+            pedidos.append((s0, servicio.enviar(
+                f"sesion-{i}", s0=s0, factor_demanda=1.0, leak_pct=0.6,
+                horizonte_dias=horizonte_dias, n_reps=n_reps, interarribos=interarribos,
+                duraciones=duraciones)))
+        for s0, pedido in pedidos:
+            pedido.esperar()
+            with lock:
+                resultados.append({
+                    'sesion': i,
+                    's0': s0,
+                    'compartido': pedido.compartido,
+                    'espera_s': pedido.trabajo.espera_s,
+                    'total_s': pedido.trabajo._fin - pedido.trabajo.encolado,
+                    'pct_rechazos_media': pedido.resultado['pct_rechazos_media'],
+                })
+
+    hilos = [threading.Thread(target=sesion, args=(i,)) for i in range(n_sesiones)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, time.perf_counter() - inicio
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simula sesiones concurrentes contra el servicio de simulación compartido")
+    parser.add_argument('--sesiones', type=int, default=5)
+    parser.add_argument('--distintos', type=int, default=2,
+                        help="Escenarios distintos entre todos los pedidos")
+    parser.add_argument('--pedidos', type=int, default=2, help="Pedidos por sesión")
+    parser.add_argument('--reps', type=int, default=200)
+    parser.add_argument('--hilos', type=int, default=1)
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    args = parser.parse_args(argv)
+
+    _, interarribos, duraciones = cargar_empiricos(args.datos)
+    servicio = ServicioSimulacion(n_hilos=args.hilos)
+    resultados, total = simular_sesiones(servicio, interarribos, duraciones, args.sesiones,
+                                         args.distintos, args.pedidos, args.reps)
+    for r in sorted(resultados, key=lambda r: (r['sesion'], r['s0'])):
+        print(f"Sesión {r['sesion']} S₀={r['s0']}: espera {r['espera_s']:5.2f} s, "
+              f"total {r['total_s']:5.2f} s, {r['pct_rechazos_media']:.2f}% rechazos"
+              f"{' (compartido)' if r['compartido'] else ''}")
+    estado = servicio.estado()
+    corridos = estado['pedidos'] - estado['enganchados']
+    print(f"{estado['pedidos']} pedidos, {corridos} corridas ({estado['enganchados']} enganchados "
+          f"a una en curso), espera media {estado['espera_media_s']:.2f} s, total {total:.1f} s")
+    servicio.cerrar()
+
+if __name__ == '__main__':
+    main()
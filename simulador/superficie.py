@@ -0,0 +1,179 @@
+import argparse
+import itertools
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .motor import VERSION_MODELO, simular_escenario
+
+# ============================================
+# SUPERFICIE DE RESPUESTA PRECALCULADA
+# ============================================
+
+RUTA_SUPERFICIE = Path("data") / "superficie_respuesta.npz"
+
+EJES = ('s0', 'factor_demanda', 'leak_pct', 'horizonte_dias')
+METRICAS = ('pct_medio', 'ic_lower', 'ic_upper', 'prob_stockout')
+
+GRILLA_POR_DEFECTO = {
+    's0': [1, 2, 3, 5, 8, 10, 15, 20, 25, 30, 40, 50, 60, 75, 100, 125, 150],
+    'factor_demanda': [0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0],
+    'leak_pct': [0.0, 0.6, 1.0, 2.0, 5.0, 10.0, 20.0, 35.0, 50.0],
+    'horizonte_dias': [7, 14, 30],
+}
+
+def cargar_superficie(ruta=RUTA_SUPERFICIE):
+    # (ejes, metricas, n_reps) o None si todavía no se construyó o se
+    # construyó con otra versión del modelo
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return None
+    with np.load(ruta) as datos:
+        if 'version' not in datos.files or int(datos['version']) != VERSION_MODELO:
+            return None
+        ejes = {e: datos[e].astype(float) for e in EJES}
+        metricas = {m: datos[m].astype(float) for m in METRICAS}
+        n_reps = int(datos['n_reps'])
+    return ejes, metricas, n_reps
+
+def _guardar(ruta, ejes, metricas, n_reps):
+    # Métricas en float32 y npz comprimido: ~10 bytes por celda. Los ejes
+    # quedan en float64 para que 0.6 siga siendo 0.6 al fusionar grillas.
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(
+                f, n_reps=n_reps, version=VERSION_MODELO,
+                **{e: np.asarray(v, dtype=float) for e, v in ejes.items()},
+                **{m: np.asarray(v, dtype=np.float32) for m, v in metricas.items()})
+        os.replace(tmp, ruta)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+def _fusionar_ejes(ejes, metricas, pedidos):
+    # Amplía la grilla con los valores pedidos; las celdas nuevas quedan NaN
+    nuevos = {e: np.union1d(ejes[e], np.asarray(pedidos[e], dtype=float)) for e in EJES}
+    forma = tuple(len(nuevos[e]) for e in EJES)
+    posiciones = np.ix_(*[np.searchsorted(nuevos[e], ejes[e]) for e in EJES])
+    ampliadas = {}
+    for m in METRICAS:
+        arr = np.full(forma, np.nan)
+        arr[posiciones] = metricas[m]
+        ampliadas[m] = arr
+    return nuevos, ampliadas
+
+def construir_superficie(interarribos, duraciones, grilla=None, n_reps=100,
+                         ruta=RUTA_SUPERFICIE, motor='vectorizado', semilla=42,
+                         n_workers=1, progreso=print):
+    # Incremental: solo se simulan las celdas que faltan en el archivo, y se
+    # guarda después de cada fila de S₀ para poder retomar si se corta.
+    grilla = grilla or GRILLA_POR_DEFECTO
+    existente = cargar_superficie(ruta)
+    if existente is None:
+        ejes = {e: np.array([], dtype=float) for e in EJES}
+        metricas = {m: np.empty((0,) * len(EJES)) for m in METRICAS}
+    else:
+        ejes, metricas, n_reps_archivo = existente
+        if n_reps_archivo != n_reps:
+            raise ValueError(f"La superficie existente usa {n_reps_archivo} réplicas por celda; "
+                             f"se pidieron {n_reps}")
+    ejes, metricas = _fusionar_ejes(ejes, metricas, grilla)
+
+    faltantes = np.isnan(metricas['pct_medio'])
+    total = int(faltantes.sum())
+    hechas = 0
+    inicio = time.perf_counter()
+    for j, k, l in itertools.product(*(range(len(ejes[e])) for e in EJES[1:])):
+        filas = np.nonzero(faltantes[:, j, k, l])[0]
+        if len(filas) == 0:
+            continue
+        for i in filas:
+            res = simular_escenario(
+                s0=int(ejes['s0'][i]), factor_demanda=float(ejes['factor_demanda'][j]),
+                leak_pct=float(ejes['leak_pct'][k]), horizonte_dias=int(ejes['horizonte_dias'][l]),
+                n_reps=n_reps, interarribos=interarribos, duraciones=duraciones,
+                motor=motor, semilla=semilla, n_workers=n_workers)
+            metricas['pct_medio'][i, j, k, l] = res['pct_rechazos_media']
+            metricas['ic_lower'][i, j, k, l], metricas['ic_upper'][i, j, k, l] = res['pct_rechazos_ic95']
+            metricas['prob_stockout'][i, j, k, l] = res['prob_stockout']
+        hechas += len(filas)
+        _guardar(ruta, ejes, metricas, n_reps)
+        if progreso:
+            progreso(f"{hechas}/{total} celdas ({time.perf_counter() - inicio:.0f} s)")
+    if total == 0:
+        _guardar(ruta, ejes, metricas, n_reps)
+    return hechas
+
+class SuperficieRespuesta:
+    # Interpolación lineal sobre la grilla. Los ejes con un único valor
+    # exigen coincidencia exacta; fuera de la grilla o en celdas sin
+    # calcular devuelve None.
+    def __init__(self, ejes, metricas, n_reps):
+        # scipy.interpolate recién al cargar la superficie, no al importar
+        from scipy.interpolate import RegularGridInterpolator
+        self.ejes = ejes
+        self.n_reps = n_reps
+        self._libres = [e for e in EJES if len(ejes[e]) > 1]
+        self._fijos = {e: ejes[e][0] for e in EJES if len(ejes[e]) == 1}
+        puntos = [ejes[e] for e in self._libres]
+        self._interpoladores = {
+            m: RegularGridInterpolator(puntos, np.squeeze(metricas[m]),
+                                       bounds_error=False, fill_value=np.nan)
+            for m in METRICAS
+        } if self._libres else None
+        self._valores = metricas
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_SUPERFICIE):
+        existente = cargar_superficie(ruta)
+        return None if existente is None else cls(*existente)
+
+    def estimar(self, s0, factor_demanda, leak_pct, horizonte_dias):
+        punto = dict(s0=s0, factor_demanda=factor_demanda, leak_pct=leak_pct,
+                     horizonte_dias=horizonte_dias)
+        if any(not np.isclose(punto[e], v) for e, v in self._fijos.items()):
+            return None
+        if self._interpoladores is None:
+            resultado = {m: float(self._valores[m].ravel()[0]) for m in METRICAS}
+        else:
+            x = [[punto[e] for e in self._libres]]
+            resultado = {m: float(f(x)[0]) for m, f in self._interpoladores.items()}
+        if any(np.isnan(v) for v in resultado.values()):
+            return None
+        return resultado
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Construye (o completa) la superficie de respuesta en data/")
+    parser.add_argument('--s0', type=int, nargs='+', default=GRILLA_POR_DEFECTO['s0'])
+    parser.add_argument('--factores', type=float, nargs='+',
+                        default=GRILLA_POR_DEFECTO['factor_demanda'])
+    parser.add_argument('--leaks', type=float, nargs='+', default=GRILLA_POR_DEFECTO['leak_pct'])
+    parser.add_argument('--horizontes', type=int, nargs='+',
+                        default=GRILLA_POR_DEFECTO['horizonte_dias'])
+    parser.add_argument('--n-reps', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--salida', type=Path, default=RUTA_SUPERFICIE)
+    parser.add_argument('--datos', type=Path, default=Path("data"))
+    args = parser.parse_args(argv)
+
+    interarribos = np.load(args.datos / "interarribos_empiricos.npy")
+    duraciones = np.load(args.datos / "duraciones_empiricas.npy")
+    grilla = {'s0': args.s0, 'factor_demanda': args.factores,
+              'leak_pct': args.leaks, 'horizonte_dias': args.horizontes}
+    hechas = construir_superficie(interarribos, duraciones, grilla, args.n_reps,
+                                  args.salida, n_workers=args.workers)
+    print(f"Listo: {hechas} celdas nuevas en {args.salida}")
+
+if __name__ == '__main__':
+    main()
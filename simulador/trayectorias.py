@@ -0,0 +1,291 @@
+import argparse
+import os
+import tempfile
+import time
+import weakref
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+from .datos import DIRECTORIO_DATOS, cargar_empiricos
+from .estadisticas import AcumuladorStock
+
+# ============================================
+# REGISTRO DE TRAYECTORIAS
+# ============================================
+
+# Cada punto es un cambio de stock: desde t (minutos) el stock vale stock.
+# 6 bytes por punto; float32 alcanza para el horizonte (a un año, la
+# resolución es de unos 2 segundos) e int16 para el stock de una estación.
+DTYPE_PUNTO = np.dtype([('t', '<f4'), ('stock', '<i2')])
+# Pasado este tamaño, los puntos se vuelcan a un archivo mapeado en memoria
+MAX_MEMORIA_MB = 64
+
+CUANTILES_ABANICO = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def _borrar(ruta):
+    try:
+        Path(ruta).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+class RegistroTrayectorias:
+    # Stock en el tiempo de las réplicas elegidas, como función escalonada:
+    # todos los puntos en un solo array tipado y, por réplica, su rango
+    # [inicio, fin). Mientras entra en max_memoria_mb vive en RAM; después
+    # crece en un archivo temporal (o en directorio) con np.memmap, que se
+    # borra al cerrar el registro o cuando se lo libera.
+    def __init__(self, replicas, max_memoria_mb=MAX_MEMORIA_MB, directorio=None):
+        self.seleccion = frozenset(int(r) for r in replicas)
+        self.max_bytes = int(max_memoria_mb * 2**20)
+        self.directorio = directorio
+        self.ruta = None
+        self._puntos = np.empty(1024, dtype=DTYPE_PUNTO)
+        self._n = 0
+        self._indice = {}
+        self._finalizador = None
+
+    def __len__(self):
+        return len(self._indice)
+
+    def __contains__(self, rep):
+        return rep in self._indice
+
+    @property
+    def replicas(self):
+        return sorted(self._indice)
+
+    @property
+    def pendientes(self):
+        # Elegidas que todavía no tienen trayectoria
+        return sorted(self.seleccion - self._indice.keys())
+
+    @property
+    def n_puntos(self):
+        return self._n
+
+    @property
+    def nbytes(self):
+        return self._n * DTYPE_PUNTO.itemsize
+
+    @property
+    def en_disco(self):
+        return self.ruta is not None
+
+    def acumulador(self, rep, s0):
+        # AcumuladorStock para la réplica rep: si está elegida, además anota
+        # cada cambio de stock y al cerrarse lo guarda en el registro
+        if rep in self.seleccion and rep not in self._indice:
+            return _AcumuladorTrayectoria(self, rep, s0)
+        return AcumuladorStock(s0)
+
+    def agregar(self, rep, t, stock):
+        if rep in self._indice:
+            return
+        n = len(t)
+        self._reservar(self._n + n)
+        puntos = self._puntos[self._n:self._n + n]
+        puntos['t'] = t
+        puntos['stock'] = stock
+        self._indice[rep] = (self._n, self._n + n)
+        self._n += n
+
+    def trayectoria(self, rep):
+        # (t, stock) de la réplica: vistas de solo lectura sobre el registro
+        inicio, fin = self._indice[rep]
+        puntos = self._puntos[inicio:fin]
+        t, stock = puntos['t'], puntos['stock']
+        t.flags.writeable = stock.flags.writeable = False
+        return t, stock
+
+    def _reservar(self, capacidad):
+        if capacidad <= len(self._puntos):
+            return
+        capacidad = max(capacidad, 2 * len(self._puntos))
+        tam = capacidad * DTYPE_PUNTO.itemsize
+        if self.ruta is None and tam <= self.max_bytes:
+            nuevo = np.empty(capacidad, dtype=DTYPE_PUNTO)
+            nuevo[:self._n] = self._puntos[:self._n]
+            self._puntos = nuevo
+            return
+        if self.ruta is None:
+            fd, ruta = tempfile.mkstemp(prefix='trayectorias-', suffix='.bin',
+                                        dir=self.directorio)
+            os.close(fd)
+            self.ruta = Path(ruta)
+            self._finalizador = weakref.finalize(self, _borrar, self.ruta)
+            previos = self._puntos[:self._n]
+        else:
+            # Los puntos ya están en el archivo: solo se agranda
+            self._puntos.flush()
+            previos = None
+        with open(self.ruta, 'r+b') as f:
+            f.truncate(tam)
+        self._puntos = np.memmap(self.ruta, dtype=DTYPE_PUNTO, mode='r+', shape=(capacidad,))
+        if previos is not None:
+            self._puntos[:self._n] = previos
+
+    def cerrar(self):
+        # Libera la memoria o el archivo; el registro queda vacío
+        self._puntos = np.empty(0, dtype=DTYPE_PUNTO)
+        self._n = 0
+        self._indice = {}
+        if self._finalizador is not None:
+            self._finalizador()
+            self.ruta = None
+
+class _AcumuladorTrayectoria(AcumuladorStock):
+    # Anota los cambios en arrays tipados (4 + 2 bytes por punto, sin objetos
+    # de Python) y los pasa al registro en cerrar
+    __slots__ = ('registro', 'rep', 'puntos_t', 'puntos_stock')
+
+    def __init__(self, registro, rep, s0, t0=0.0):
+        super().__init__(s0, t0)
+        self.registro = registro
+        self.rep = rep
+        self.puntos_t = array('f', [t0])
+        self.puntos_stock = array('h', [s0])
+
+    def cambiar(self, t, stock):
+        AcumuladorStock.cambiar(self, t, stock)
+        self.puntos_t.append(t)
+        self.puntos_stock.append(stock)
+
+    def cerrar(self, t_fin):
+        # El último punto (t_fin, stock final) marca el fin del horizonte
+        AcumuladorStock.cerrar(self, t_fin)
+        self.registro.agregar(self.rep, np.frombuffer(self.puntos_t, dtype=np.float32),
+                              np.frombuffer(self.puntos_stock, dtype=np.int16))
+
+def seleccion_replicas(trayectorias, n_reps):
+    # trayectorias: cantidad (las primeras), réplicas puntuales o un registro
+    # (por lo que hace y no por su clase: con `python -m` la de __main__ es otra)
+    if hasattr(trayectorias, 'acumulador'):
+        return trayectorias
+    if isinstance(trayectorias, (int, np.integer)):
+        return RegistroTrayectorias(range(min(int(trayectorias), n_reps)))
+    return RegistroTrayectorias(trayectorias)
+
+# ============================================
+# ABANICO Y SUBMUESTREO PARA GRAFICAR
+# ============================================
+
+def bandas(registro, n_puntos=400, cuantiles=CUANTILES_ABANICO, horizonte=None):
+    # Cuantiles del stock entre réplicas en una grilla de n_puntos instantes
+    # (gráfico de abanico). Cada trayectoria se evalúa en la grilla por
+    # búsqueda binaria sobre sus cambios, de a una réplica por vez.
+    reps = registro.replicas
+    if not reps:
+        raise ValueError("El registro no tiene trayectorias")
+    if horizonte is None:
+        horizonte = max(float(registro.trayectoria(rep)[0][-1]) for rep in reps)
+    grilla = np.linspace(0.0, horizonte, n_puntos)
+    stock = np.empty((len(reps), n_puntos), dtype=np.int16)
+    for i, rep in enumerate(reps):
+        t, s = registro.trayectoria(rep)
+        stock[i] = s[np.searchsorted(t, grilla, side='right') - 1]
+    return {
+        't_h': grilla / 60.0,
+        'cuantiles': dict(zip(cuantiles, np.quantile(stock, cuantiles, axis=0))),
+        'media': stock.mean(axis=0),
+        'n_replicas': len(reps),
+    }
+
+def lttb(x, y, n_salida):
+    # Largest-Triangle-Three-Buckets: n_salida puntos de la serie (siempre el
+    # primero y el último) que conservan su forma. Entre los puntos de cada
+    # tramo elige el que forma el triángulo más grande con el elegido del
+    # tramo anterior y el promedio del siguiente: los picos y valles quedan,
+    # a diferencia de tomar uno cada k.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_salida >= n or n_salida < 3:
+        return x, y
+    cada = (n - 2) / (n_salida - 2)
+    bordes = (np.arange(n_salida - 1) * cada).astype(np.intp) + 1
+    elegidos = np.empty(n_salida, dtype=np.intp)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    # Promedio de cada tramo (el último es solo el punto final), de una vez:
+    # en el ciclo queda solo lo que depende del punto elegido antes
+    largos = np.diff(np.append(bordes, n))
+    prom_x = np.add.reduceat(x, bordes) / largos
+    prom_y = np.add.reduceat(y, bordes) / largos
+    a = 0
+    for i in range(n_salida - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        xa, ya = x[a], y[a]
+        area = np.abs((xa - prom_x[i + 1]) * (y[ini:fin] - ya)
+                      - (xa - x[ini:fin]) * (prom_y[i + 1] - ya))
+        a = ini + int(area.argmax())
+        elegidos[i + 1] = a
+    return x[elegidos], y[elegidos]
+
+def escalones(t, stock):
+    # Puntos de la función escalonada (dos por cambio) para submuestrear o
+    # graficar como línea común sin perder los saltos
+    t = np.asarray(t, dtype=float)
+    stock = np.asarray(stock)
+    return np.repeat(t, 2)[1:], np.repeat(stock, 2)[:-1]
+
+# ============================================
+# LÍNEA DE COMANDOS
+# ============================================
+
+def main(argv=None):
+    from .motor import simular_escenario
+    parser = argparse.ArgumentParser(
+        description="Registra trayectorias de stock y resume el abanico de cuantiles")
+    parser.add_argument('--s0', type=int, default=42)
+    parser.add_argument('--factor', type=float, default=1.0)
+    parser.add_argument('--leak', type=float, default=0.6)
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--reps', type=int, default=200)
+    parser.add_argument('--registrar', type=int, default=None,
+                        help="Cuántas réplicas registrar (por defecto, todas)")
+    parser.add_argument('--motor', default='eventos')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--max-memoria-mb', type=float, default=MAX_MEMORIA_MB)
+    parser.add_argument('--puntos', type=int, default=2000,
+                        help="Puntos por trayectoria después de LTTB")
+    parser.add_argument('--datos', type=Path, default=DIRECTORIO_DATOS)
+    args = parser.parse_args(argv)
+
+    _, interarribos, duraciones = cargar_empiricos(args.datos)
+    registro = RegistroTrayectorias(range(args.registrar if args.registrar is not None
+                                          else args.reps),
+                                    max_memoria_mb=args.max_memoria_mb)
+    inicio = time.perf_counter()
+    res = simular_escenario(args.s0, args.factor, args.leak, args.dias, args.reps,
+                            interarribos, duraciones, motor=args.motor,
+                            semilla=args.semilla, trayectorias=registro)
+    segundos = time.perf_counter() - inicio
+    print(f"{args.reps} réplicas en {segundos:.2f} s: {res['pct_rechazos_media']:.2f}% rechazos")
+    donde = f"en {registro.ruta}" if registro.en_disco else "en memoria"
+    print(f"{len(registro)} trayectorias, {registro.n_puntos:,} puntos, "
+          f"{registro.nbytes / 2**20:.1f} MB {donde}")
+
+    inicio = time.perf_counter()
+    abanico = bandas(registro)
+    t_bandas = time.perf_counter() - inicio
+    # LTTB de las primeras réplicas, las que se grafican una por una
+    muestra = registro.replicas[:10]
+    inicio = time.perf_counter()
+    n_total = n_salida = 0
+    for rep in muestra:
+        x, y = escalones(*registro.trayectoria(rep))
+        n_total += len(x)
+        n_salida += len(lttb(x, y, args.puntos)[0])
+    t_lttb = time.perf_counter() - inicio
+    print(f"Abanico en {t_bandas * 1000:.0f} ms; LTTB de {len(muestra)} trayectorias, "
+          f"{n_total:,} -> {n_salida:,} puntos en {t_lttb * 1000:.0f} ms")
+    print("  día   " + "  ".join(f"q{q * 100:02.0f}" for q in abanico['cuantiles']) + "  media")
+    for i in np.linspace(0, len(abanico['t_h']) - 1, min(args.dias, 10) + 1).astype(int):
+        print(f"{abanico['t_h'][i] / 24:5.1f} "
+              + "  ".join(f"{v[i]:4.0f}" for v in abanico['cuantiles'].values())
+              + f"  {abanico['media'][i]:5.1f}")
+    registro.cerrar()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from simulador.api import APISimulacion, crear_servidor
+
+# Servidor real en un puerto libre: los pedidos inválidos tienen que volver
+# con 400 y el mensaje de _validar, nunca con 500
+
+@pytest.fixture(scope='module')
+def url():
+    servidor = crear_servidor(APISimulacion(), puerto=0, silencioso=True)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+
+def _post(url, ruta, cuerpo):
+    pedido = urllib.request.Request(url + ruta, data=json.dumps(cuerpo).encode(),
+                                    headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(pedido) as respuesta:
+            return respuesta.status, json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+@pytest.mark.parametrize("cuerpo, mensaje", [
+    ({'n_max': 0}, "n_max"),
+    ({'n_max': 1}, "n_max"),
+    ({'n_max': 10 ** 9}, "n_max"),
+    ({'s0_min': 40, 's0_max': 10}, "s0_min"),
+    ({'s0_min': 200}, "s0_min"),
+    ({'s0_max': 0}, "s0_min"),
+])
+def test_optimizar_rechaza_rangos_invalidos(url, cuerpo, mensaje):
+    codigo, datos = _post(url, '/optimizar', cuerpo)
+    assert codigo == 400
+    assert mensaje in datos['error']
+
+@pytest.mark.parametrize("cuerpo", [{'n_reps': 1}, {'n_reps': 0}])
+def test_simular_rechaza_pocas_replicas(url, cuerpo):
+    codigo, datos = _post(url, '/simular', cuerpo)
+    assert codigo == 400
+    assert "n_reps" in datos['error']
+
+# json.dumps escribe inf y nan como Infinity y NaN, que json.loads acepta
+@pytest.mark.parametrize("cuerpo, mensaje", [
+    ({'factor_demanda': float('inf')}, "factor_demanda"),
+    ({'factor_demanda': float('nan')}, "factor_demanda"),
+    ({'factor_demanda': True}, "factor_demanda"),
+    ({'factor_demanda': 1e6}, "factor_demanda"),
+    ({'leak_pct': float('nan')}, "leak_pct"),
+    ({'horizonte_dias': 10 ** 6}, "horizonte_dias"),
+    ({'semiamplitud_objetivo': float('-inf')}, "semiamplitud_objetivo"),
+    ({'n_workers': "x"}, "n_workers"),
+    ({'n_workers': 0}, "n_workers"),
+    ({'n_workers': True}, "n_workers"),
+])
+def test_simular_rechaza_valores_no_finitos_o_fuera_de_rango(url, cuerpo, mensaje):
+    codigo, datos = _post(url, '/simular', cuerpo)
+    assert codigo == 400
+    assert mensaje in datos['error']
+
+def test_simular_sigue_atendiendo_despues_de_rechazos(url):
+    _post(url, '/simular', {'factor_demanda': float('inf')})
+    codigo, datos = _post(url, '/simular', {'n_reps': 2, 'horizonte_dias': 1})
+    assert codigo == 200
+    assert datos['n_replicas_usadas'] == 2
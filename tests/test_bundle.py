@@ -0,0 +1,50 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulador.bundle import ARCHIVO_BUNDLE, FUENTES, cargar_bundle
+from simulador.datos import DIRECTORIO_DATOS, cargar_datos
+
+# Copia de data/ en un directorio temporal: los tests rehacen el paquete y
+# tocan las fuentes
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for nombre in FUENTES:
+        shutil.copy2(DIRECTORIO_DATOS / nombre, tmp_path / nombre)
+    return tmp_path
+
+def _igual_a_cargar_datos(bundle, data_dir):
+    esperado = cargar_datos(data_dir)
+    obtenido = bundle.como_tupla()
+    assert obtenido[0] == esperado[0] and obtenido[5] == esperado[5]
+    for i in (1, 2):
+        assert obtenido[i].dtype == esperado[i].dtype
+        np.testing.assert_array_equal(obtenido[i], esperado[i])
+    for i in (3, 4):
+        pd.testing.assert_frame_equal(obtenido[i], esperado[i])
+
+def test_como_tupla_igual_a_cargar_datos(data_dir):
+    bundle = cargar_bundle(data_dir)
+    assert bundle.ruta == data_dir / ARCHIVO_BUNDLE
+    _igual_a_cargar_datos(bundle, data_dir)
+    # La segunda carga lee el paquete sin rehacerlo
+    mtime = bundle.ruta.stat().st_mtime_ns
+    _igual_a_cargar_datos(cargar_bundle(data_dir), data_dir)
+    assert bundle.ruta.stat().st_mtime_ns == mtime
+
+def test_se_rehace_si_cambia_una_fuente(data_dir):
+    cargar_bundle(data_dir)
+    nuevos = np.arange(1.0, 101.0)
+    np.save(data_dir / "interarribos_empiricos.npy", nuevos)
+    bundle = cargar_bundle(data_dir)
+    np.testing.assert_array_equal(bundle.interarribos, nuevos)
+    _igual_a_cargar_datos(bundle, data_dir)
+
+def test_se_rehace_si_el_paquete_esta_truncado(data_dir):
+    ruta = cargar_bundle(data_dir).ruta
+    contenido = ruta.read_bytes()
+    ruta.write_bytes(contenido[:len(contenido) // 2])
+    _igual_a_cargar_datos(cargar_bundle(data_dir), data_dir)
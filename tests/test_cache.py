@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+from simulador.cache import CacheEscenarios
+from simulador.datos import cargar_empiricos
+from simulador.motor import simular_escenario
+
+# La réplica i es la misma en corridas de distinto largo: la caché guarda una
+# serie por escenario y responde pedidos más cortos con su prefijo
+
+def _escenario(cache, n_reps):
+    _, interarribos, duraciones = cargar_empiricos()
+    return simular_escenario(s0=10, factor_demanda=2.0, leak_pct=1.0, horizonte_dias=3,
+                             n_reps=n_reps, interarribos=interarribos,
+                             duraciones=duraciones, cache=cache)
+
+def test_prefijo_de_una_corrida_guardada(tmp_path):
+    cache = CacheEscenarios(tmp_path)
+    larga = _escenario(cache, 20)
+    assert larga['replicas_desde_cache'] == 0
+    corta = _escenario(cache, 8)
+    assert corta['replicas_desde_cache'] == 8
+    sin_cache = _escenario(None, 8)
+    np.testing.assert_array_equal(corta['distribucion_rechazos'],
+                                  sin_cache['distribucion_rechazos'])
+
+def test_extender_simula_solo_las_que_faltan(tmp_path):
+    cache = CacheEscenarios(tmp_path)
+    _escenario(cache, 8)
+    extendida = _escenario(cache, 20)
+    assert extendida['replicas_desde_cache'] == 8
+    np.testing.assert_array_equal(extendida['distribucion_rechazos'],
+                                  _escenario(None, 20)['distribucion_rechazos'])
+    # La serie guardada ahora tiene las 20
+    assert len(cache.obtener(next(tmp_path.glob('*.npz')).stem, 100)['pct_rechazos']) == 20
+
+def test_desaloja_el_menos_usado(tmp_path):
+    replicas = {'pct_rechazos': np.arange(1000.0)}
+    cache = CacheEscenarios(tmp_path, limite_bytes=10**9)
+    cache.guardar('a', replicas)
+    cache.guardar('b', replicas)
+    tam = (tmp_path / 'a.npz').stat().st_size
+    # b se guardó después, pero a se leyó más tarde
+    os.utime(tmp_path / 'a.npz', (1000, 1000))
+    os.utime(tmp_path / 'b.npz', (2000, 2000))
+    assert cache.obtener('a', 10) is not None
+    cache.limite_bytes = 2 * tam
+    cache.guardar('c', replicas)
+    assert sorted(p.stem for p in tmp_path.glob('*.npz')) == ['a', 'c']
+    assert cache.obtener('b', 10) is None
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from simulador.datos import cargar_empiricos
+from simulador.estacionario import trayectoria_larga
+from simulador.motor import correr_replicas
+
+# La trayectoria larga es la réplica rep del motor de eventos: sumadas sus
+# ventanas tienen que dar lo mismo que esa réplica
+
+@pytest.mark.parametrize("s0, leak_pct, ancho_h", [(20, 0.0, 24), (8, 10.0, 5)])
+def test_ventanas_suman_la_replica_del_motor(s0, leak_pct, ancho_h):
+    _, interarribos, duraciones = cargar_empiricos()
+    dias, rep = 12, 3
+    tr = trayectoria_larga(s0, 1.5, leak_pct, dias, interarribos, duraciones, semilla=7,
+                           rep=rep, ancho_ventana_h=ancho_h)
+    parametros = dict(s0=s0, factor_demanda=1.5, leak_pct=leak_pct, horizonte_dias=dias,
+                      interarribos=interarribos, duraciones=duraciones, motor='eventos',
+                      semilla=7)
+    fila = {k: v[0] for k, v in correr_replicas(parametros, rep, rep + 1).items()}
+    assert tr['llegadas'].sum() == fila['llegadas']
+    assert tr['rechazos'].sum() == fila['rechazos']
+    assert tr['eventos'] == fila['eventos']
+    duracion = np.diff(np.concatenate([[0.0], np.minimum(tr['t_dias'], dias)]))
+    assert np.sum(tr['stock_medio'] * duracion) / dias == pytest.approx(fila['stock_promedio'])
+    assert tr['flota'][-1] <= s0
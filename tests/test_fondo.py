@@ -0,0 +1,59 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from simulador.datos import cargar_empiricos
+from simulador.fondo import SimulacionEnFondo
+from simulador.paralelo import recoger_en_orden
+from simulador.red import Red
+
+# cancelar() no espera el fin del lote: con la bandera puesta desde antes de
+# arrancar, la corrida para después de la primera réplica
+
+def _corrida(**extra):
+    _, interarribos, duraciones = cargar_empiricos()
+    parametros = dict(s0=20, factor_demanda=1.0, leak_pct=1.0, horizonte_dias=10, n_reps=200,
+                      interarribos=interarribos, duraciones=duraciones, tam_lote=50)
+    parametros.update(extra)
+    sim = SimulacionEnFondo(**parametros)
+    sim.cancelar()
+    sim.iniciar()
+    assert sim.esperar(60)
+    assert sim.error is None
+    return sim.resultado
+
+def test_cancelar_corta_dentro_del_lote():
+    resultado = _corrida()
+    assert resultado['motivo_parada'] == 'cancelada'
+    assert resultado['n_replicas_usadas'] == 1
+
+def test_cancelar_corta_la_red_dentro_del_lote():
+    resultado = _corrida(red=Red.sintetica(n_estaciones=5, s0_medio=6), tam_lote=5)
+    assert resultado['motivo_parada'] == 'cancelada'
+    assert resultado['n_replicas_usadas'] == 1
+
+def test_recoger_en_orden_cancela_las_tareas_pendientes():
+    cancelado = threading.Event()
+    hechas = []
+
+    def tarea(i):
+        if i == 1:
+            cancelado.set()
+        time.sleep(0.05)
+        hechas.append(i)
+        return i
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        futuros = [pool.submit(tarea, i) for i in range(10)]
+        resultados = recoger_en_orden(futuros, cancelado, espera_s=0.01)
+    # La tarea 1 ya corría al cancelar: termina, pero su resultado puede
+    # quedar fuera; las que no habían empezado no corren nunca
+    assert resultados[0] == 0 and resultados == list(range(len(resultados)))
+    assert len(resultados) <= 2
+    assert hechas == [0, 1]
+    assert all(f.cancelled() for f in futuros[2:])
+
+def test_recoger_en_orden_sin_cancelar():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futuros = [pool.submit(lambda i=i: i * i) for i in range(6)]
+        assert recoger_en_orden(futuros, threading.Event()) == [0, 1, 4, 9, 16, 25]
@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulador.ingesta import COLUMNAS, ESTACION, ingerir
+
+# Registros sintéticos: viajes que salen o llegan a la estación, con
+# duraciones largas (muchos cruzan la medianoche) y retiros en el mismo
+# minuto, para que el corte entre archivos caiga en los casos difíciles
+
+def _viajes(n=3000, dias=14, semilla=3):
+    rng = np.random.default_rng(semilla)
+    inicio = pd.Timestamp("2024-03-04")
+    retiro = inicio + pd.to_timedelta(np.sort(rng.integers(0, dias * 1440, n)), unit='min')
+    duracion = pd.to_timedelta(rng.integers(1, 240, n), unit='min')
+    otras = np.array(["Plaza", "Parque", "Terminal"])
+    origen = np.where(rng.random(n) < 0.6, ESTACION, rng.choice(otras, n))
+    destino = np.where(rng.random(n) < 0.6, ESTACION, rng.choice(otras, n))
+    return pd.DataFrame({
+        COLUMNAS['origen']: origen,
+        COLUMNAS['destino']: destino,
+        COLUMNAS['retiro']: retiro.strftime('%Y-%m-%d %H:%M'),
+        COLUMNAS['devolucion']: (retiro + duracion).strftime('%Y-%m-%d %H:%M'),
+    })
+
+def _resultado(data_dir):
+    parametros = json.loads((data_dir / "parametros_simulacion.json").read_text())
+    parametros.pop('fecha_analisis')
+    metadata = json.loads((data_dir / "metadata_analisis.json").read_text())
+    return (parametros, metadata, np.load(data_dir / "interarribos_empiricos.npy"),
+            np.load(data_dir / "duraciones_empiricas.npy"))
+
+def _comparar(tmp_path, partes):
+    rutas = []
+    for i, parte in enumerate(partes):
+        ruta = tmp_path / f"viajes_{i:02d}.csv"
+        parte.to_csv(ruta, index=False)
+        rutas.append(ruta)
+    completo, incremental = tmp_path / "completo", tmp_path / "incremental"
+    ingerir(rutas, completo, progreso=lambda *_: None)
+    for ruta in rutas:
+        ingerir([ruta], incremental, progreso=lambda *_: None)
+    esperado, obtenido = _resultado(completo), _resultado(incremental)
+    assert obtenido[0] == esperado[0]
+    assert obtenido[1] == esperado[1]
+    np.testing.assert_array_equal(obtenido[2], esperado[2])
+    np.testing.assert_array_equal(obtenido[3], esperado[3])
+
+def test_incremental_por_dia_de_retiro(tmp_path):
+    viajes = _viajes()
+    dia = viajes[COLUMNAS['retiro']].str[:10]
+    _comparar(tmp_path, [viajes[dia == d] for d in sorted(dia.unique())])
+
+@pytest.mark.parametrize("n_partes", [2, 7])
+def test_incremental_por_cantidad_de_filas(tmp_path, n_partes):
+    # Cortes arbitrarios: pueden separar retiros del mismo minuto
+    viajes = _viajes()
+    cortes = np.linspace(0, len(viajes), n_partes + 1).astype(int)
+    _comparar(tmp_path, [viajes.iloc[a:b] for a, b in zip(cortes[:-1], cortes[1:])])
+
+def test_mismo_nombre_en_carpetas_distintas(tmp_path):
+    viajes = _viajes()
+    rutas = []
+    for i, parte in enumerate([viajes.iloc[:1500], viajes.iloc[1500:]]):
+        carpeta = tmp_path / f"mes_{i}"
+        carpeta.mkdir()
+        rutas.append(carpeta / "viajes.csv")
+        parte.to_csv(rutas[-1], index=False)
+    incremental, completo = tmp_path / "incremental", tmp_path / "completo"
+    for ruta in rutas:
+        ingerir([ruta], incremental, progreso=lambda *_: None)
+    ingerir(rutas, completo, progreso=lambda *_: None)
+    assert _resultado(incremental)[0] == _resultado(completo)[0]
+    np.testing.assert_array_equal(_resultado(incremental)[2], _resultado(completo)[2])
+
+def test_archivo_que_crece(tmp_path):
+    viajes = _viajes()
+    ruta = tmp_path / "viajes.csv"
+    viajes.iloc[:1700].to_csv(ruta, index=False)
+    incremental = tmp_path / "incremental"
+    ingerir([ruta], incremental, progreso=lambda *_: None)
+    viajes.iloc[1700:].to_csv(ruta, index=False, header=False, mode='a')
+    ingerir([ruta], incremental, progreso=lambda *_: None)
+    completo = tmp_path / "completo"
+    ingerir([ruta], completo, progreso=lambda *_: None)
+    assert _resultado(incremental)[0] == _resultado(completo)[0]
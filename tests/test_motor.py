@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from simulador.arribos import crear_perfil
+from simulador.datos import cargar_empiricos
+from simulador.motor import _simular_eventos, _simular_vectorizado, nuevo_diagnostico
+from simulador.muestreadores import crear_muestreador
+
+# El motor vectorizado tiene que dar réplica por réplica lo mismo que el de
+# eventos. Bloques chicos para que muchos retornos crucen de un bloque al
+# siguiente y el horizonte caiga en cualquier lugar del bloque
+
+@pytest.fixture(scope='module')
+def muestreadores():
+    _, interarribos, duraciones = cargar_empiricos()
+    return crear_muestreador(interarribos), crear_muestreador(duraciones)
+
+@pytest.mark.parametrize("s0, factor, leak_pct, dias, perfil, tam_bloque", [
+    (42, 1.0, 0.6, 7, None, 1024),
+    (5, 3.0, 5.0, 10, None, 64),
+    (0, 1.0, 0.0, 2, None, 32),
+    (3, 2.0, 100.0, 3, None, 16),
+    (10, 4.0, 1.0, 5, 'doble_pico', 7),
+])
+def test_vectorizado_igual_a_eventos(muestreadores, s0, factor, leak_pct, dias, perfil,
+                                     tam_bloque):
+    m_inter, m_dur = muestreadores
+    perfil = None if perfil is None else crear_perfil(perfil)
+    reps = list(range(30))
+    eventos = _simular_eventos(s0, factor, leak_pct, dias, reps, m_inter, m_dur, 7,
+                               perfil=perfil)
+    vectorizado = _simular_vectorizado(s0, factor, leak_pct, dias, reps, m_inter, m_dur, 7,
+                                       perfil=perfil, tam_bloque=tam_bloque)
+    for clave, valores in eventos.items():
+        if valores.dtype.kind == 'f':
+            np.testing.assert_allclose(vectorizado[clave], valores, rtol=1e-9, atol=1e-9)
+        else:
+            np.testing.assert_array_equal(vectorizado[clave], valores)
+
+def test_vectorizado_por_fila_igual_a_cada_escenario(muestreadores):
+    # Varios escenarios en una corrida (simular_lote): cada fila como si
+    # fuera sola
+    m_inter, m_dur = muestreadores
+    s0, factor, leak_pct = [0, 3, 42, 7], [1.0, 5.0, 1.0, 2.0], [0.0, 1.0, 50.0, 3.0]
+    diagnostico = nuevo_diagnostico()
+    juntas = _simular_vectorizado(np.array(s0), np.array(factor), np.array(leak_pct), 6,
+                                  [0, 1, 2, 3], m_inter, m_dur, np.array([1, 2, 3, 4]),
+                                  diagnostico=diagnostico, tam_bloque=50)
+    for i in range(4):
+        sola = _simular_eventos(s0[i], factor[i], leak_pct[i], 6, [i], m_inter, m_dur, i + 1)
+        for clave, valores in sola.items():
+            np.testing.assert_allclose(juntas[clave][i], valores[0], rtol=1e-9, atol=1e-9)
+    assert diagnostico['cola_max'] > 1
@@ -0,0 +1,79 @@
+import heapq
+
+import numpy as np
+import pytest
+
+from simulador.arribos import crear_perfil
+from simulador.datos import cargar_empiricos
+from simulador.muestreadores import crear_muestreador
+from simulador.red import Red, _replica_red, _retiros_estacion, _viajes_red
+
+# El muestreo de toda la red junta tiene que dar los mismos retiros que
+# generar cada estación por separado, y la réplica lo mismo que recorrer los
+# eventos en orden con un único heap de devoluciones
+
+@pytest.fixture(scope='module')
+def muestreadores():
+    _, interarribos, duraciones = cargar_empiricos()
+    return crear_muestreador(interarribos), crear_muestreador(duraciones)
+
+def _red():
+    red = Red.sintetica(n_estaciones=12, s0_medio=4, semilla=5)
+    tasas = red.tasas_h.copy()
+    tasas[3] = 0.0
+    return Red(red.s0, tasas, red.od, escala_duracion=red.escala_duracion)
+
+def _referencia(red, factor, leak_pct, tiempo_sim, m_inter, m_dur, semilla, rep, perfil):
+    media, _ = m_inter.momentos()
+    viajes = []
+    for i in range(red.n):
+        if red.tasas_h[i] <= 0:
+            continue
+        ss_retiros, ss_marcas = np.random.SeedSequence(semilla, spawn_key=(rep, i)).spawn(2)
+        t = _retiros_estacion(np.random.default_rng(ss_retiros), m_inter,
+                              red.tasas_h[i] * factor * media / 60.0, tiempo_sim, perfil)
+        u = np.random.default_rng(ss_marcas).random((len(t), 3))
+        destino = np.minimum(np.searchsorted(red.od_acumulada[i], u[:, 0], side='right'),
+                             red.n - 1)
+        duracion = m_dur.inversa(u[:, 2]) * red.escala_duracion[i, destino]
+        for k in range(len(t)):
+            viajes.append((t[k], i, int(destino[k]), t[k] + duracion[k],
+                           u[k, 1] <= leak_pct / 100.0))
+    viajes.sort(key=lambda v: v[0])
+
+    stock = red.s0.copy()
+    llegadas = np.zeros(red.n, dtype=int)
+    rechazos = np.zeros(red.n, dtype=int)
+    minimo = red.s0.copy()
+    devoluciones = []
+    for t, o, d, r, fuga in viajes:
+        while devoluciones and devoluciones[0][0] < t:
+            stock[heapq.heappop(devoluciones)[1]] += 1
+        llegadas[o] += 1
+        if stock[o] > 0:
+            stock[o] -= 1
+            minimo[o] = min(minimo[o], stock[o])
+            if not fuga:
+                heapq.heappush(devoluciones, (r, d))
+        else:
+            rechazos[o] += 1
+    return viajes, llegadas, rechazos, minimo
+
+@pytest.mark.parametrize("perfil", [None, 'doble_pico'])
+def test_replica_igual_a_la_referencia(muestreadores, perfil):
+    m_inter, m_dur = muestreadores
+    red = _red()
+    perfil = None if perfil is None else crear_perfil(perfil)
+    tiempo_sim = 20 * 24 * 60
+    viajes, llegadas, rechazos, minimo = _referencia(red, 1.5, 5.0, tiempo_sim, m_inter,
+                                                     m_dur, 42, 7, perfil)
+    t, o, d, r = _viajes_red(red, 1.5, 0.05, tiempo_sim, m_inter, m_dur, 42, 7, perfil)
+    np.testing.assert_array_equal(t, [v[0] for v in viajes])
+    np.testing.assert_array_equal(o, [v[1] for v in viajes])
+    np.testing.assert_array_equal(r, [np.inf if v[4] else v[3] for v in viajes])
+
+    fila = _replica_red(red, 1.5, 5.0, tiempo_sim, m_inter, m_dur, 42, 7, perfil)
+    np.testing.assert_array_equal(fila['llegadas_estacion'], llegadas)
+    np.testing.assert_array_equal(fila['rechazos_estacion'], rechazos)
+    np.testing.assert_array_equal(fila['stock_min_estacion'], minimo)
+    assert rechazos.sum() > 0
@@ -0,0 +1,53 @@
+import numpy as np
+
+from simulador.datos import cargar_empiricos
+from simulador.servicio import ServicioSimulacion, clave_trabajo
+
+# Sin hilos (n_hilos=0) los pedidos quedan en cola y se puede ver en qué
+# orden los tomaría el servicio
+
+def test_clave_ignora_n_workers_y_separa_por_valor():
+    base = dict(s0=20, factor_demanda=1.0, interarribos=np.arange(5.0))
+    assert clave_trabajo(base) == clave_trabajo(dict(base, n_workers=4))
+    assert clave_trabajo(base) == clave_trabajo(dict(base, interarribos=np.arange(5.0)))
+    assert clave_trabajo(base) != clave_trabajo(dict(base, s0=21))
+    assert clave_trabajo(base) != clave_trabajo(dict(base, interarribos=np.arange(6.0)))
+
+def test_pedidos_iguales_comparten_el_trabajo():
+    servicio = ServicioSimulacion(n_hilos=0, max_workers_trabajo=2)
+    a = servicio.enviar('s1', s0=20, n_reps=10, n_workers=1)
+    b = servicio.enviar('s2', s0=20, n_reps=10, n_workers=8)
+    c = servicio.enviar('s2', tarea='estacionario', s0=20, n_reps=10)
+    assert b.trabajo is a.trabajo and b.compartido and a.trabajo.suscriptores == 2
+    assert c.trabajo is not a.trabajo
+    # Retirar uno de los dos no cancela el trabajo compartido
+    b.cancelar()
+    assert not a.trabajo.cancelada and a.trabajo.suscriptores == 1
+    a.cancelar()
+    assert a.trabajo.cancelada
+    assert servicio.enviar('s1', s0=20, n_reps=10).trabajo is not a.trabajo
+
+def test_turno_rotativo_entre_sesiones():
+    servicio = ServicioSimulacion(n_hilos=0, max_workers_trabajo=1)
+    for s0 in range(1, 5):
+        servicio.enviar('cargada', s0=s0, n_reps=10)
+    servicio.enviar('otra', s0=100, n_reps=10)
+    servicio.enviar('tercera', s0=200, n_reps=10)
+    servicio.enviar('otra', s0=101, n_reps=10)
+    orden = []
+    while (trabajo := servicio._siguiente()) is not None:
+        orden.append((trabajo.sesion, trabajo.parametros['s0']))
+    assert orden == [('cargada', 1), ('otra', 100), ('tercera', 200), ('cargada', 2),
+                     ('otra', 101), ('cargada', 3), ('cargada', 4)]
+
+def test_largo_plazo_por_el_servicio():
+    _, interarribos, duraciones = cargar_empiricos()
+    servicio = ServicioSimulacion(n_hilos=1, max_workers_trabajo=1)
+    pedido = servicio.enviar('s1', tarea='estacionario', s0=20, factor_demanda=1.0,
+                             leak_pct=0.0, dias=40, interarribos=interarribos,
+                             duraciones=duraciones, n_trayectorias=2)
+    assert pedido.esperar(120)
+    assert pedido.error is None
+    assert pedido.estado()['n_hechas'] == pedido.n_total == 2
+    assert pedido.resultado['flota_final'] == 20
+    servicio.cerrar()